@@ -4,10 +4,8 @@ import streamlit as st
 from dotenv import load_dotenv
 
 from src.config import get_settings
-from src.sample_data import get_sample_recipes
-from src.utils.text import recipes_to_documents
-from src.rag.build_index import load_or_build_vectorstore
-from src.db.schema import init_db
+from src.resources import get_keyword_index, get_vectorstore
+from src.ui.session import current_user
 from src.ui.sidebar import render_sidebar
 from src.ui.tab_recipe import render_tab_recipe
 from src.ui.tab_profile import render_tab_profile
@@ -46,13 +44,13 @@ def main() -> None:
 
     settings = get_settings()
 
-    # SQLite DB の初期化（テーブルが無ければ作成）
-    init_db(settings.sqlite_db_path)
+    # SQLite DB の初期化（ユーザーの DB ファイルを決め、テーブルが無ければ作成）
+    current_user(settings)
 
     # サンプルデータ → Document 化 → VectorDB ロード（なければ構築）
-    recipes = get_sample_recipes()
-    docs = recipes_to_documents(recipes)
-    vectorstore = load_or_build_vectorstore(docs, settings)
+    # プロセス内で1回だけ行い、再実行時は共有リソースを使い回す
+    vectorstore = get_vectorstore(settings)
+    keyword_index = get_keyword_index(settings)
 
     # サイドバー（カロリー進捗 + RAG 設定）
     ui_state = render_sidebar(settings)
@@ -67,7 +65,7 @@ def main() -> None:
     ])
 
     with tab_recipe:
-        render_tab_recipe(vectorstore, settings, ui_state)
+        render_tab_recipe(vectorstore, settings, ui_state, keyword_index=keyword_index)
 
     with tab_profile:
         render_tab_profile(settings)
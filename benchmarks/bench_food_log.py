@@ -0,0 +1,107 @@
+"""
+food_log の日次クエリのベンチマーク
+
+    python -m benchmarks.bench_food_log --rows 1000000
+
+一時ファイルの DB に行を投入し、通常の DAO（インデックス・daily_totals）、
+food_log のカバリングインデックスでの生集計、NOT INDEXED の全件走査のレイテンシを比べる。
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src.db.food_log import DAILY_LOG_SQL, get_daily_log, get_daily_totals
+from src.db.query_plan import check_query_plans
+from src.db.schema import close_all_connections, init_db
+
+MEAL_TYPES = ("朝食", "昼食", "夕食", "間食")
+
+RAW_TOTALS_SQL = """SELECT SUM(calories_kcal), SUM(protein_g), SUM(fat_g), SUM(carbs_g)
+   FROM food_log WHERE user_id=? AND log_date=?"""
+
+
+def seed(db_path: str, rows: int, days: int, batch: int = 50_000) -> None:
+    rng = random.Random(0)
+    start = date(2020, 1, 1)
+    con = sqlite3.connect(db_path)
+
+    def generate():
+        for i in range(rows):
+            d = start + timedelta(days=rng.randrange(days))
+            yield (
+                d.isoformat(), MEAL_TYPES[i % 4], f"r{i % 500}", f"レシピ{i % 500}",
+                rng.uniform(100, 800), rng.uniform(5, 40), rng.uniform(2, 30),
+                rng.uniform(10, 90), f"{d.isoformat()} {i % 24:02d}:{i % 60:02d}:00",
+            )
+
+    sql = """INSERT INTO food_log
+             (log_date, meal_type, recipe_id, recipe_title,
+              calories_kcal, protein_g, fat_g, carbs_g, created_at)
+             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+    it = generate()
+    while True:
+        chunk = [row for _, row in zip(range(batch), it)]
+        if not chunk:
+            break
+        con.executemany(sql, chunk)
+        con.commit()
+    con.execute("ANALYZE")
+    con.close()
+
+
+def _time(fn, queries: int) -> float:
+    samples = []
+    for _ in range(queries):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=3650)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        init_db(db_path)
+        t0 = time.perf_counter()
+        seed(db_path, args.rows, args.days)
+        print(f"seeded {args.rows:,} rows in {time.perf_counter() - t0:.1f}s")
+
+        con = sqlite3.connect(db_path)
+        for name, plan in check_query_plans(con).items():
+            print(f"plan {name}: {' / '.join(plan)}")
+
+        day = "2024-06-15"
+        scan_log = DAILY_LOG_SQL.replace("FROM food_log", "FROM food_log NOT INDEXED")
+        scan_totals = RAW_TOTALS_SQL.replace("FROM food_log", "FROM food_log NOT INDEXED")
+        results = {
+            "daily_log (index)": _time(lambda: get_daily_log(db_path, day), args.queries),
+            "daily_log (scan)": _time(
+                lambda: con.execute(scan_log, ("default", day)).fetchall(), max(3, args.queries // 10)
+            ),
+            "daily_totals (rollup)": _time(lambda: get_daily_totals(db_path, day), args.queries),
+            "daily_totals (index)": _time(
+                lambda: con.execute(RAW_TOTALS_SQL, ("default", day)).fetchone(), args.queries
+            ),
+            "daily_totals (scan)": _time(
+                lambda: con.execute(scan_totals, ("default", day)).fetchone(), max(3, args.queries // 10)
+            ),
+        }
+        con.close()
+        close_all_connections()
+        for name, ms in results.items():
+            print(f"{name:24s} {ms:8.3f} ms (median)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+献立ソルバー（solve_day / plan_week）のベンチマーク
+
+    python -m benchmarks.bench_meal_planner --recipes 10000
+
+乱数で作ったレシピカタログに対して、1日の最適化・1週間の作成と、
+1枠を固定／入れ替えたときの組み直し（日ごとの解のキャッシュを使う）のレイテンシを測る。
+"""
+import argparse
+import random
+import statistics
+import time
+
+from src.nutrition.meal_planner import plan_week
+from src.nutrition.plan_solver import (
+    DEFAULT_MEAL_TYPES,
+    MacroTargets,
+    get_planner_index,
+    solve_day,
+)
+
+# 食事区分ごとの (kcal 下限, kcal 上限)
+KCAL_RANGES = {"朝食": (150, 550), "昼食": (250, 800), "夕食": (250, 800), "間食": (50, 300)}
+
+
+def synthetic_catalog(n: int, seed: int = 0) -> tuple:
+    rng = random.Random(seed)
+    recipes = []
+    for i in range(n):
+        meal_type = DEFAULT_MEAL_TYPES[i % len(DEFAULT_MEAL_TYPES)]
+        kcal = rng.uniform(*KCAL_RANGES[meal_type])
+        p_ratio, f_ratio = rng.uniform(0.1, 0.4), rng.uniform(0.15, 0.4)
+        recipes.append({
+            "id": f"s{i:06d}",
+            "title": f"合成レシピ{i}",
+            "meal_type": meal_type,
+            "calories_kcal": round(kcal),
+            "protein_g": round(kcal * p_ratio / 4, 1),
+            "fat_g": round(kcal * f_ratio / 9, 1),
+            "carbs_g": round(max(0.0, kcal * (1 - p_ratio - f_ratio)) / 4, 1),
+        })
+    return tuple(recipes)
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--kcal", type=float, default=1800.0)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    recipes = synthetic_catalog(args.recipes)
+    index = get_planner_index(recipes)
+    print(f"built {len(recipes):,} recipes + index in {time.perf_counter() - t0:.2f}s")
+
+    kcal = args.kcal
+    targets = MacroTargets(protein_g=kcal * 0.25 / 4, fat_g=kcal * 0.25 / 9, carbs_g=kcal * 0.5 / 4)
+    rng = random.Random(1)
+
+    def cold_week():
+        index.day_cache.clear()
+        return plan_week(recipes, kcal, targets=targets)
+
+    base = cold_week()
+    print(f"week cost {base.cost:.3f}, days solved {base.solved_days}, "
+          f"day kcal {[round(d.totals['calories_kcal']) for d in base.days]}")
+
+    locks = []
+
+    def lock_one_slot():
+        day, meal = rng.randrange(7), rng.choice(DEFAULT_MEAL_TYPES)
+        recipe = base.days[(day + 2) % 7].meals[meal]
+        locks.append(plan_week(
+            recipes, kcal, targets=targets, locked={(day, meal): recipe["id"]}
+        ).solved_days)
+
+    swaps = []
+
+    def swap_one_slot():
+        day, meal = rng.randrange(7), rng.choice(DEFAULT_MEAL_TYPES)
+        swaps.append(plan_week(
+            recipes, kcal, targets=targets, banned={day: [base.days[day].meals[meal]["id"]]}
+        ).solved_days)
+
+    results = {
+        "solve_day (no cache)": _time(lambda: solve_day(index, kcal, targets=targets), args.repeat),
+        "plan_week (cold)": _time(cold_week, max(3, args.repeat // 5)),
+        "plan_week (cached)": _time(lambda: plan_week(recipes, kcal, targets=targets), args.repeat),
+    }
+    cold_week()
+    results["re-plan: lock 1 slot"] = _time(lock_one_slot, args.repeat)
+    results["re-plan: swap 1 slot"] = _time(swap_one_slot, args.repeat)
+
+    for name, ms in results.items():
+        print(f"{name:24s} {ms:8.3f} ms (median)")
+    print(f"days re-solved per lock {statistics.mean(locks):.1f}, per swap {statistics.mean(swaps):.1f} (of 7)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import argparse
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(prog="python -m src.api", description="ヘッドレス API サーバー")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")))
+    args = parser.parse_args()
+    uvicorn.run("src.api.app:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,607 @@
+import asyncio
+import dataclasses
+import hmac
+import json
+import logging
+import math
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from src.config import Settings, get_settings
+from src.db.async_dao import close_all_async_dbs, get_async_db
+from src.db.bulk import _date, _number as _non_negative
+from src.db.food_log import PERIODS
+from src.db.schema import close_all_connections
+from src.db.sharding import user_db_path
+from src.nutrition.meal_planner import (
+    NO_REPEAT_DAYS,
+    WEEK_DAYS,
+    find_recipes_by_ingredients,
+    generate_shopping_list,
+    plan_week,
+    suggest_meal_plan,
+)
+from src.nutrition.plan_solver import MacroTargets, remaining_targets
+from src.nutrition.tdee import (
+    ACTIVITY_FACTORS,
+    SAFETY_FLOOR,
+    build_profile_context,
+    calc_tdee,
+    calc_tdee_for_profile,
+    profile_bucket,
+)
+from src.rag.answer_cache import get_answer_cache
+from src.rag.filters import parse_query_filters
+from src.rag.qa_chain import answer_question, stream_answer
+from src.rag.retriever import build_retriever
+from src.resources import get_catalog, get_keyword_index, get_query_batcher, get_vectorstore
+
+# Streamlit を通さずに RAG 検索・ログ・献立を JSON で返すヘッドレス API。
+# 重いリソース（ベクトルストア・転置インデックス・LLM クライアント）は src.resources で
+# ワーカープロセスごとに1回だけ作り、起動時に温めておく。
+#
+#   uvicorn src.api.app:app --workers 4
+
+MAX_TOP_K = 50
+
+
+# ===== 入力 =====
+
+async def _json_body(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "request body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(400, "request body must be a JSON object")
+    return body
+
+
+def _required(body: dict, key: str) -> Any:
+    value = body.get(key)
+    if value is None or value == "":
+        raise HTTPException(400, f"{key} is required")
+    return value
+
+
+_MISSING = object()
+
+
+def _number(body: dict, key: str, cast: Callable[[Any], Any] = float, default: Any = _MISSING) -> Any:
+    """
+    数値の項目。default を渡さなければ必須。変換できない・NaN / 無限大なら 400
+    """
+    value = body.get(key)
+    if value is None or value == "":
+        if default is _MISSING:
+            raise HTTPException(400, f"{key} is required")
+        return default
+    try:
+        number = cast(value)
+    except (TypeError, ValueError, OverflowError):
+        raise HTTPException(400, f"{key} must be a number")
+    if not math.isfinite(number):
+        raise HTTPException(400, f"{key} must be a finite number")
+    return number
+
+
+def _int_param(request: Request, key: str, default: int) -> int:
+    return _number(dict(request.query_params), key, int, default)
+
+
+def _choice(body: dict, key: str, choices: Iterable[str]) -> str:
+    value = str(_required(body, key))
+    if value not in choices:
+        raise HTTPException(400, f"{key} must be one of {sorted(choices)}: {value!r}")
+    return value
+
+
+def _bulk_rule(check: Callable[..., Any], body: dict, key: str, *args: Any) -> Any:
+    """
+    一括インポート（src.db.bulk）と同じ検証を通す。ValueError は 400
+    """
+    try:
+        return check(body, key, *args)
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(400, str(exc) if key in str(exc) else f"{key}: {exc}")
+
+
+def _top_k(settings: Settings, body: dict) -> int:
+    top_k = _number(body, "top_k", int, settings.top_k_default)
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise HTTPException(400, f"top_k must be between 1 and {MAX_TOP_K}")
+    return top_k
+
+
+# ===== 認証 =====
+# - DIET_API_TOKENS="token1:alice,token2:bob": Authorization: Bearer <token> のユーザーだけを扱える
+# - DIET_USER_HEADER: 認証付きリバースプロキシが付けるヘッダーの値をユーザーとする
+# - DIET_ALLOW_UNAUTHENTICATED_USERS=1: どの user_id でも受け付ける（認証なし。検証用）
+# - どれもなければ1人用: DIET_USER_ID 以外の user_id は 403
+
+def parse_api_tokens(spec: str) -> dict[str, str]:
+    tokens: dict[str, str] = {}
+    for pair in spec.split(","):
+        token, sep, user_id = pair.strip().partition(":")
+        if not pair.strip():
+            continue
+        if not sep or not token or not user_id:
+            raise ValueError("DIET_API_TOKENS must look like token:user_id,token:user_id")
+        tokens[token] = user_id
+    return tokens
+
+
+def _principal(request: Request) -> Optional[str]:
+    """
+    このリクエストが扱ってよい user_id（None ならどれでも）
+    """
+    settings: Settings = request.app.state.settings
+    tokens: dict[str, str] = request.app.state.api_tokens
+    if tokens:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            for known, user_id in tokens.items():
+                if hmac.compare_digest(known.encode(), token.strip().encode()):
+                    return user_id
+        raise HTTPException(401, "a valid bearer token is required")
+    if settings.user_header:
+        user_id = request.headers.get(settings.user_header)
+        if not user_id:
+            raise HTTPException(401, f"{settings.user_header} header is required")
+        return user_id
+    if settings.allow_unauthenticated_users:
+        return None
+    return settings.default_user_id
+
+
+def _authorize(request: Request, user_id: str) -> str:
+    principal = _principal(request)
+    if principal is not None and user_id != principal:
+        raise HTTPException(403, "not allowed to access this user")
+    return user_id
+
+
+def _user_db(request: Request) -> tuple[str, str]:
+    settings: Settings = request.app.state.settings
+    user_id = _authorize(request, request.path_params["user_id"])
+    return user_db_path(settings, user_id), user_id
+
+
+# ===== RAG =====
+
+def _doc_json(doc: Document) -> dict:
+    return {"recipe_id": doc.metadata.get("id", ""), "content": doc.page_content, "metadata": doc.metadata}
+
+
+def _retrieve(settings: Settings, question: str, top_k: int) -> List[Document]:
+    filters = parse_query_filters(question)
+    retriever = build_retriever(
+        get_vectorstore(settings), top_k=top_k, filters=filters,
+        keyword_index=get_keyword_index(settings), batcher=get_query_batcher(settings),
+    )
+    return retriever.invoke(question)
+
+
+async def _qa_inputs(request: Request) -> tuple[Settings, dict, str, List[Document], str, str]:
+    settings: Settings = request.app.state.settings
+    body = await _json_body(request)
+    question = str(_required(body, "question"))
+    top_k = _top_k(settings, body)
+    # user_id がなくても認証は通す（トークンなしで LLM を呼ばせない）
+    _principal(request)
+    profile = None
+    if body.get("user_id"):
+        user_id = _authorize(request, str(body["user_id"]))
+        profile = await get_async_db(user_db_path(settings, user_id)).get_profile(user_id)
+    docs = await asyncio.to_thread(_retrieve, settings, question, top_k)
+
+    return settings, body, question, docs, build_profile_context(profile), profile_bucket(profile)
+
+
+async def search(request: Request) -> JSONResponse:
+    settings: Settings = request.app.state.settings
+    body = await _json_body(request)
+    question = str(_required(body, "question"))
+    top_k = _top_k(settings, body)
+    docs = await asyncio.to_thread(_retrieve, settings, question, top_k)
+    return JSONResponse({
+        "filters": parse_query_filters(question).describe(),
+        "documents": [_doc_json(d) for d in docs],
+    })
+
+
+async def answer(request: Request) -> JSONResponse:
+    settings, body, question, docs, profile_context, bucket = await _qa_inputs(request)
+    result = await asyncio.to_thread(
+        answer_question,
+        question=question,
+        retrieved_docs=docs,
+        settings=settings,
+        temperature=_number(body, "temperature", float, settings.temperature_default),
+        profile_context=profile_context,
+        cache=get_answer_cache(settings, get_vectorstore(settings).embeddings),
+        profile_bucket=bucket,
+    )
+    return JSONResponse(result)
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_events(events: Iterator[tuple[str, Any]]) -> Iterator[str]:
+    try:
+        for kind, payload in events:
+            yield _sse(kind, payload)
+    except Exception as exc:
+        logging.warning("Streaming answer failed: %s", exc)
+        yield _sse("error", {"detail": str(exc)})
+
+
+async def answer_stream(request: Request) -> StreamingResponse:
+    """
+    Server-Sent Events。event: sources → token（複数）→ result の順（qa_chain.stream_answer と同じ）
+    """
+    settings, body, question, docs, profile_context, bucket = await _qa_inputs(request)
+    events = stream_answer(
+        question=question,
+        retrieved_docs=docs,
+        settings=settings,
+        temperature=_number(body, "temperature", float, settings.temperature_default),
+        profile_context=profile_context,
+        cache=get_answer_cache(settings, get_vectorstore(settings).embeddings),
+        profile_bucket=bucket,
+    )
+    # 同期ジェネレーターは Starlette がスレッドプールで回す（LLM 待ちでイベントループを塞がない）
+    return StreamingResponse(
+        _sse_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ===== プロフィール・ログ =====
+
+async def get_profile(request: Request) -> JSONResponse:
+    db_path, user_id = _user_db(request)
+    profile = await get_async_db(db_path).get_profile(user_id)
+    if profile is None:
+        raise HTTPException(404, "profile not found")
+    return JSONResponse(profile)
+
+
+async def put_profile(request: Request) -> JSONResponse:
+    db_path, user_id = _user_db(request)
+    body = await _json_body(request)
+    # calc_tdee が受け付ける値だけを保存する（保存後の GET /tdee が 500 にならないように）
+    data = {
+        "age": _number(body, "age", int),
+        "sex": _choice(body, "sex", SAFETY_FLOOR),
+        "height_cm": _number(body, "height_cm"),
+        "weight_kg": _number(body, "weight_kg"),
+        "goal_weight_kg": _number(body, "goal_weight_kg"),
+        "activity_level": _choice(body, "activity_level", ACTIVITY_FACTORS),
+        "calorie_deficit": _number(body, "calorie_deficit", int, 350),
+    }
+    db = get_async_db(db_path)
+    await db.upsert_profile(data, user_id)
+    return JSONResponse(await db.get_profile(user_id))
+
+
+async def get_tdee(request: Request) -> JSONResponse:
+    db_path, user_id = _user_db(request)
+    profile = await get_async_db(db_path).get_profile(user_id)
+    if profile is None:
+        raise HTTPException(404, "profile not found")
+    return JSONResponse(dataclasses.asdict(calc_tdee_for_profile(profile)))
+
+
+async def post_tdee(request: Request) -> JSONResponse:
+    body = await _json_body(request)
+    result = calc_tdee(
+        weight_kg=_number(body, "weight_kg"),
+        height_cm=_number(body, "height_cm"),
+        age=_number(body, "age", int),
+        sex=_choice(body, "sex", SAFETY_FLOOR),
+        activity_level=_choice(body, "activity_level", ACTIVITY_FACTORS),
+        deficit_kcal=_number(body, "calorie_deficit", int, 350),
+    )
+    return JSONResponse(dataclasses.asdict(result))
+
+
+async def get_food_log(request: Request) -> JSONResponse:
+    db_path, user_id = _user_db(request)
+    date_str = _bulk_rule(_date, dict(request.query_params), "date")
+    return JSONResponse(await get_async_db(db_path).get_daily_log(date_str, user_id))
+
+
+async def post_food_log(request: Request) -> JSONResponse:
+    db_path, user_id = _user_db(request)
+    body = await _json_body(request)
+    # 日付・数値は一括インポートと同じ規則（YYYY-MM-DD、0 以上）
+    entry = {key: _required(body, key) for key in ("meal_type", "recipe_title")}
+    entry["log_date"] = _bulk_rule(_date, body, "log_date")
+    entry["calories_kcal"] = _bulk_rule(_non_negative, body, "calories_kcal")
+    entry.update({k: _bulk_rule(_non_negative, body, k, 0.0) for k in ("protein_g", "fat_g", "carbs_g")})
+    if body.get("recipe_id"):
+        entry["recipe_id"] = str(body["recipe_id"])
+    await get_async_db(db_path).add_food_log_entry(entry, user_id)
+    return JSONResponse({"status": "ok"}, status_code=201)
+
+
+async def delete_food_log(request: Request) -> JSONResponse:
+    db_path, user_id = _user_db(request)
+    await get_async_db(db_path).delete_food_log_entry(int(request.path_params["entry_id"]), user_id)
+    return JSONResponse({"status": "ok"})
+
+
+async def get_totals(request: Request) -> JSONResponse:
+    """
+    ?date=YYYY-MM-DD で1日分、?start=&end=&period=day|week|month で期間集計
+    """
+    db_path, user_id = _user_db(request)
+    db = get_async_db(db_path)
+    params = dict(request.query_params)
+    if params.get("date"):
+        return JSONResponse(await db.get_daily_totals(_bulk_rule(_date, params, "date"), user_id))
+    if not params.get("start") or not params.get("end"):
+        raise HTTPException(400, "date or start/end is required")
+    start, end = _bulk_rule(_date, params, "start"), _bulk_rule(_date, params, "end")
+    period = _choice(params, "period", PERIODS) if params.get("period") else "day"
+    return JSONResponse(await db.get_period_totals(start, end, period, user_id))
+
+
+async def get_weight(request: Request) -> JSONResponse:
+    db_path, user_id = _user_db(request)
+    days = _int_param(request, "days", 30)
+    return JSONResponse(await get_async_db(db_path).get_weight_history(days, user_id))
+
+
+async def post_weight(request: Request) -> JSONResponse:
+    db_path, user_id = _user_db(request)
+    body = await _json_body(request)
+    await get_async_db(db_path).upsert_weight(
+        _bulk_rule(_date, body, "log_date"),
+        _number(body, "weight_kg"),
+        _number(body, "body_fat_pct", float, None),
+        user_id,
+    )
+    return JSONResponse({"status": "ok"}, status_code=201)
+
+
+# ===== 献立 =====
+
+def _macro_targets(body: dict) -> Optional[MacroTargets]:
+    t = body.get("targets")
+    if t is None:
+        return None
+    if not isinstance(t, dict):
+        raise HTTPException(400, "targets must be an object")
+    return MacroTargets(_number(t, "protein_g"), _number(t, "fat_g"), _number(t, "carbs_g"))
+
+
+def _objects(body: dict, key: str) -> List[dict]:
+    items = body.get(key) or []
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        raise HTTPException(400, f"{key} must be a list of objects")
+    return items
+
+
+def _meal_types(body: dict) -> Optional[List[str]]:
+    meal_types = body.get("meal_types")
+    if meal_types is not None and (
+        not isinstance(meal_types, list) or not all(isinstance(m, str) for m in meal_types)
+    ):
+        raise HTTPException(400, "meal_types must be a list of strings")
+    return meal_types
+
+
+def _plan_json(meals: dict) -> dict:
+    return {meal: dict(r) if r else None for meal, r in meals.items()}
+
+
+async def meal_plan(request: Request) -> JSONResponse:
+    """
+    remaining_kcal を省略し user_id を渡すと、目標カロリー − 当日摂取量から計算する（PFC 目標も同様）
+    - targets: {"protein_g", "fat_g", "carbs_g"} を渡すとその PFC にも合わせる
+    """
+    settings: Settings = request.app.state.settings
+    body = await _json_body(request)
+    remaining = _number(body, "remaining_kcal", float, None)
+    targets = _macro_targets(body)
+    if remaining is None:
+        user_id = _authorize(request, str(_required(body, "user_id")))
+        db = get_async_db(user_db_path(settings, user_id))
+        profile = await db.get_profile(user_id)
+        if profile is None:
+            raise HTTPException(400, "remaining_kcal is required when the profile is not set")
+        totals = await db.get_daily_totals(str(_required(body, "date")), user_id)
+        tdee_result = calc_tdee_for_profile(profile)
+        remaining = max(0.0, tdee_result.target_kcal - totals["calories_kcal"])
+        if targets is None:
+            targets = remaining_targets(tdee_result, totals)
+    plan = await asyncio.to_thread(
+        lambda: suggest_meal_plan(
+            get_catalog(settings).recipes, remaining, _meal_types(body), targets=targets
+        )
+    )
+    return JSONResponse({
+        "remaining_kcal": remaining,
+        "targets": dataclasses.asdict(targets) if targets else None,
+        "plan": _plan_json(plan),
+    })
+
+
+async def week_plan(request: Request) -> JSONResponse:
+    """
+    daily_kcal を省略し user_id を渡すと、プロフィールの目標カロリー・PFC を使う
+    - locked: [{"day", "meal_type", "recipe_id"}] / banned: [{"day", "recipe_id"}]（day は 0 始まり）
+    - 同じ条件の日はキャッシュから返るので、1枠だけ変えて呼び直すのは安い
+    """
+    settings: Settings = request.app.state.settings
+    body = await _json_body(request)
+    daily_kcal = _number(body, "daily_kcal", float, None)
+    targets = _macro_targets(body)
+    if daily_kcal is None:
+        user_id = _authorize(request, str(_required(body, "user_id")))
+        profile = await get_async_db(user_db_path(settings, user_id)).get_profile(user_id)
+        if profile is None:
+            raise HTTPException(400, "daily_kcal is required when the profile is not set")
+        tdee_result = calc_tdee_for_profile(profile)
+        daily_kcal = tdee_result.target_kcal
+        if targets is None:
+            targets = MacroTargets(
+                tdee_result.protein_target_g, tdee_result.fat_target_g, tdee_result.carbs_target_g
+            )
+    locked = {
+        (_number(item, "day", int), str(_required(item, "meal_type"))): str(_required(item, "recipe_id"))
+        for item in _objects(body, "locked")
+    }
+    banned: dict = {}
+    for item in _objects(body, "banned"):
+        banned.setdefault(_number(item, "day", int), []).append(str(_required(item, "recipe_id")))
+    days = _number(body, "days", int, WEEK_DAYS)
+    no_repeat_days = _number(body, "no_repeat_days", int, NO_REPEAT_DAYS)
+    catalog = get_catalog(settings)
+    unknown = [r for r in (*locked.values(), *(i for ids in banned.values() for i in ids)) if catalog.get(r) is None]
+    if unknown:
+        raise HTTPException(400, f"unknown recipe id: {unknown[0]}")
+    outside = [d for d in (*(d for d, _ in locked), *banned) if not 0 <= d < days]
+    if outside:
+        raise HTTPException(400, f"day must be between 0 and {days - 1}: {outside[0]}")
+
+    week = await asyncio.to_thread(
+        plan_week,
+        catalog.recipes,
+        daily_kcal,
+        _meal_types(body),
+        targets,
+        days=days,
+        no_repeat_days=no_repeat_days,
+        locked=locked,
+        banned=banned,
+    )
+    return JSONResponse({
+        "daily_kcal": daily_kcal,
+        "targets": dataclasses.asdict(targets) if targets else None,
+        "days": [{"totals": d.totals, "plan": _plan_json(d.meals)} for d in week.days],
+        "solved_days": week.solved_days,
+    })
+
+
+async def recipes_by_ingredients(request: Request) -> JSONResponse:
+    settings: Settings = request.app.state.settings
+    body = await _json_body(request)
+    ingredients = _required(body, "ingredients")
+    if isinstance(ingredients, str):
+        ingredients = [i.strip() for i in ingredients.replace("、", ",").split(",") if i.strip()]
+    if not isinstance(ingredients, list):
+        raise HTTPException(400, "ingredients must be a string or a list")
+    limit = _number(body, "limit", int, 50)
+    results = await asyncio.to_thread(
+        lambda: find_recipes_by_ingredients(get_catalog(settings), [str(i) for i in ingredients], limit=limit)
+    )
+    return JSONResponse([{"match_count": count, "recipe": dict(recipe)} for count, recipe in results])
+
+
+async def shopping_list(request: Request) -> JSONResponse:
+    settings: Settings = request.app.state.settings
+    body = await _json_body(request)
+    ids = body.get("recipe_ids") or []
+    titles = body.get("titles") or []
+    if not ids and not titles:
+        raise HTTPException(400, "recipe_ids or titles is required")
+
+    def build() -> dict:
+        catalog = get_catalog(settings)
+        selected = [r for r in map(catalog.get, map(str, ids)) if r is not None]
+        return generate_shopping_list(selected + catalog.by_titles(map(str, titles)), catalog.version)
+
+    return JSONResponse(await asyncio.to_thread(build))
+
+
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok"})
+
+
+# ===== アプリ =====
+
+def _warm_up(settings: Settings) -> None:
+    user_db_path(settings, settings.default_user_id)
+    get_catalog(settings)
+    get_vectorstore(settings)
+    get_keyword_index(settings)
+
+
+async def _constraint_error(request: Request, exc: Exception) -> JSONResponse:
+    return JSONResponse({"detail": str(exc)}, status_code=400)
+
+
+async def _http_error(request: Request, exc: HTTPException) -> JSONResponse:
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+
+
+def create_app(settings: Optional[Settings] = None) -> Starlette:
+    settings = settings or get_settings()
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        # 最初のリクエストを待たずにインデックスをロード（なければ構築）しておく
+        await asyncio.to_thread(_warm_up, settings)
+        yield
+        # 積まれたままの書き込みを commit してから終わる（await が返った書き込みは commit 済み、を守る）
+        await close_all_async_dbs()
+        close_all_connections()
+
+    routes = [
+        Route("/health", health),
+        Route("/search", search, methods=["POST"]),
+        Route("/answer", answer, methods=["POST"]),
+        Route("/answer/stream", answer_stream, methods=["POST"]),
+        Route("/tdee", post_tdee, methods=["POST"]),
+        Route("/plan", meal_plan, methods=["POST"]),
+        Route("/plan/week", week_plan, methods=["POST"]),
+        Route("/recipes/by-ingredients", recipes_by_ingredients, methods=["POST"]),
+        Route("/shopping-list", shopping_list, methods=["POST"]),
+        Route("/users/{user_id}/profile", get_profile, methods=["GET"]),
+        Route("/users/{user_id}/profile", put_profile, methods=["PUT"]),
+        Route("/users/{user_id}/tdee", get_tdee, methods=["GET"]),
+        Route("/users/{user_id}/food-log", get_food_log, methods=["GET"]),
+        Route("/users/{user_id}/food-log", post_food_log, methods=["POST"]),
+        Route("/users/{user_id}/food-log/{entry_id:int}", delete_food_log, methods=["DELETE"]),
+        Route("/users/{user_id}/totals", get_totals, methods=["GET"]),
+        Route("/users/{user_id}/weight", get_weight, methods=["GET"]),
+        Route("/users/{user_id}/weight", post_weight, methods=["POST"]),
+    ]
+    app = Starlette(
+        routes=routes,
+        lifespan=lifespan,
+        exception_handlers={
+            HTTPException: _http_error,
+            # 入力の検証は HTTPException(400) で返す。それ以外の ValueError などは 500（内容は返さない）
+            sqlite3.IntegrityError: _constraint_error,  # CHECK 制約違反（meal_type など）
+        },
+    )
+    app.state.settings = settings
+    app.state.api_tokens = parse_api_tokens(settings.api_tokens)
+    if not app.state.api_tokens and not settings.user_header:
+        logging.warning(
+            "API has no authentication: %s",
+            "any user_id is accepted (DIET_ALLOW_UNAUTHENTICATED_USERS)"
+            if settings.allow_unauthenticated_users
+            else f"single-tenant, only user_id={settings.default_user_id!r} is served",
+        )
+    return app
+
+
+load_dotenv()
+app = create_app()
@@ -6,24 +6,72 @@ import os
 class Settings:
     db_dir: str = "chroma_db"
     collection_name: str = "recipes"
+    vector_store: str = "chroma"
+    vector_dtype: str = "float32"
+    embedding_backend: str = "openai"
     embedding_model: str = "text-embedding-3-small"
+    local_embedding_dim: int = 512
     chat_model: str = "gpt-4o-mini"
     chunk_size: int = 700
     chunk_overlap: int = 100
     top_k_default: int = 3
+    retrieval_mode: str = "hybrid"
     temperature_default: float = 0.2
+    recipe_source: str = ""
     sqlite_db_path: str = "diet.db"
+    default_user_id: str = "default"
+    db_sharding: str = "none"
+    db_shard_count: int = 16
+    user_header: str = ""
+    allow_unauthenticated_users: bool = False
+    api_tokens: str = ""
+    embedding_cache_path: str = "embedding_cache.db"
+    embedding_cache_max_entries: int = 100_000
+    answer_cache_path: str = "answer_cache.db"
+    answer_cache_ttl_sec: float = 86400.0
+    answer_cache_max_entries: int = 10_000
+    answer_cache_similarity: float = 0.0
+    embed_batch_size: int = 64
+    embed_max_workers: int = 4
+    embed_max_retries: int = 3
+    index_page_size: int = 1000
+    query_batch_max_size: int = 32
+    query_batch_max_wait_ms: float = 5.0
 
 
 def get_settings() -> Settings:
     return Settings(
         db_dir=os.getenv("RAG_DB_DIR", "chroma_db"),
         collection_name=os.getenv("RAG_COLLECTION", "recipes"),
+        vector_store=os.getenv("RAG_VECTOR_STORE", "chroma"),
+        vector_dtype=os.getenv("RAG_VECTOR_DTYPE", "float32"),
+        embedding_backend=os.getenv("EMBEDDING_BACKEND", "openai"),
         embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+        local_embedding_dim=int(os.getenv("LOCAL_EMBEDDING_DIM", "512")),
         chat_model=os.getenv("CHAT_MODEL", "gpt-4o-mini"),
         chunk_size=int(os.getenv("RAG_CHUNK_SIZE", "700")),
         chunk_overlap=int(os.getenv("RAG_CHUNK_OVERLAP", "100")),
         top_k_default=int(os.getenv("RAG_TOP_K_DEFAULT", "3")),
+        retrieval_mode=os.getenv("RAG_RETRIEVAL_MODE", "hybrid"),
         temperature_default=float(os.getenv("RAG_TEMPERATURE_DEFAULT", "0.2")),
+        recipe_source=os.getenv("RECIPE_SOURCE", ""),
         sqlite_db_path=os.getenv("DIET_DB_PATH", "diet.db"),
+        default_user_id=os.getenv("DIET_USER_ID", "default"),
+        db_sharding=os.getenv("DIET_DB_SHARDING", "none"),
+        db_shard_count=int(os.getenv("DIET_DB_SHARDS", "16")),
+        user_header=os.getenv("DIET_USER_HEADER", ""),
+        allow_unauthenticated_users=os.getenv("DIET_ALLOW_UNAUTHENTICATED_USERS", "") in ("1", "true", "yes"),
+        api_tokens=os.getenv("DIET_API_TOKENS", ""),
+        embedding_cache_path=os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db"),
+        embedding_cache_max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000")),
+        answer_cache_path=os.getenv("ANSWER_CACHE_PATH", "answer_cache.db"),
+        answer_cache_ttl_sec=float(os.getenv("ANSWER_CACHE_TTL_SEC", "86400")),
+        answer_cache_max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000")),
+        answer_cache_similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0")),
+        embed_batch_size=int(os.getenv("RAG_EMBED_BATCH_SIZE", "64")),
+        embed_max_workers=int(os.getenv("RAG_EMBED_MAX_WORKERS", "4")),
+        embed_max_retries=int(os.getenv("RAG_EMBED_MAX_RETRIES", "3")),
+        index_page_size=int(os.getenv("RAG_INDEX_PAGE_SIZE", "1000")),
+        query_batch_max_size=int(os.getenv("RAG_QUERY_BATCH_SIZE", "32")),
+        query_batch_max_wait_ms=float(os.getenv("RAG_QUERY_BATCH_WAIT_MS", "5")),
     )
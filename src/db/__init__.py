@@ -1,3 +1,3 @@
-from src.db.schema import init_db, get_connection
+from src.db.schema import init_db, get_connection, connection, unit_of_work
 
-__all__ = ["init_db", "get_connection"]
+__all__ = ["init_db", "get_connection", "connection", "unit_of_work"]
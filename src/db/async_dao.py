@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.db import food_log, user_profile, weight_log
+from src.db.schema import DEFAULT_USER_ID, get_connection
+
+# 書き込みスレッドが1回の commit にまとめる件数と、後続の書き込みを待つ時間
+WRITE_BATCH_MAX = 256
+WRITE_BATCH_WAIT_SEC = 0.002
+# 書き込みのない状態がこれだけ続いたら書き込みスレッドを止める（次の書き込みで立ち上げ直す）
+WRITER_IDLE_SEC = 60.0
+# get_async_db が持っておく DB ファイル数。超えたら最も長く使われていないものを止める
+ASYNC_DB_CACHE_SIZE = 64
+
+_Write = Callable[[sqlite3.Connection], Any]
+_Job = Tuple[_Write, asyncio.Future, asyncio.AbstractEventLoop]
+
+_STOP = object()
+
+
+class AsyncDB:
+    """
+    asyncio から使う DAO
+    - 書き込み: 専用スレッドが1本の接続でキューを処理し、溜まった分を1回の commit にまとめる。
+      1件ごとに SAVEPOINT を切るので、失敗した書き込みだけが例外になり他は確定する
+    - 読み取り: 同期 DAO（接続プール）を asyncio.to_thread で呼ぶ。WAL なので書き込みを待たない
+    await が返った時点で commit 済み
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_max: int = WRITE_BATCH_MAX,
+        batch_wait_sec: float = WRITE_BATCH_WAIT_SEC,
+        idle_sec: float = WRITER_IDLE_SEC,
+    ) -> None:
+        self.db_path = db_path
+        self.batch_max = batch_max
+        self.batch_wait_sec = batch_wait_sec
+        self.idle_sec = idle_sec
+        self.commits = 0
+        self.writes = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # ===== 書き込みスレッド =====
+
+    def _enqueue(self, item: Any) -> None:
+        """
+        書き込みスレッドがなければ立ち上げてから積む（スレッドの終了判定と同じロックの中で）
+        - スレッドは立ち上げた時点の self._queue だけを読む。stop() はキューごと差し替えるので、
+          止まりかけのスレッドと新しいスレッドが同じキューを取り合うことはない
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run_writer, args=(self._queue,),
+                    name=f"db-writer:{self.db_path}", daemon=True,
+                )
+                self._thread.start()
+            self._queue.put(item)
+
+    def _next_job(self, jobs: "queue.Queue[Any]") -> Any:
+        """
+        次の書き込み。WRITER_IDLE_SEC 待っても来なければ _STOP（キューが空のままなのをロックの中で確かめる）
+        """
+        while True:
+            try:
+                return jobs.get(timeout=self.idle_sec)
+            except queue.Empty:
+                pass
+            with self._lock:
+                if jobs.empty():
+                    if self._thread is threading.current_thread():
+                        self._thread = None
+                    return _STOP
+
+    def _next_batch(self, jobs: "queue.Queue[Any]", first: Any) -> Tuple[List[_Job], bool]:
+        batch = [first]
+        while len(batch) < self.batch_max:
+            try:
+                item = jobs.get(timeout=self.batch_wait_sec)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run_writer(self, jobs: "queue.Queue[Any]") -> None:
+        con = get_connection(self.db_path)
+        con.isolation_level = None  # BEGIN / COMMIT を自分で出す
+        stop = False
+        try:
+            while not stop:
+                first = self._next_job(jobs)
+                if first is _STOP:
+                    break
+                batch, stop = self._next_batch(jobs, first)
+                self._commit_batch(con, batch)
+        finally:
+            con.close()
+
+    def _commit_batch(self, con: sqlite3.Connection, batch: List[_Job]) -> None:
+        outcomes: List[Tuple[bool, Any]] = []
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            for write, _, _ in batch:
+                con.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((True, write(con)))
+                    con.execute("RELEASE job")
+                except Exception as exc:
+                    con.execute("ROLLBACK TO job")
+                    con.execute("RELEASE job")
+                    outcomes.append((False, exc))
+            con.execute("COMMIT")
+            self.commits += 1
+            self.writes += len(batch)
+        except Exception as exc:
+            # BEGIN / COMMIT 自体の失敗（ロック待ちのタイムアウトなど）はバッチ全体を失敗にする
+            logging.warning("Grouped commit failed (%d writes): %s", len(batch), exc)
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            outcomes = [(False, exc)] * len(batch)
+
+        for (_, future, loop), (ok, value) in zip(batch, outcomes):
+            try:
+                loop.call_soon_threadsafe(_resolve, future, ok, value)
+            except RuntimeError:
+                pass  # 呼び出し元のイベントループが先に閉じられた
+
+    async def _write(self, write: _Write) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._enqueue((write, future, loop))
+        return await future
+
+    def stop(self) -> Optional[threading.Thread]:
+        """
+        キューに積まれた書き込みを commit し終えたら書き込みスレッドが止まるようにする（待たない）
+        - この後の書き込みは新しいキューに積まれ、新しいスレッドが処理する
+          （止まりかけのスレッドとは BEGIN IMMEDIATE で順番に commit する）
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return None
+            self._queue.put(_STOP)
+            self._queue = queue.Queue()
+            self._thread = None
+        return thread
+
+    async def close(self) -> None:
+        """
+        キューに積まれた書き込みを全部 commit してから書き込みスレッドを止める
+        """
+        thread = self.stop()
+        if thread is not None:
+            await asyncio.to_thread(thread.join)
+
+    # ===== food_log =====
+
+    async def add_food_log_entry(self, entry: dict, user_id: str = DEFAULT_USER_ID) -> None:
+        await self._write(lambda con: food_log.insert_food_log_entry(con, entry, user_id))
+
+    async def delete_food_log_entry(self, entry_id: int, user_id: str = DEFAULT_USER_ID) -> None:
+        await self._write(lambda con: food_log.delete_food_log_row(con, entry_id, user_id))
+
+    async def get_daily_log(self, date_str: str, user_id: str = DEFAULT_USER_ID) -> list[dict]:
+        return await asyncio.to_thread(food_log.get_daily_log, self.db_path, date_str, user_id)
+
+    async def get_daily_totals(self, date_str: str, user_id: str = DEFAULT_USER_ID) -> dict:
+        return await asyncio.to_thread(food_log.get_daily_totals, self.db_path, date_str, user_id)
+
+    async def get_period_totals(
+        self,
+        start_date: str,
+        end_date: str,
+        period: str = "day",
+        user_id: str = DEFAULT_USER_ID,
+    ) -> list[dict]:
+        return await asyncio.to_thread(
+            food_log.get_period_totals, self.db_path, start_date, end_date, period, user_id
+        )
+
+    # ===== weight_log =====
+
+    async def upsert_weight(
+        self,
+        date_str: str,
+        weight_kg: float,
+        body_fat_pct: float | None = None,
+        user_id: str = DEFAULT_USER_ID,
+    ) -> None:
+        await self._write(
+            lambda con: weight_log.upsert_weight_row(con, date_str, weight_kg, body_fat_pct, user_id)
+        )
+
+    async def get_weight_history(self, days: int = 30, user_id: str = DEFAULT_USER_ID) -> list[dict]:
+        return await asyncio.to_thread(weight_log.get_weight_history, self.db_path, days, user_id)
+
+    # ===== user_profile =====
+
+    async def upsert_profile(self, data: dict, user_id: str = DEFAULT_USER_ID) -> None:
+        await self._write(lambda con: user_profile.upsert_profile_row(con, data, user_id))
+
+    async def get_profile(self, user_id: str = DEFAULT_USER_ID) -> dict | None:
+        return await asyncio.to_thread(user_profile.get_profile, self.db_path, user_id)
+
+
+def _resolve(future: asyncio.Future, ok: bool, value: Any) -> None:
+    if future.cancelled():
+        return
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+_instances: "OrderedDict[str, AsyncDB]" = OrderedDict()
+_instances_lock = threading.Lock()
+
+
+def get_async_db(db_path: str) -> AsyncDB:
+    """
+    DB ファイルごとに1つ（書き込みスレッドも1本）をプロセス内で共有する
+    - ASYNC_DB_CACHE_SIZE を超えたら最も長く使われていないものを stop() する。
+      外した後に手元の参照から書き込まれても、スレッドは立ち上げ直され、暇になれば止まる
+    """
+    with _instances_lock:
+        db = _instances.get(db_path)
+        if db is not None:
+            _instances.move_to_end(db_path)
+            return db
+        db = AsyncDB(db_path)
+        _instances[db_path] = db
+        evicted = _instances.popitem(last=False)[1] if len(_instances) > ASYNC_DB_CACHE_SIZE else None
+    if evicted is not None:
+        evicted.stop()
+    return db
+
+
+async def close_all_async_dbs() -> None:
+    """
+    get_async_db で作ったものを全部 close する（積まれた書き込みは commit してから）
+    """
+    with _instances_lock:
+        dbs = list(_instances.values())
+        _instances.clear()
+    await asyncio.gather(*(db.close() for db in dbs))
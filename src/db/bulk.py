@@ -0,0 +1,383 @@
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.config import get_settings
+from src.db.food_log import MEAL_TYPES
+from src.db.schema import DEFAULT_USER_ID, connection, init_db, unit_of_work
+from src.db.sharding import user_db_path
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+FOOD_LOG_COLUMNS = (
+    "log_date", "meal_type", "recipe_id", "recipe_title",
+    "calories_kcal", "protein_g", "fat_g", "carbs_g", "created_at",
+)
+WEIGHT_LOG_COLUMNS = ("log_date", "weight_kg", "body_fat_pct")
+
+_INSERT_FOOD_LOG = """INSERT INTO food_log
+   (user_id, log_date, meal_type, recipe_id, recipe_title,
+    calories_kcal, protein_g, fat_g, carbs_g, created_at)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, datetime('now','localtime')))"""
+
+_UPSERT_WEIGHT_LOG = """INSERT INTO weight_log (user_id, log_date, weight_kg, body_fat_pct)
+   VALUES (?, ?, ?, ?)
+   ON CONFLICT(user_id, log_date) DO UPDATE SET
+       weight_kg=excluded.weight_kg,
+       body_fat_pct=excluded.body_fat_pct"""
+
+
+class BulkImportError(ValueError):
+    """
+    検証に失敗した行がある。errors は (行番号, 理由) のリスト。何も書き込まれていない
+    """
+
+    def __init__(self, errors: List[Tuple[int, str]], total_errors: int) -> None:
+        self.errors = errors
+        self.total_errors = total_errors
+        lines = "\n".join(f"  line {n}: {msg}" for n, msg in errors)
+        more = total_errors - len(errors)
+        suffix = f"\n  ...and {more} more" if more > 0 else ""
+        super().__init__(f"{total_errors} invalid row(s):\n{lines}{suffix}")
+
+
+# ===== 検証（スキーマの NOT NULL / CHECK 制約に合わせる） =====
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _date(row: dict, key: str) -> str:
+    value = row.get(key)
+    if _blank(value):
+        raise ValueError(f"{key} is required")
+    # fromisoformat は「20260105」「2026-W02-1」も受け付けるので、YYYY-MM-DD に揃えて保存する
+    return datetime.date.fromisoformat(str(value).strip()).isoformat()
+
+
+def _number(row: dict, key: str, default: Optional[float] = None) -> Optional[float]:
+    value = row.get(key)
+    if _blank(value):
+        if default is None:
+            raise ValueError(f"{key} is required")
+        return default
+    number = float(value)
+    # float は "nan" / "inf" も読めてしまい、NaN は CHECK (>= 0) もすり抜ける
+    if not math.isfinite(number):
+        raise ValueError(f"{key} must be a finite number: {value}")
+    if number < 0:
+        raise ValueError(f"{key} must be >= 0: {value}")
+    return number
+
+
+def _optional_number(row: dict, key: str) -> Optional[float]:
+    return None if _blank(row.get(key)) else _number(row, key)
+
+
+def _food_log_params(row: dict, user_id: str) -> tuple:
+    meal_type = str(row.get("meal_type") or "").strip()
+    if meal_type not in MEAL_TYPES:
+        raise ValueError(f"meal_type must be one of {MEAL_TYPES}: {meal_type!r}")
+    title = str(row.get("recipe_title") or "").strip()
+    if not title:
+        raise ValueError("recipe_title is required")
+    created_at = row.get("created_at")
+    return (
+        user_id, _date(row, "log_date"), meal_type,
+        None if _blank(row.get("recipe_id")) else str(row["recipe_id"]),
+        title, _number(row, "calories_kcal"),
+        _number(row, "protein_g", 0.0), _number(row, "fat_g", 0.0), _number(row, "carbs_g", 0.0),
+        None if _blank(created_at) else str(created_at).strip(),
+    )
+
+
+def _weight_log_params(row: dict, user_id: str) -> tuple:
+    weight = _number(row, "weight_kg")
+    if weight == 0:
+        raise ValueError("weight_kg must be > 0")
+    return (user_id, _date(row, "log_date"), weight, _optional_number(row, "body_fat_pct"))
+
+
+# ===== 入力ファイル =====
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt == "ndjson":
+        fmt = "jsonl"
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"format must be csv or jsonl: {path}")
+    return fmt
+
+
+def read_rows(
+    path: str, fmt: Optional[str] = None
+) -> Iterator[Tuple[int, Union[dict, ValueError]]]:
+    """
+    (行番号, 行の dict) を1行ずつ返す。ファイル全体は読み込まない
+    - JSONL で読めない行は dict の代わりに ValueError を返し、他の行と同じく行番号つきで報告させる
+    """
+    fmt = detect_format(path, fmt)
+    # utf-8-sig: Excel が付ける BOM を読み飛ばす
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield line_no, ValueError(f"invalid JSON: {exc.msg} (column {exc.colno})")
+                    continue
+                if not isinstance(row, dict):
+                    yield line_no, ValueError(f"line must be a JSON object, got {type(row).__name__}")
+                    continue
+                yield line_no, row
+
+
+# ===== インポート =====
+
+def _bulk_import(
+    db_path: str,
+    rows: Iterable[Tuple[int, Union[dict, ValueError]]],
+    sql: str,
+    to_params: Callable[[dict, str], tuple],
+    user_id: str,
+    batch_size: int,
+) -> int:
+    """
+    検証しながら batch_size 行ずつ executemany し、最後に1回だけ commit する
+    - 1行でも不正なら残りは検証だけ続けてまとめて報告し、全体を rollback する
+    """
+    errors: List[Tuple[int, str]] = []
+    total_errors = 0
+    count = 0
+    with unit_of_work(db_path) as con:
+        batch: List[tuple] = []
+        for line_no, row in rows:
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                params = to_params(row, user_id)
+            except (ValueError, TypeError, AttributeError) as exc:
+                total_errors += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append((line_no, str(exc)))
+                continue
+            if total_errors:
+                continue
+            batch.append(params)
+            if len(batch) >= batch_size:
+                con.executemany(sql, batch)
+                count += len(batch)
+                batch.clear()
+        if total_errors:
+            raise BulkImportError(errors, total_errors)
+        if batch:
+            con.executemany(sql, batch)
+            count += len(batch)
+    return count
+
+
+def _numbered(rows: Iterable[dict]) -> Iterator[Tuple[int, dict]]:
+    return enumerate(rows, start=1)
+
+
+def import_food_log(
+    db_path: str,
+    rows: Iterable[dict],
+    user_id: str = DEFAULT_USER_ID,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """
+    食事ログを一括追加し、追加件数を返す。created_at を省略した行は現在時刻
+    """
+    return _bulk_import(
+        db_path, _numbered(rows), _INSERT_FOOD_LOG, _food_log_params, user_id, batch_size
+    )
+
+
+def import_weight_log(
+    db_path: str,
+    rows: Iterable[dict],
+    user_id: str = DEFAULT_USER_ID,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """
+    体重ログを一括登録する（同じ日付は上書き）
+    """
+    return _bulk_import(
+        db_path, _numbered(rows), _UPSERT_WEIGHT_LOG, _weight_log_params, user_id, batch_size
+    )
+
+
+_IMPORTERS = {
+    "food_log": (_INSERT_FOOD_LOG, _food_log_params),
+    "weight_log": (_UPSERT_WEIGHT_LOG, _weight_log_params),
+}
+
+
+def import_file(
+    db_path: str,
+    table: str,
+    path: str,
+    fmt: Optional[str] = None,
+    user_id: str = DEFAULT_USER_ID,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    sql, to_params = _IMPORTERS[table]
+    return _bulk_import(db_path, read_rows(path, fmt), sql, to_params, user_id, batch_size)
+
+
+# ===== エクスポート =====
+
+def _iter_query(
+    db_path: str, sql: str, params: tuple, batch_size: int
+) -> Iterator[Dict[str, Any]]:
+    # 最後まで読むか close() されるまでプールの接続を1本占有する
+    with connection(db_path) as con:
+        cur = con.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for r in rows:
+                yield dict(r)
+
+
+def _date_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[str, str]:
+    return start_date or "0000-01-01", end_date or "9999-12-31"
+
+
+def iter_food_log(
+    db_path: str,
+    user_id: str = DEFAULT_USER_ID,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    食事ログを日付・登録順に1行ずつ返す（fetchmany で batch_size 行ずつ読む）
+    """
+    return _iter_query(
+        db_path,
+        f"""SELECT {", ".join(FOOD_LOG_COLUMNS)} FROM food_log
+            WHERE user_id=? AND log_date BETWEEN ? AND ?
+            ORDER BY log_date, created_at""",
+        (user_id, *_date_range(start_date, end_date)),
+        batch_size,
+    )
+
+
+def iter_weight_log(
+    db_path: str,
+    user_id: str = DEFAULT_USER_ID,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    return _iter_query(
+        db_path,
+        f"""SELECT {", ".join(WEIGHT_LOG_COLUMNS)} FROM weight_log
+            WHERE user_id=? AND log_date BETWEEN ? AND ?
+            ORDER BY log_date""",
+        (user_id, *_date_range(start_date, end_date)),
+        batch_size,
+    )
+
+
+_EXPORTERS = {
+    "food_log": (iter_food_log, FOOD_LOG_COLUMNS),
+    "weight_log": (iter_weight_log, WEIGHT_LOG_COLUMNS),
+}
+
+
+def write_rows(rows: Iterable[dict], columns: Tuple[str, ...], f, fmt: str) -> int:
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, fieldnames=columns, lineterminator="\n")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def export_file(
+    db_path: str,
+    table: str,
+    path: str,
+    fmt: Optional[str] = None,
+    user_id: str = DEFAULT_USER_ID,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> int:
+    """
+    path に書き出して件数を返す。path が "-" なら標準出力（fmt 必須）
+    """
+    iter_rows, columns = _EXPORTERS[table]
+    rows = iter_rows(db_path, user_id, start_date, end_date)
+    if path == "-":
+        return write_rows(rows, columns, sys.stdout, detect_format("", fmt))
+    fmt = detect_format(path, fmt)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        count = write_rows(rows, columns, f, fmt)
+    os.replace(tmp_path, path)
+    return count
+
+
+# ===== CLI =====
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.db.bulk",
+        description="食事ログ・体重ログの CSV / JSONL 一括インポート・エクスポート",
+    )
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("table", choices=sorted(_IMPORTERS))
+    parser.add_argument("path", help="入出力ファイル（export は - で標準出力）")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None,
+                        help="省略時は拡張子から判定")
+    parser.add_argument("--user", default=None, help="user_id（既定: DIET_USER_ID）")
+    parser.add_argument("--db", default=None, help="SQLite ファイル（既定: ユーザーの DB）")
+    parser.add_argument("--start", default=None, help="export の開始日 YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="export の終了日 YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    user_id = args.user or settings.default_user_id
+    if args.db:
+        init_db(args.db)
+    db_path = args.db or user_db_path(settings, user_id)
+
+    if args.command == "import":
+        try:
+            count = import_file(db_path, args.table, args.path, args.format, user_id)
+        except BulkImportError as exc:
+            print(exc, file=sys.stderr)
+            return 1
+        print(f"imported {count} row(s) into {args.table}", file=sys.stderr)
+    else:
+        count = export_file(
+            db_path, args.table, args.path, args.format, user_id, args.start, args.end
+        )
+        print(f"exported {count} row(s) from {args.table}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,54 +1,117 @@
-from src.db.schema import get_connection
+import sqlite3
 
+from src.db.schema import DEFAULT_USER_ID, connection, unit_of_work
 
-def add_food_log_entry(db_path: str, entry: dict) -> None:
-    con = get_connection(db_path)
+# food_log.meal_type の CHECK 制約と同じ並び
+MEAL_TYPES = ("朝食", "昼食", "夕食", "間食")
+
+# query_plan.check_query_plans でインデックス利用を確認するため定数にしている
+DAILY_LOG_SQL = "SELECT * FROM food_log WHERE user_id=? AND log_date=? ORDER BY created_at"
+
+# daily_totals はトリガーで更新される集計表（migrations.py 参照）。1日1行なので主キー検索1回
+DAILY_TOTALS_SQL = """SELECT calories_kcal, protein_g, fat_g, carbs_g
+   FROM daily_totals WHERE user_id=? AND log_date=?"""
+
+_TOTAL_COLUMNS = """SUM(calories_kcal) AS calories_kcal,
+       SUM(protein_g)     AS protein_g,
+       SUM(fat_g)         AS fat_g,
+       SUM(carbs_g)       AS carbs_g,
+       COUNT(*)           AS days,
+       SUM(entry_count)   AS entry_count"""
+
+# 期間の切り方。週は月曜始まり（log_date 以前で直近の月曜）
+_PERIOD_EXPRESSIONS = {
+    "day": "log_date",
+    "week": "date(log_date, '-6 days', 'weekday 1')",
+    "month": "substr(log_date, 1, 7)",
+}
+PERIODS = tuple(_PERIOD_EXPRESSIONS)
+
+
+def insert_food_log_entry(
+    con: sqlite3.Connection, entry: dict, user_id: str = DEFAULT_USER_ID
+) -> None:
+    """
+    commit しない版。unit_of_work や非同期 DAO の書き込みスレッドから呼ぶ
+    """
     con.execute(
         """INSERT INTO food_log
-           (log_date, meal_type, recipe_id, recipe_title,
+           (user_id, log_date, meal_type, recipe_id, recipe_title,
             calories_kcal, protein_g, fat_g, carbs_g)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
         (
-            entry["log_date"], entry["meal_type"], entry.get("recipe_id"),
+            user_id, entry["log_date"], entry["meal_type"], entry.get("recipe_id"),
             entry["recipe_title"], entry["calories_kcal"],
             entry.get("protein_g", 0), entry.get("fat_g", 0), entry.get("carbs_g", 0),
         ),
     )
-    con.commit()
-    con.close()
 
 
-def get_daily_log(db_path: str, date_str: str) -> list[dict]:
-    con = get_connection(db_path)
-    cur = con.cursor()
-    cur.execute(
-        "SELECT * FROM food_log WHERE log_date=? ORDER BY created_at",
-        (date_str,),
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    con.close()
-    return rows
-
-
-def get_daily_totals(db_path: str, date_str: str) -> dict:
-    con = get_connection(db_path)
-    cur = con.cursor()
-    cur.execute(
-        """SELECT
-               COALESCE(SUM(calories_kcal), 0) AS calories_kcal,
-               COALESCE(SUM(protein_g), 0)     AS protein_g,
-               COALESCE(SUM(fat_g), 0)         AS fat_g,
-               COALESCE(SUM(carbs_g), 0)       AS carbs_g
-           FROM food_log WHERE log_date=?""",
-        (date_str,),
-    )
-    row = cur.fetchone()
-    con.close()
+def add_food_log_entry(db_path: str, entry: dict, user_id: str = DEFAULT_USER_ID) -> None:
+    with unit_of_work(db_path) as con:
+        insert_food_log_entry(con, entry, user_id)
+
+
+def get_daily_log(db_path: str, date_str: str, user_id: str = DEFAULT_USER_ID) -> list[dict]:
+    with connection(db_path) as con:
+        cur = con.execute(DAILY_LOG_SQL, (user_id, date_str))
+        return [dict(r) for r in cur.fetchall()]
+
+
+def get_daily_totals(db_path: str, date_str: str, user_id: str = DEFAULT_USER_ID) -> dict:
+    with connection(db_path) as con:
+        cur = con.execute(DAILY_TOTALS_SQL, (user_id, date_str))
+        row = cur.fetchone()
     return dict(row) if row else {"calories_kcal": 0, "protein_g": 0, "fat_g": 0, "carbs_g": 0}
 
 
-def delete_food_log_entry(db_path: str, entry_id: int) -> None:
-    con = get_connection(db_path)
-    con.execute("DELETE FROM food_log WHERE id=?", (entry_id,))
-    con.commit()
-    con.close()
+def get_period_totals(
+    db_path: str,
+    start_date: str,
+    end_date: str,
+    period: str = "day",
+    user_id: str = DEFAULT_USER_ID,
+) -> list[dict]:
+    """
+    start_date〜end_date（両端含む）の合計を period（"day" / "week" / "month"）ごとに返す
+    - period 列: 日付 / 週の月曜日 / "YYYY-MM"
+    - days: 記録のあった日数、entry_count: 記録件数
+    """
+    if period not in _PERIOD_EXPRESSIONS:
+        raise ValueError(f"period must be one of {sorted(_PERIOD_EXPRESSIONS)}: {period}")
+    expr = _PERIOD_EXPRESSIONS[period]
+    with connection(db_path) as con:
+        cur = con.execute(
+            f"""SELECT {expr} AS period,
+                   {_TOTAL_COLUMNS}
+               FROM daily_totals
+               WHERE user_id=? AND log_date BETWEEN ? AND ?
+               GROUP BY period
+               ORDER BY period""",
+            (user_id, start_date, end_date),
+        )
+        return [dict(r) for r in cur.fetchall()]
+
+
+def get_weekly_totals(
+    db_path: str, start_date: str, end_date: str, user_id: str = DEFAULT_USER_ID
+) -> list[dict]:
+    return get_period_totals(db_path, start_date, end_date, "week", user_id=user_id)
+
+
+def get_monthly_totals(
+    db_path: str, start_date: str, end_date: str, user_id: str = DEFAULT_USER_ID
+) -> list[dict]:
+    return get_period_totals(db_path, start_date, end_date, "month", user_id=user_id)
+
+
+def delete_food_log_row(
+    con: sqlite3.Connection, entry_id: int, user_id: str = DEFAULT_USER_ID
+) -> None:
+    # 他のユーザーの記録は id を知っていても消せない
+    con.execute("DELETE FROM food_log WHERE id=? AND user_id=?", (entry_id, user_id))
+
+
+def delete_food_log_entry(db_path: str, entry_id: int, user_id: str = DEFAULT_USER_ID) -> None:
+    with unit_of_work(db_path) as con:
+        delete_food_log_row(con, entry_id, user_id)
@@ -0,0 +1,323 @@
+import logging
+import sqlite3
+from dataclasses import dataclass
+from typing import Tuple
+
+# ===== マイグレーション 1 時点のテーブル定義。以降の変更はマイグレーションで行う =====
+
+CREATE_USER_PROFILE = """
+CREATE TABLE IF NOT EXISTS user_profile (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    age             INTEGER NOT NULL,
+    sex             TEXT    NOT NULL CHECK(sex IN ('male', 'female')),
+    height_cm       REAL    NOT NULL,
+    weight_kg       REAL    NOT NULL,
+    goal_weight_kg  REAL    NOT NULL,
+    activity_level  TEXT    NOT NULL
+                    CHECK(activity_level IN
+                          ('sedentary','light','moderate','active','very_active')),
+    calorie_deficit INTEGER NOT NULL DEFAULT 350,
+    updated_at      TEXT    NOT NULL DEFAULT (datetime('now','localtime'))
+);
+"""
+
+CREATE_FOOD_LOG = """
+CREATE TABLE IF NOT EXISTS food_log (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    log_date      TEXT    NOT NULL,
+    meal_type     TEXT    NOT NULL
+                  CHECK(meal_type IN ('朝食','昼食','夕食','間食')),
+    recipe_id     TEXT,
+    recipe_title  TEXT    NOT NULL,
+    calories_kcal REAL    NOT NULL,
+    protein_g     REAL    NOT NULL DEFAULT 0,
+    fat_g         REAL    NOT NULL DEFAULT 0,
+    carbs_g       REAL    NOT NULL DEFAULT 0,
+    created_at    TEXT    NOT NULL DEFAULT (datetime('now','localtime'))
+);
+"""
+
+CREATE_WEIGHT_LOG = """
+CREATE TABLE IF NOT EXISTS weight_log (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    log_date     TEXT    NOT NULL UNIQUE,
+    weight_kg    REAL    NOT NULL,
+    body_fat_pct REAL,
+    created_at   TEXT    NOT NULL DEFAULT (datetime('now','localtime'))
+);
+"""
+
+
+# ===== マイグレーション 3 時点の daily_totals（user_id なし）。適用済みなので書き換えない =====
+
+_CREATE_DAILY_TOTALS_V3 = """
+CREATE TABLE IF NOT EXISTS daily_totals (
+    log_date      TEXT    PRIMARY KEY,
+    calories_kcal REAL    NOT NULL DEFAULT 0,
+    protein_g     REAL    NOT NULL DEFAULT 0,
+    fat_g         REAL    NOT NULL DEFAULT 0,
+    carbs_g       REAL    NOT NULL DEFAULT 0,
+    entry_count   INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+_DAILY_TOTALS_TRIGGERS_V3 = (
+    """CREATE TRIGGER IF NOT EXISTS trg_food_log_insert_totals
+       AFTER INSERT ON food_log
+       BEGIN
+           INSERT INTO daily_totals
+               (log_date, calories_kcal, protein_g, fat_g, carbs_g, entry_count)
+           VALUES (NEW.log_date, NEW.calories_kcal, NEW.protein_g, NEW.fat_g, NEW.carbs_g, 1)
+           ON CONFLICT(log_date) DO UPDATE SET
+               calories_kcal = calories_kcal + excluded.calories_kcal,
+               protein_g     = protein_g     + excluded.protein_g,
+               fat_g         = fat_g         + excluded.fat_g,
+               carbs_g       = carbs_g       + excluded.carbs_g,
+               entry_count   = entry_count   + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_food_log_delete_totals
+       AFTER DELETE ON food_log
+       BEGIN
+           UPDATE daily_totals SET
+               calories_kcal = calories_kcal - OLD.calories_kcal,
+               protein_g     = protein_g     - OLD.protein_g,
+               fat_g         = fat_g         - OLD.fat_g,
+               carbs_g       = carbs_g       - OLD.carbs_g,
+               entry_count   = entry_count   - 1
+           WHERE log_date = OLD.log_date;
+           DELETE FROM daily_totals WHERE log_date = OLD.log_date AND entry_count <= 0;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_food_log_update_totals
+       AFTER UPDATE OF log_date, calories_kcal, protein_g, fat_g, carbs_g ON food_log
+       BEGIN
+           UPDATE daily_totals SET
+               calories_kcal = calories_kcal - OLD.calories_kcal,
+               protein_g     = protein_g     - OLD.protein_g,
+               fat_g         = fat_g         - OLD.fat_g,
+               carbs_g       = carbs_g       - OLD.carbs_g,
+               entry_count   = entry_count   - 1
+           WHERE log_date = OLD.log_date;
+           DELETE FROM daily_totals WHERE log_date = OLD.log_date AND entry_count <= 0;
+           INSERT INTO daily_totals
+               (log_date, calories_kcal, protein_g, fat_g, carbs_g, entry_count)
+           VALUES (NEW.log_date, NEW.calories_kcal, NEW.protein_g, NEW.fat_g, NEW.carbs_g, 1)
+           ON CONFLICT(log_date) DO UPDATE SET
+               calories_kcal = calories_kcal + excluded.calories_kcal,
+               protein_g     = protein_g     + excluded.protein_g,
+               fat_g         = fat_g         + excluded.fat_g,
+               carbs_g       = carbs_g       + excluded.carbs_g,
+               entry_count   = entry_count   + 1;
+       END""",
+)
+
+_BACKFILL_DAILY_TOTALS_V3 = """
+INSERT INTO daily_totals (log_date, calories_kcal, protein_g, fat_g, carbs_g, entry_count)
+SELECT log_date, SUM(calories_kcal), SUM(protein_g), SUM(fat_g), SUM(carbs_g), COUNT(*)
+FROM food_log
+GROUP BY log_date
+"""
+
+# ===== ユーザー単位のスキーマ（マイグレーション 4 以降） =====
+
+DEFAULT_USER_ID = "default"
+
+_CREATE_WEIGHT_LOG_V4 = """
+CREATE TABLE weight_log (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id      TEXT    NOT NULL DEFAULT 'default',
+    log_date     TEXT    NOT NULL,
+    weight_kg    REAL    NOT NULL,
+    body_fat_pct REAL,
+    created_at   TEXT    NOT NULL DEFAULT (datetime('now','localtime')),
+    UNIQUE(user_id, log_date)
+)
+"""
+
+CREATE_DAILY_TOTALS = """
+CREATE TABLE IF NOT EXISTS daily_totals (
+    user_id       TEXT    NOT NULL,
+    log_date      TEXT    NOT NULL,
+    calories_kcal REAL    NOT NULL DEFAULT 0,
+    protein_g     REAL    NOT NULL DEFAULT 0,
+    fat_g         REAL    NOT NULL DEFAULT 0,
+    carbs_g       REAL    NOT NULL DEFAULT 0,
+    entry_count   INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, log_date)
+)
+"""
+
+_ADD_TOTALS = """INSERT INTO daily_totals
+               (user_id, log_date, calories_kcal, protein_g, fat_g, carbs_g, entry_count)
+           VALUES (NEW.user_id, NEW.log_date, NEW.calories_kcal, NEW.protein_g,
+                   NEW.fat_g, NEW.carbs_g, 1)
+           ON CONFLICT(user_id, log_date) DO UPDATE SET
+               calories_kcal = calories_kcal + excluded.calories_kcal,
+               protein_g     = protein_g     + excluded.protein_g,
+               fat_g         = fat_g         + excluded.fat_g,
+               carbs_g       = carbs_g       + excluded.carbs_g,
+               entry_count   = entry_count   + 1;"""
+
+_SUBTRACT_TOTALS = """UPDATE daily_totals SET
+               calories_kcal = calories_kcal - OLD.calories_kcal,
+               protein_g     = protein_g     - OLD.protein_g,
+               fat_g         = fat_g         - OLD.fat_g,
+               carbs_g       = carbs_g       - OLD.carbs_g,
+               entry_count   = entry_count   - 1
+           WHERE user_id = OLD.user_id AND log_date = OLD.log_date;
+           DELETE FROM daily_totals
+           WHERE user_id = OLD.user_id AND log_date = OLD.log_date AND entry_count <= 0;"""
+
+# daily_totals は food_log のトリガーだけで更新する（DAO・一括投入・手動 SQL のどれでもずれない）
+DAILY_TOTALS_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS trg_food_log_insert_totals
+       AFTER INSERT ON food_log
+       BEGIN
+           {_ADD_TOTALS}
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_food_log_delete_totals
+       AFTER DELETE ON food_log
+       BEGIN
+           {_SUBTRACT_TOTALS}
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_food_log_update_totals
+       AFTER UPDATE OF user_id, log_date, calories_kcal, protein_g, fat_g, carbs_g ON food_log
+       BEGIN
+           {_SUBTRACT_TOTALS}
+           {_ADD_TOTALS}
+       END""",
+)
+
+# 既存の food_log から集計し直す（マイグレーションと rollup rebuild で共用）
+BACKFILL_DAILY_TOTALS = """
+INSERT INTO daily_totals
+    (user_id, log_date, calories_kcal, protein_g, fat_g, carbs_g, entry_count)
+SELECT user_id, log_date, SUM(calories_kcal), SUM(protein_g), SUM(fat_g), SUM(carbs_g), COUNT(*)
+FROM food_log
+GROUP BY user_id, log_date
+"""
+
+CREATE_SCHEMA_VERSION = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version     INTEGER PRIMARY KEY,
+    description TEXT    NOT NULL,
+    applied_at  TEXT    NOT NULL DEFAULT (datetime('now','localtime'))
+)
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    version 順に1回だけ適用する。statements は1文ずつ execute する（トリガーも1文扱い）
+    """
+
+    version: int
+    description: str
+    statements: Tuple[str, ...]
+
+
+# 追加するときは末尾に version を1つ増やして足す。適用済みのものは書き換えない
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(
+        1,
+        "initial tables",
+        (CREATE_USER_PROFILE, CREATE_FOOD_LOG, CREATE_WEIGHT_LOG),
+    ),
+    Migration(
+        2,
+        "food_log indexes",
+        (
+            # get_daily_log: WHERE log_date=? ORDER BY created_at をソートなしで返す
+            "CREATE INDEX IF NOT EXISTS idx_food_log_date_created"
+            " ON food_log(log_date, created_at)",
+            # get_daily_totals: SUM をテーブル本体を読まずにインデックスだけで集計する
+            "CREATE INDEX IF NOT EXISTS idx_food_log_date_totals"
+            " ON food_log(log_date, calories_kcal, protein_g, fat_g, carbs_g)",
+        ),
+    ),
+    Migration(
+        3,
+        "daily_totals rollup",
+        (_CREATE_DAILY_TOTALS_V3, *_DAILY_TOTALS_TRIGGERS_V3, _BACKFILL_DAILY_TOTALS_V3),
+    ),
+    Migration(
+        4,
+        "user_id scoping",
+        (
+            # user_profile: 1ユーザー1行。以前の「先頭行だけ使う」に合わせて余分な行は捨てる
+            "ALTER TABLE user_profile ADD COLUMN user_id TEXT NOT NULL DEFAULT 'default'",
+            "DELETE FROM user_profile WHERE id NOT IN (SELECT MIN(id) FROM user_profile)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_profile_user ON user_profile(user_id)",
+            # food_log: 日付インデックスを (user_id, log_date, ...) に張り替える
+            # （日の合計は daily_totals を読むようになった。集計用のカバリングインデックスは 5 で張り直す）
+            "ALTER TABLE food_log ADD COLUMN user_id TEXT NOT NULL DEFAULT 'default'",
+            "DROP INDEX IF EXISTS idx_food_log_date_created",
+            "DROP INDEX IF EXISTS idx_food_log_date_totals",
+            "CREATE INDEX IF NOT EXISTS idx_food_log_user_date_created"
+            " ON food_log(user_id, log_date, created_at)",
+            # weight_log: UNIQUE(log_date) → UNIQUE(user_id, log_date) は作り直すしかない
+            "ALTER TABLE weight_log RENAME TO weight_log_v3",
+            _CREATE_WEIGHT_LOG_V4,
+            """INSERT INTO weight_log (id, log_date, weight_kg, body_fat_pct, created_at)
+               SELECT id, log_date, weight_kg, body_fat_pct, created_at FROM weight_log_v3""",
+            "DROP TABLE weight_log_v3",
+            # daily_totals: 主キーに user_id を含めて作り直し、トリガーも差し替える
+            "DROP TRIGGER IF EXISTS trg_food_log_insert_totals",
+            "DROP TRIGGER IF EXISTS trg_food_log_delete_totals",
+            "DROP TRIGGER IF EXISTS trg_food_log_update_totals",
+            "DROP TABLE IF EXISTS daily_totals",
+            CREATE_DAILY_TOTALS,
+            *DAILY_TOTALS_TRIGGERS,
+            BACKFILL_DAILY_TOTALS,
+        ),
+    ),
+    Migration(
+        5,
+        "food_log user totals index",
+        (
+            # rollup check / rebuild と日ごとの生集計: (user_id, log_date) 順に SUM を
+            # テーブル本体を読まずにインデックスだけで集計する（4 で消した idx_food_log_date_totals の代わり）
+            "CREATE INDEX IF NOT EXISTS idx_food_log_user_date_totals"
+            " ON food_log(user_id, log_date, calories_kcal, protein_g, fat_g, carbs_g)",
+        ),
+    ),
+)
+
+
+def schema_version(con: sqlite3.Connection) -> int:
+    con.execute(CREATE_SCHEMA_VERSION)
+    row = con.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()
+    return int(row[0])
+
+
+def apply_migrations(con: sqlite3.Connection) -> int:
+    """
+    未適用のマイグレーションを1つずつトランザクションで適用し、適用後の version を返す
+    - BEGIN IMMEDIATE で書き込みロックを取ってから version を確認するので、
+      複数プロセスが同時に init_db しても二重適用しない
+    """
+    con.execute(CREATE_SCHEMA_VERSION)
+    con.commit()
+    current = schema_version(con)
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            current = schema_version(con)
+            if migration.version <= current:
+                con.rollback()
+                continue
+            for statement in migration.statements:
+                con.execute(statement)
+            con.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (migration.version, migration.description),
+            )
+            con.commit()
+        except sqlite3.Error:
+            con.rollback()
+            raise
+        current = migration.version
+        logging.info("Applied migration %d: %s", migration.version, migration.description)
+    return current
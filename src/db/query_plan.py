@@ -0,0 +1,51 @@
+import sqlite3
+from typing import Dict, List, Sequence, Tuple
+
+from src.db.food_log import DAILY_LOG_SQL, DAILY_TOTALS_SQL
+from src.db.rollup import FOOD_LOG_TOTALS_SQL
+from src.db.weight_log import WEIGHT_HISTORY_SQL
+
+# (名前, SQL, 例示パラメータ, 計画に含まれるべきインデックス名)
+EXPECTED_PLANS: Tuple[Tuple[str, str, Sequence, str], ...] = (
+    ("daily_log", DAILY_LOG_SQL, ("u", "2000-01-01"), "idx_food_log_user_date_created"),
+    ("daily_totals", DAILY_TOTALS_SQL, ("u", "2000-01-01"), "sqlite_autoindex_daily_totals_1"),
+    ("food_log_totals", FOOD_LOG_TOTALS_SQL, (), "idx_food_log_user_date_totals"),
+    ("weight_history", WEIGHT_HISTORY_SQL, ("u", 30), "sqlite_autoindex_weight_log_1"),
+)
+
+
+def explain_query_plan(con: sqlite3.Connection, sql: str, params: Sequence = ()) -> List[str]:
+    """
+    EXPLAIN QUERY PLAN の detail 列（"SEARCH food_log USING INDEX ..." など）
+    """
+    return [row[-1] for row in con.execute("EXPLAIN QUERY PLAN " + sql, tuple(params))]
+
+
+def check_query_plans(con: sqlite3.Connection) -> Dict[str, List[str]]:
+    """
+    主要クエリがインデックスを使っているか確認する。全件走査や一時ソートがあれば AssertionError
+    """
+    plans: Dict[str, List[str]] = {}
+    for name, sql, params, index_name in EXPECTED_PLANS:
+        plan = explain_query_plan(con, sql, params)
+        plans[name] = plan
+        joined = "\n".join(plan)
+        if index_name not in joined or "USE TEMP B-TREE" in joined:
+            raise AssertionError(f"{name}: expected {index_name}, got:\n{joined}")
+    return plans
+
+
+if __name__ == "__main__":
+    import sys
+
+    from src.config import get_settings
+    from src.db.schema import init_db
+
+    path = sys.argv[1] if len(sys.argv) > 1 else get_settings().sqlite_db_path
+    init_db(path)
+    con = sqlite3.connect(path)
+    try:
+        for name, plan in check_query_plans(con).items():
+            print(f"{name}: {' / '.join(plan)}")
+    finally:
+        con.close()
@@ -0,0 +1,90 @@
+import argparse
+import sqlite3
+from typing import List
+
+from src.db.migrations import BACKFILL_DAILY_TOTALS
+from src.db.schema import connection, init_db, unit_of_work
+
+# 浮動小数の足し引きを繰り返すので、この程度の差は一致とみなす
+TOLERANCE = 1e-6
+
+# food_log から直接集計した日ごとの合計（query_plan でカバリングインデックスの利用を確認する）
+FOOD_LOG_TOTALS_SQL = """
+SELECT user_id, log_date, SUM(calories_kcal) AS calories_kcal, SUM(protein_g) AS protein_g,
+       SUM(fat_g) AS fat_g, SUM(carbs_g) AS carbs_g, COUNT(*) AS entry_count
+FROM food_log GROUP BY user_id, log_date
+"""
+
+# food_log 側の集計と daily_totals を (user_id, 日付) で突き合わせ、片方にしかない日も拾う
+_MISMATCHES = f"""
+WITH expected AS ({FOOD_LOG_TOTALS_SQL})
+SELECT e.user_id, e.log_date,
+       e.calories_kcal AS expected_kcal, t.calories_kcal AS actual_kcal,
+       e.entry_count AS expected_count, t.entry_count AS actual_count
+FROM expected e
+LEFT JOIN daily_totals t ON t.user_id = e.user_id AND t.log_date = e.log_date
+WHERE t.log_date IS NULL
+   OR t.entry_count != e.entry_count
+   OR abs(t.calories_kcal - e.calories_kcal) > :tol
+   OR abs(t.protein_g - e.protein_g) > :tol
+   OR abs(t.fat_g - e.fat_g) > :tol
+   OR abs(t.carbs_g - e.carbs_g) > :tol
+UNION ALL
+SELECT t.user_id, t.log_date, NULL, t.calories_kcal, NULL, t.entry_count
+FROM daily_totals t
+LEFT JOIN expected e ON e.user_id = t.user_id AND e.log_date = t.log_date
+WHERE e.log_date IS NULL
+ORDER BY 1, 2
+"""
+
+
+def check_daily_totals(db_path: str) -> List[dict]:
+    """
+    daily_totals と food_log の集計がずれている日を返す（空なら整合）
+    """
+    with connection(db_path) as con:
+        return [dict(r) for r in con.execute(_MISMATCHES, {"tol": TOLERANCE}).fetchall()]
+
+
+def rebuild_daily_totals(db_path: str) -> int:
+    """
+    daily_totals を food_log から作り直し、行数を返す。1トランザクションなので途中状態は見えない
+    """
+    with unit_of_work(db_path) as con:
+        con.execute("DELETE FROM daily_totals")
+        con.execute(BACKFILL_DAILY_TOTALS)
+        return con.execute("SELECT COUNT(*) FROM daily_totals").fetchone()[0]
+
+
+def main(argv: List[str] | None = None) -> int:
+    from src.config import get_settings
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src.db.rollup",
+        description="daily_totals（日次集計表）の整合性チェックと再構築",
+    )
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--db", default=None, help="SQLite ファイル（既定: DIET_DB_PATH。シャーディング時はファイルごとに指定）")
+    args = parser.parse_args(argv)
+    db_path = args.db or get_settings().sqlite_db_path
+    init_db(db_path)
+
+    if args.command == "rebuild":
+        print(f"rebuilt daily_totals: {rebuild_daily_totals(db_path)} days")
+        return 0
+
+    mismatches = check_daily_totals(db_path)
+    for m in mismatches:
+        print(
+            f"{m['user_id']} {m['log_date']}: kcal {m['expected_kcal']} != {m['actual_kcal']}, "
+            f"entries {m['expected_count']} != {m['actual_count']}"
+        )
+    print("ok" if not mismatches else f"{len(mismatches)} day(s) out of sync")
+    return 0 if not mismatches else 1
+
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(main())
+    except sqlite3.Error as exc:
+        raise SystemExit(f"error: {exc}")
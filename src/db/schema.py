@@ -1,57 +1,162 @@
+import queue
 import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator
 
-CREATE_USER_PROFILE = """
-CREATE TABLE IF NOT EXISTS user_profile (
-    id              INTEGER PRIMARY KEY AUTOINCREMENT,
-    age             INTEGER NOT NULL,
-    sex             TEXT    NOT NULL CHECK(sex IN ('male', 'female')),
-    height_cm       REAL    NOT NULL,
-    weight_kg       REAL    NOT NULL,
-    goal_weight_kg  REAL    NOT NULL,
-    activity_level  TEXT    NOT NULL
-                    CHECK(activity_level IN
-                          ('sedentary','light','moderate','active','very_active')),
-    calorie_deficit INTEGER NOT NULL DEFAULT 350,
-    updated_at      TEXT    NOT NULL DEFAULT (datetime('now','localtime'))
-);
-"""
-
-CREATE_FOOD_LOG = """
-CREATE TABLE IF NOT EXISTS food_log (
-    id            INTEGER PRIMARY KEY AUTOINCREMENT,
-    log_date      TEXT    NOT NULL,
-    meal_type     TEXT    NOT NULL
-                  CHECK(meal_type IN ('朝食','昼食','夕食','間食')),
-    recipe_id     TEXT,
-    recipe_title  TEXT    NOT NULL,
-    calories_kcal REAL    NOT NULL,
-    protein_g     REAL    NOT NULL DEFAULT 0,
-    fat_g         REAL    NOT NULL DEFAULT 0,
-    carbs_g       REAL    NOT NULL DEFAULT 0,
-    created_at    TEXT    NOT NULL DEFAULT (datetime('now','localtime'))
-);
-"""
-
-CREATE_WEIGHT_LOG = """
-CREATE TABLE IF NOT EXISTS weight_log (
-    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-    log_date     TEXT    NOT NULL UNIQUE,
-    weight_kg    REAL    NOT NULL,
-    body_fat_pct REAL,
-    created_at   TEXT    NOT NULL DEFAULT (datetime('now','localtime'))
-);
-"""
+from src.db.migrations import (  # noqa: F401  従来の import 先として残す
+    CREATE_FOOD_LOG,
+    CREATE_USER_PROFILE,
+    CREATE_WEIGHT_LOG,
+    DEFAULT_USER_ID,
+    apply_migrations,
+)
+
+POOL_MAX_SIZE = 8
+POOL_TIMEOUT_SEC = 30.0
+STATEMENT_CACHE_SIZE = 256
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+# プールを持っておく DB ファイル数。ユーザーごとのシャーディングではファイルがユーザー数だけ増えるので、
+# 古いものから閉じる
+POOL_CACHE_SIZE = 64
 
 
 def init_db(db_path: str) -> None:
     con = sqlite3.connect(db_path)
-    cur = con.cursor()
-    cur.executescript(CREATE_USER_PROFILE + CREATE_FOOD_LOG + CREATE_WEIGHT_LOG)
-    con.commit()
-    con.close()
+    try:
+        # WAL はDBファイルに記録されるので、初期化時に1回設定すれば全接続に効く
+        con.execute("PRAGMA journal_mode=WAL")
+        apply_migrations(con)
+    finally:
+        con.close()
 
 
 def get_connection(db_path: str) -> sqlite3.Connection:
-    con = sqlite3.connect(db_path)
+    """
+    単発用の新しい接続（呼び出し側で close する）。通常は connection() / unit_of_work() を使う
+    """
+    con = sqlite3.connect(
+        db_path,
+        timeout=POOL_TIMEOUT_SEC,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
     return con
+
+
+class ConnectionPool:
+    """
+    DBファイルごとの接続プール
+    - 接続は開きっぱなしで使い回す（プリペアドステートメントも接続ごとにキャッシュされる）
+    - 同時に貸し出すのは1スレッド1本。上限に達したら返却を待つ
+    """
+
+    def __init__(self, db_path: str, max_size: int = POOL_MAX_SIZE) -> None:
+        self.db_path = db_path
+        self.max_size = max_size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                return get_connection(self.db_path)
+        return self._idle.get(timeout=POOL_TIMEOUT_SEC)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        con = self._acquire()
+        try:
+            yield con
+        finally:
+            if con.in_transaction:
+                con.rollback()
+            if self._closed:
+                # 貸し出し中に close() されたプール（LRU から外れたもの）には戻さない
+                con.close()
+                with self._lock:
+                    self._created -= 1
+            else:
+                self._idle.put(con)
+
+    def close(self) -> None:
+        """
+        使っていない接続を閉じ、貸し出し中のものは返却時に閉じる
+        """
+        self._closed = True
+        self.close_all()
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            con.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools: "OrderedDict[str, ConnectionPool]" = OrderedDict()
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """
+    DB ファイルごとのプール。POOL_CACHE_SIZE を超えたら最も長く使われていないものを閉じる
+    """
+    evicted = None
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[db_path] = pool
+            if len(_pools) > POOL_CACHE_SIZE:
+                _, evicted = _pools.popitem(last=False)
+        else:
+            _pools.move_to_end(db_path)
+    if evicted is not None:
+        evicted.close()
+    return pool
+
+
+@contextmanager
+def connection(db_path: str) -> Iterator[sqlite3.Connection]:
+    """
+    読み取り用。プールから接続を借りて返す
+    """
+    with get_pool(db_path).connection() as con:
+        yield con
+
+
+@contextmanager
+def unit_of_work(db_path: str) -> Iterator[sqlite3.Connection]:
+    """
+    書き込み用。ブロックを抜けたらまとめて commit、例外なら rollback
+    """
+    with get_pool(db_path).connection() as con:
+        try:
+            yield con
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+
+
+def close_all_connections() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
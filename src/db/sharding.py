@@ -0,0 +1,59 @@
+import hashlib
+import os
+import re
+import threading
+import zlib
+
+from src.config import Settings
+from src.db.schema import init_db
+
+SHARDING_MODES = ("none", "per_user", "hashed")
+
+_UNSAFE_CHARS = re.compile(r"[^0-9A-Za-z_-]+")
+
+_initialized: set[str] = set()
+_initialized_lock = threading.Lock()
+
+
+def _user_file_stem(user_id: str) -> str:
+    # ファイル名に使えない文字を潰し、潰したもの同士が衝突しないようハッシュを添える
+    digest = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:8]
+    return f"{_UNSAFE_CHARS.sub('_', user_id)[:40]}-{digest}"
+
+
+def shard_db_path(settings: Settings, user_id: str) -> str:
+    """
+    ユーザーのデータを置く SQLite ファイル
+    - none: DIET_DB_PATH の1ファイルを全員で共有
+    - per_user: diet_users/<user>.db のように1ユーザー1ファイル
+    - hashed: diet.shard007.db のように user_id のハッシュで DIET_DB_SHARDS 個に振り分け
+    """
+    mode = settings.db_sharding
+    if mode == "none":
+        return settings.sqlite_db_path
+    base, ext = os.path.splitext(settings.sqlite_db_path)
+    ext = ext or ".db"
+    if mode == "per_user":
+        return os.path.join(f"{base}_users", f"{_user_file_stem(user_id)}{ext}")
+    if mode == "hashed":
+        # hash() はプロセスごとに変わるので crc32 で固定する
+        shard = zlib.crc32(user_id.encode("utf-8")) % max(1, settings.db_shard_count)
+        return f"{base}.shard{shard:03d}{ext}"
+    raise ValueError(f"DIET_DB_SHARDING must be one of {SHARDING_MODES}: {mode}")
+
+
+def user_db_path(settings: Settings, user_id: str) -> str:
+    """
+    shard_db_path を返す。初めて使うファイルはその場で init_db する（プロセス内で1回）
+    """
+    path = shard_db_path(settings, user_id)
+    if path in _initialized:
+        return path
+    with _initialized_lock:
+        if path not in _initialized:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            init_db(path)
+            _initialized.add(path)
+    return path
@@ -1,42 +1,38 @@
-from src.db.schema import get_connection
+import sqlite3
 
+from src.db.schema import DEFAULT_USER_ID, connection, unit_of_work
 
-def upsert_profile(db_path: str, data: dict) -> None:
-    con = get_connection(db_path)
-    cur = con.cursor()
-    cur.execute("SELECT id FROM user_profile LIMIT 1")
-    row = cur.fetchone()
-    if row:
-        cur.execute(
-            """UPDATE user_profile SET
-               age=?, sex=?, height_cm=?, weight_kg=?, goal_weight_kg=?,
-               activity_level=?, calorie_deficit=?,
-               updated_at=datetime('now','localtime')
-               WHERE id=?""",
-            (
-                data["age"], data["sex"], data["height_cm"], data["weight_kg"],
-                data["goal_weight_kg"], data["activity_level"], data["calorie_deficit"],
-                row["id"],
-            ),
-        )
-    else:
-        cur.execute(
-            """INSERT INTO user_profile
-               (age, sex, height_cm, weight_kg, goal_weight_kg, activity_level, calorie_deficit)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (
-                data["age"], data["sex"], data["height_cm"], data["weight_kg"],
-                data["goal_weight_kg"], data["activity_level"], data["calorie_deficit"],
-            ),
-        )
-    con.commit()
-    con.close()
 
+def upsert_profile_row(
+    con: sqlite3.Connection, data: dict, user_id: str = DEFAULT_USER_ID
+) -> None:
+    con.execute(
+        """INSERT INTO user_profile
+           (user_id, age, sex, height_cm, weight_kg, goal_weight_kg,
+            activity_level, calorie_deficit)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(user_id) DO UPDATE SET
+               age=excluded.age, sex=excluded.sex,
+               height_cm=excluded.height_cm, weight_kg=excluded.weight_kg,
+               goal_weight_kg=excluded.goal_weight_kg,
+               activity_level=excluded.activity_level,
+               calorie_deficit=excluded.calorie_deficit,
+               updated_at=datetime('now','localtime')""",
+        (
+            user_id, data["age"], data["sex"], data["height_cm"], data["weight_kg"],
+            data["goal_weight_kg"], data["activity_level"], data["calorie_deficit"],
+        ),
+    )
 
-def get_profile(db_path: str) -> dict | None:
-    con = get_connection(db_path)
-    cur = con.cursor()
-    cur.execute("SELECT * FROM user_profile ORDER BY id LIMIT 1")
-    row = cur.fetchone()
-    con.close()
+
+def upsert_profile(db_path: str, data: dict, user_id: str = DEFAULT_USER_ID) -> None:
+    with unit_of_work(db_path) as con:
+        upsert_profile_row(con, data, user_id)
+
+
+def get_profile(db_path: str, user_id: str = DEFAULT_USER_ID) -> dict | None:
+    with connection(db_path) as con:
+        row = con.execute(
+            "SELECT * FROM user_profile WHERE user_id=?", (user_id,)
+        ).fetchone()
     return dict(row) if row else None
@@ -1,35 +1,46 @@
-from src.db.schema import get_connection
+import sqlite3
 
+from src.db.schema import DEFAULT_USER_ID, connection, unit_of_work
 
-def upsert_weight(
-    db_path: str,
+WEIGHT_HISTORY_SQL = """SELECT log_date, weight_kg, body_fat_pct
+   FROM weight_log
+   WHERE user_id=?
+   ORDER BY log_date DESC
+   LIMIT ?"""
+
+
+def upsert_weight_row(
+    con: sqlite3.Connection,
     date_str: str,
     weight_kg: float,
     body_fat_pct: float | None = None,
+    user_id: str = DEFAULT_USER_ID,
 ) -> None:
-    con = get_connection(db_path)
     con.execute(
-        """INSERT INTO weight_log (log_date, weight_kg, body_fat_pct)
-           VALUES (?, ?, ?)
-           ON CONFLICT(log_date) DO UPDATE SET
+        """INSERT INTO weight_log (user_id, log_date, weight_kg, body_fat_pct)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(user_id, log_date) DO UPDATE SET
                weight_kg=excluded.weight_kg,
                body_fat_pct=excluded.body_fat_pct""",
-        (date_str, weight_kg, body_fat_pct),
+        (user_id, date_str, weight_kg, body_fat_pct),
     )
-    con.commit()
-    con.close()
-
-
-def get_weight_history(db_path: str, days: int = 30) -> list[dict]:
-    con = get_connection(db_path)
-    cur = con.cursor()
-    cur.execute(
-        """SELECT log_date, weight_kg, body_fat_pct
-           FROM weight_log
-           ORDER BY log_date DESC
-           LIMIT ?""",
-        (days,),
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    con.close()
+
+
+def upsert_weight(
+    db_path: str,
+    date_str: str,
+    weight_kg: float,
+    body_fat_pct: float | None = None,
+    user_id: str = DEFAULT_USER_ID,
+) -> None:
+    with unit_of_work(db_path) as con:
+        upsert_weight_row(con, date_str, weight_kg, body_fat_pct, user_id)
+
+
+def get_weight_history(
+    db_path: str, days: int = 30, user_id: str = DEFAULT_USER_ID
+) -> list[dict]:
+    with connection(db_path) as con:
+        cur = con.execute(WEIGHT_HISTORY_SQL, (user_id, days))
+        rows = [dict(r) for r in cur.fetchall()]
     return list(reversed(rows))
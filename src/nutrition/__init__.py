@@ -1,3 +1,17 @@
-from src.nutrition.tdee import calc_tdee, TDEEResult
+from src.nutrition.tdee import (
+    TDEEBatch,
+    TDEEResult,
+    calc_tdee,
+    calc_tdee_batch,
+    calc_tdee_for_profile,
+    calc_tdee_for_profiles,
+)
 
-__all__ = ["calc_tdee", "TDEEResult"]
+__all__ = [
+    "calc_tdee",
+    "calc_tdee_batch",
+    "calc_tdee_for_profile",
+    "calc_tdee_for_profiles",
+    "TDEEResult",
+    "TDEEBatch",
+]
@@ -0,0 +1,274 @@
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Mapping, Sequence
+
+import numpy as np
+
+MATERIAL_HEADER = "【材料】"
+
+# 分量の書き始め（数字・計量スプーン・目安量・括弧書き）で食材名を打ち切る
+_QUANTITY_START = re.compile(
+    r"[0-9０-９½¼¾()（）＋+]|大さじ|小さじ|適量|少量|少々|ひとつまみ|各"
+)
+_NAME_PREFIXES = ("お好みで", "好みで", "または")
+_NAME_SUFFIXES = ("など合計", "など")
+
+
+def extract_material_items(text: str) -> list[str]:
+    """
+    レシピ本文の【材料】行を「、」区切りの項目リストにする（分量は残したまま）
+    """
+    material_section = ""
+    for line in text.split("\n"):
+        if MATERIAL_HEADER in line:
+            material_section = line.replace(MATERIAL_HEADER, "")
+            break
+    return [i.strip() for i in material_section.replace("、", ",").split(",") if i.strip()]
+
+
+def ingredient_name(item: str) -> str:
+    """
+    「鶏むね200g」→「鶏むね」、「木綿豆腐1丁(300g)」→「木綿豆腐」
+    """
+    name = _QUANTITY_START.split(item, maxsplit=1)[0].strip()
+    for prefix in _NAME_PREFIXES:
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    for suffix in _NAME_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return name.strip() or item.strip()
+
+
+def ingredient_names(item: str) -> list[str]:
+    """
+    「レタス・きゅうり適量」のように「・」で並んだ項目は食材ごとに分ける
+    """
+    return [n.strip() for n in ingredient_name(item).split("・") if n.strip()]
+
+
+# 分量部分: 「200g」「1/2本」「大さじ1.5」。括弧書き（「(300g)」「(缶)」）は除いてから見る
+_QUANTITY_NOTE = re.compile(r"[(（][^)）]*[)）]")
+_QUANTITY = re.compile(r"^(大さじ|小さじ)?([0-9]+(?:\.[0-9]+)?)(?:/([0-9]+))?([^0-9.+/\s]*)$")
+SPOON_UNITS = ("大さじ", "小さじ")
+
+
+def split_quantity(item: str) -> tuple[str, float | None, str]:
+    """
+    「鶏むね200g」→ ("鶏むね", 200.0, "g")、「醤油大さじ1/2」→ ("醤油", 0.5, "大さじ")
+    - 数量として読めないもの（「適量」「4〜5個」「各1かけ」など）は (食材名, None, 分量の文字列)
+    - 「・」で複数の食材をまとめた項目や、分量に別の食材が続く項目は分けずに (項目全体, None, "")
+    """
+    item = unicodedata.normalize("NFKC", item).replace("\u2044", "/").strip()
+    name = ingredient_name(item)
+    if "・" in name:
+        return item, None, ""
+    start = _QUANTITY_START.search(item)
+    rest = _QUANTITY_NOTE.sub("", item[start.start():]).strip() if start else ""
+    m = _QUANTITY.match(rest)
+    if m is None:
+        if "+" in rest or "/" in rest:
+            return item, None, ""
+        return name, None, rest
+    spoon, number, denominator, unit = m.groups()
+    if denominator and int(denominator) == 0:
+        return name, None, rest
+    amount = float(number) / (int(denominator) if denominator else 1)
+    return name, amount, spoon or unit
+
+
+# ===== 食材の逆引き索引 =====
+# - 食材名は NFKC・小文字・カタカナ→ひらがなに揃え、同義語・漢字表記を代表表記に置き換える
+# - 代表表記ごとにレシピの位置（昇順の int32 配列）を持つ
+# - 入力した食材は「代表表記を含む語彙」に展開する（「豆腐」→ 木綿豆腐・絹豆腐も）。展開結果は索引ごとにキャッシュ
+
+# 代表表記: 言い換え（ひらがな・カタカナの違いは正規化で吸収されるので書かない）
+INGREDIENT_SYNONYMS: dict[str, tuple[str, ...]] = {
+    "鶏むね": ("鶏むね肉", "鶏胸肉", "鶏胸", "とりむね", "とり胸肉", "とりむね肉"),
+    "鶏もも": ("鶏もも肉", "鶏腿肉", "とりもも", "とりもも肉"),
+    "鶏ひき肉": ("鶏挽肉", "鶏挽き肉", "鶏みんち"),
+    "豚ひき肉": ("豚挽肉", "豚挽き肉", "豚みんち"),
+    "合いびき肉": ("合挽肉", "合挽き肉", "合い挽き肉", "合びき肉"),
+    "卵": ("たまご", "玉子", "鶏卵"),
+    "にんじん": ("人参",),
+    "たまねぎ": ("玉ねぎ", "玉葱"),
+    "ねぎ": ("葱",),
+    "しょうが": ("生姜",),
+    "にんにく": ("大蒜",),
+    "しいたけ": ("椎茸",),
+    "まいたけ": ("舞茸",),
+    "ほうれんそう": ("ほうれん草", "菠薐草"),
+    "こまつな": ("小松菜",),
+    "はくさい": ("白菜",),
+    "だいこん": ("大根",),
+    "きゅうり": ("胡瓜",),
+    "なす": ("茄子",),
+    "かぼちゃ": ("南瓜",),
+    "ごぼう": ("牛蒡",),
+    "れんこん": ("蓮根",),
+    "しょうゆ": ("醤油",),
+    "みそ": ("味噌",),
+    "ごま": ("胡麻",),
+    "こしょう": ("胡椒",),
+    "のり": ("海苔",),
+    "さば": ("鯖",),
+    "鮭": ("しゃけ",),
+    "たら": ("鱈",),
+    "あじ": ("鯵",),
+    "えび": ("海老",),
+    "ひじき": ("鹿尾菜",),
+    "ミニトマト": ("プチトマト",),
+}
+
+EXPANSION_CACHE_SIZE = 4096
+NORMALIZE_CACHE_SIZE = 65536
+
+_KATAKANA_TO_HIRAGANA = {c: c - 0x60 for c in range(ord("ァ"), ord("ヶ") + 1)}
+
+
+def _fold(name: str) -> str:
+    name = unicodedata.normalize("NFKC", name)
+    return re.sub(r"\s+", "", name).lower().translate(_KATAKANA_TO_HIRAGANA)
+
+
+_SYNONYM_CANONICAL = {
+    _fold(variant): _fold(canonical)
+    for canonical, variants in INGREDIENT_SYNONYMS.items()
+    for variant in variants
+}
+# 長い言い換えから当てる（「玉葱」を「葱」より先に）
+_SYNONYM_PATTERN = re.compile(
+    "|".join(re.escape(v) for v in sorted(_SYNONYM_CANONICAL, key=len, reverse=True))
+)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_ingredient(name: str) -> str:
+    """
+    「鶏胸肉」「トリムネ」→「鶏むね」、「人参」「ニンジン」→「にんじん」
+    - 語の一部も置き換える（「生姜チューブ」→「しょうがちゅーぶ」）
+    """
+    return _SYNONYM_PATTERN.sub(lambda m: _SYNONYM_CANONICAL[m.group()], _fold(name))
+
+
+class IngredientIndex:
+    """
+    正規化した食材名 → レシピの位置の転置索引（作成後は変更しない）
+    - names を渡さなければ各レシピの本文の【材料】行から取り出す
+    """
+
+    def __init__(
+        self,
+        recipes: Sequence[Mapping[str, Any]],
+        names: Callable[[Mapping[str, Any]], Iterable[str]] | None = None,
+    ) -> None:
+        self.recipes = tuple(recipes)
+        postings: dict[str, list[int]] = {}
+        counts = np.zeros(len(self.recipes), dtype=np.int32)
+        for i, recipe in enumerate(self.recipes):
+            raw = names(recipe) if names is not None else _recipe_ingredient_names(recipe)
+            tokens = {normalize_ingredient(n) for n in raw}
+            tokens.discard("")
+            counts[i] = len(tokens)
+            for token in tokens:
+                postings.setdefault(token, []).append(i)
+        self.postings: dict[str, np.ndarray] = {
+            token: np.array(ids, dtype=np.int32) for token, ids in postings.items()
+        }
+        self.ingredient_counts = counts
+        self._expansions: dict[str, tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def expand(self, ingredient: str) -> tuple[str, ...]:
+        """
+        入力した食材名に当たる語彙（正規化した語を含むもの）
+        """
+        query = normalize_ingredient(ingredient)
+        if not query:
+            return ()
+        cached = self._expansions.get(query)
+        if cached is None:
+            cached = tuple(t for t in self.postings if query in t)
+            if len(self._expansions) >= EXPANSION_CACHE_SIZE:
+                self._expansions.clear()
+            self._expansions[query] = cached
+        return cached
+
+    def match(
+        self, ingredients: Iterable[str], limit: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (位置, 一致した入力食材の数, 被覆率) を一致数 → 被覆率 → 元の並び順で返す
+        - 被覆率: そのレシピの材料のうち、入力食材で賄える割合
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        term_postings: list[np.ndarray] = []
+        matched_tokens: set[str] = set()
+        for ingredient in dict.fromkeys(i.strip() for i in ingredients):
+            tokens = self.expand(ingredient) if ingredient else ()
+            if not tokens:
+                continue
+            matched_tokens.update(tokens)
+            if len(tokens) == 1:
+                term_postings.append(self.postings[tokens[0]])
+            else:
+                term_postings.append(np.unique(np.concatenate([self.postings[t] for t in tokens])))
+        if not term_postings:
+            return empty, empty, np.zeros(0, dtype=np.float64)
+
+        n = len(self.recipes)
+        term_hits = np.bincount(np.concatenate(term_postings), minlength=n)
+        positions = np.flatnonzero(term_hits)
+        match_counts = term_hits[positions]
+        token_hits = np.bincount(
+            np.concatenate([self.postings[t] for t in matched_tokens]), minlength=n
+        )[positions]
+        coverage = token_hits / np.maximum(self.ingredient_counts[positions], 1)
+
+        # 一致数は整数、被覆率は 1 以下なので、一致数 * 2 + 被覆率 で順序が決まる
+        key = match_counts * 2.0 + coverage
+        if limit is not None and len(positions) > limit:
+            threshold = -np.partition(-key, limit - 1)[limit - 1]
+            keep = np.flatnonzero(key >= threshold)
+            positions, match_counts, coverage, key = (
+                positions[keep], match_counts[keep], coverage[keep], key[keep]
+            )
+        order = np.argsort(-key, kind="stable")[:limit]
+        return positions[order], match_counts[order], coverage[order]
+
+
+def _recipe_ingredient_names(recipe: Mapping[str, Any]) -> list[str]:
+    names: list[str] = []
+    for item in extract_material_items(recipe.get("text", "")):
+        names.extend(ingredient_names(item))
+    return names
+
+
+_INDEX_CACHE_SIZE = 4
+_index_cache: dict[int, tuple[Sequence, IngredientIndex]] = {}
+_index_lock = threading.Lock()
+
+
+def get_ingredient_index(
+    recipes: Sequence[Mapping[str, Any]],
+    names: Callable[[Mapping[str, Any]], Iterable[str]] | None = None,
+) -> IngredientIndex:
+    """
+    タプル（カタログの recipes など変更されない列）は同じオブジェクトごとに1回だけ作る
+    """
+    if not isinstance(recipes, tuple):
+        return IngredientIndex(recipes, names)
+    with _index_lock:
+        cached = _index_cache.get(id(recipes))
+        if cached is not None and cached[0] is recipes:
+            return cached[1]
+    index = IngredientIndex(recipes, names)
+    with _index_lock:
+        if len(_index_cache) >= _INDEX_CACHE_SIZE:
+            _index_cache.pop(next(iter(_index_cache)))
+        _index_cache[id(recipes)] = (recipes, index)
+    return index
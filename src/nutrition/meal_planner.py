@@ -1,94 +1,254 @@
-import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Hashable, Iterable, Mapping, Sequence
 
-MEAL_BUDGETS = {
-    "朝食": 0.25,
-    "昼食": 0.35,
-    "夕食": 0.30,
-    "間食": 0.10,
-}
+from src.nutrition.ingredients import (
+    SPOON_UNITS,
+    extract_material_items,
+    get_ingredient_index,
+    normalize_ingredient,
+    split_quantity,
+)
+from src.nutrition.plan_solver import (
+    DEFAULT_MEAL_TYPES,
+    TIME_BUDGET_MS,
+    DayPlan,
+    MacroTargets,
+    get_planner_index,
+    solve_day,
+    solve_day_cached,
+)
+from src.recipes import RecipeCatalog
+from src.utils.aho_corasick import AhoCorasick
+
+WEEK_DAYS = 7
+NO_REPEAT_DAYS = 3  # 同じレシピは連続するこの日数の中で1回まで
+
+
+@dataclass(frozen=True)
+class WeekPlan:
+    days: tuple[DayPlan, ...]
+    cost: float
+    solved_days: int  # キャッシュになく実際に解いた日数
 
 
 def suggest_meal_plan(
-    recipes: list[dict],
+    recipes: Sequence[Mapping[str, Any]],
     total_kcal: float,
     meal_types: list[str] | None = None,
-) -> dict[str, dict | None]:
+    targets: MacroTargets | None = None,
+    time_budget_ms: float = TIME_BUDGET_MS,
+) -> dict[str, Mapping[str, Any] | None]:
+    """
+    食事ごとに1品ずつ、1日の合計 kcal（targets があれば PFC も）が目標に近い組み合わせを選ぶ
+    - 探索は src/nutrition/plan_solver.py。食事区分にレシピがなければ他の区分から選ぶ
+    """
+    if meal_types is None:
+        meal_types = list(DEFAULT_MEAL_TYPES)
+    plan = solve_day(
+        get_planner_index(recipes), total_kcal, meal_types, targets, time_budget_ms
+    )
+    return plan.meals
+
+
+def plan_week(
+    recipes: Sequence[Mapping[str, Any]],
+    daily_kcal: float,
+    meal_types: list[str] | None = None,
+    targets: MacroTargets | None = None,
+    days: int = WEEK_DAYS,
+    no_repeat_days: int = NO_REPEAT_DAYS,
+    locked: Mapping[tuple[int, str], str] | None = None,
+    banned: Mapping[int, Iterable[str]] | None = None,
+    time_budget_ms: float = TIME_BUDGET_MS,
+) -> WeekPlan:
+    """
+    days 日 × meal_types の献立を1日ずつ順に解く（毎日 daily_kcal / targets に合わせる）
+    - 直前 no_repeat_days - 1 日に使ったレシピと、その先の日に固定したレシピは使わない
+    - locked: {(日, 食事): レシピID} はその枠に固定。banned: {日: レシピID} はその日に使わない（入れ替え用）
+      日は 0〜days-1。範囲外の日や知らないレシピ ID は ValueError
+    - 日ごとの解は条件ごとにキャッシュされるので、1枠を固定・入れ替えて呼び直すと
+      その日と、使えるレシピが変わった後続の日だけを解き直す
+    """
     if meal_types is None:
-        meal_types = ["朝食", "昼食", "夕食", "間食"]
+        meal_types = list(DEFAULT_MEAL_TYPES)
+    index = get_planner_index(recipes)
 
-    plan: dict[str, dict | None] = {}
+    def position(recipe_id: str) -> int:
+        if recipe_id not in index.position:
+            raise ValueError(f"unknown recipe id: {recipe_id}")
+        return index.position[recipe_id]
 
-    for meal_type in meal_types:
-        budget = total_kcal * MEAL_BUDGETS.get(meal_type, 0.25)
-        candidates = [
-            r for r in recipes
-            if r.get("meal_type") == meal_type
-            and r.get("calories_kcal", 0) <= budget * 1.2
-        ]
-        if not candidates:
-            candidates = [
-                r for r in recipes
-                if r.get("calories_kcal", 0) <= budget * 1.2
-            ]
+    def day_number(day: int) -> int:
+        if not 0 <= int(day) < days:
+            raise ValueError(f"day must be between 0 and {days - 1}: {day}")
+        return int(day)
 
-        if candidates:
-            best = min(candidates, key=lambda r: abs(r.get("calories_kcal", 0) - budget))
-            plan[meal_type] = best
-        else:
-            plan[meal_type] = None
+    locked_by_day: dict[int, dict[str, int]] = {}
+    for (day, meal_type), recipe_id in (locked or {}).items():
+        locked_by_day.setdefault(day_number(day), {})[meal_type] = position(recipe_id)
+    banned_by_day = {
+        day_number(day): {index.position[r] for r in ids if r in index.position}
+        for day, ids in (banned or {}).items()
+    }
 
-    return plan
+    window = max(1, no_repeat_days) - 1
+    plans: list[DayPlan] = []
+    solved = 0
+    for day in range(days):
+        exclude = set(banned_by_day.get(day, ()))
+        for previous in plans[max(0, day - window):]:
+            exclude.update(previous.indices.values())
+        for ahead in range(day + 1, min(days, day + window + 1)):
+            exclude.update(locked_by_day.get(ahead, {}).values())
+        plan, hit = solve_day_cached(
+            index, daily_kcal, meal_types, targets, time_budget_ms,
+            locked=locked_by_day.get(day), exclude=exclude,
+        )
+        solved += not hit
+        plans.append(plan)
+    return WeekPlan(days=tuple(plans), cost=sum(p.cost for p in plans), solved_days=solved)
 
 
 def find_recipes_by_ingredients(
-    recipes: list[dict],
+    recipes: Sequence[Mapping[str, Any]] | RecipeCatalog,
     ingredients: list[str],
-) -> list[tuple[int, dict]]:
-    results = []
-    for recipe in recipes:
-        text = recipe.get("text", "") + " " + " ".join(recipe.get("tags", []))
-        count = sum(1 for ing in ingredients if ing.strip() in text)
-        if count > 0:
-            results.append((count, recipe))
-    results.sort(key=lambda x: x[0], reverse=True)
-    return results
-
-
-def generate_shopping_list(recipes: list[dict]) -> dict[str, list[str]]:
-    categories = {
-        "肉・魚": ["鶏", "豚", "牛", "鮭", "サバ", "たら", "あさり", "魚"],
-        "大豆・卵・乳製品": ["豆腐", "卵", "納豆", "大豆", "チーズ", "ヨーグルト", "牛乳"],
-        "野菜": ["もやし", "ほうれん草", "ブロッコリー", "キャベツ", "玉ねぎ", "大根",
-                 "ズッキーニ", "パプリカ", "トマト", "きゅうり", "春菊", "きのこ",
-                 "えのき", "しめじ", "舞茸", "わかめ"],
-        "穀物・麺": ["玄米", "白米", "オートミール", "豆腐麺", "全粒粉", "キヌア"],
-        "調味料・缶詰": ["ポン酢", "醤油", "みりん", "塩麹", "味噌", "ごま油",
-                       "オリーブオイル", "酢", "サバ缶", "トマト缶"],
-        "その他": [],
-    }
+    limit: int | None = None,
+) -> list[tuple[int, Mapping[str, Any]]]:
+    """
+    手持ちの食材を多く使うレシピ順に (一致した食材の数, レシピ) を返す
+    - 【材料】行の食材の逆引き索引（src/nutrition/ingredients.py）で引く。表記ゆれ・同義語は正規化で吸収
+    - 一致数が同じなら、材料のうち手持ちで賄える割合が高い順
+    """
+    if isinstance(recipes, RecipeCatalog):
+        index = recipes.ingredient_index()
+    else:
+        index = get_ingredient_index(recipes)
+    positions, counts, _ = index.match(ingredients, limit)
+    return [(int(c), index.recipes[p]) for p, c in zip(positions.tolist(), counts.tolist())]
+
+
+# 買い物リストの分類（キーワードを含む食材をその区分に入れる。複数当たれば最も長いキーワード）
+# - 以前は区分の並び順で最初に当たったものだったため、「豆腐麺」は「豆腐」で大豆、「サバ缶」は「サバ」で肉・魚、
+#   「トマト缶」は「トマト」で野菜になり、穀物・麺や調味料・缶詰の「豆腐麺」「サバ缶」「トマト缶」は一度も使われなかった。
+#   最長一致なら、より具体的なキーワードが表どおりの区分を決める
+SHOPPING_CATEGORIES: dict[str, tuple[str, ...]] = {
+    "肉・魚": ("鶏", "豚", "牛", "鮭", "サバ", "たら", "あさり", "魚"),
+    "大豆・卵・乳製品": ("豆腐", "卵", "納豆", "大豆", "チーズ", "ヨーグルト", "牛乳"),
+    "野菜": ("もやし", "ほうれん草", "ブロッコリー", "キャベツ", "玉ねぎ", "大根",
+             "ズッキーニ", "パプリカ", "トマト", "きゅうり", "春菊", "きのこ",
+             "えのき", "しめじ", "舞茸", "わかめ"),
+    "穀物・麺": ("玄米", "白米", "オートミール", "豆腐麺", "全粒粉", "キヌア"),
+    "調味料・缶詰": ("ポン酢", "醤油", "みりん", "塩麹", "味噌", "ごま油",
+                   "オリーブオイル", "酢", "サバ缶", "トマト缶"),
+}
+OTHER_CATEGORY = "その他"
+MATERIALS_CACHE_SIZE = 4096
 
-    all_ingredients: list[str] = []
+# キーワードも食材名と同じ正規化をかけてから照合する（「鯖缶」「サバ缶」「さば缶」を同じに扱う）
+_CATEGORY_MATCHER: AhoCorasick[str] = AhoCorasick(
+    (normalize_ingredient(keyword), category)
+    for category, keywords in SHOPPING_CATEGORIES.items()
+    for keyword in keywords
+)
+
+
+@dataclass(frozen=True)
+class _Material:
+    key: str  # 正規化した食材名（合算の単位）
+    name: str
+    amount: float | None
+    unit: str  # amount が None なら分量の文字列（「適量」など）
+    category: str
+
+
+# (レシピ id, カタログの version) → 解析結果。ヒットすれば本文（レシピストアなら SQLite）を読まない
+_materials_cache: "OrderedDict[tuple[str, Hashable], tuple[_Material, ...]]" = OrderedDict()
+_materials_lock = threading.Lock()
+
+
+def _recipe_materials(recipe: Mapping[str, Any], version: Hashable) -> tuple[_Material, ...]:
+    """
+    version が None（カタログ外のレシピ）なら本文をキーにする
+    """
+    if version is None:
+        return _parse_materials(recipe.get("text", ""))
+    key = (str(recipe.get("id", "")), version)
+    with _materials_lock:
+        materials = _materials_cache.get(key)
+        if materials is not None:
+            _materials_cache.move_to_end(key)
+            return materials
+    materials = _parse_materials(recipe.get("text", ""))
+    with _materials_lock:
+        _materials_cache[key] = materials
+        while len(_materials_cache) > MATERIALS_CACHE_SIZE:
+            _materials_cache.popitem(last=False)
+    return materials
+
+
+@lru_cache(maxsize=MATERIALS_CACHE_SIZE)
+def _parse_materials(text: str) -> tuple[_Material, ...]:
+    """
+    【材料】行を解析・分類した結果
+    """
+    materials = []
+    for item in extract_material_items(text):
+        name, amount, unit = split_quantity(item)
+        match = _CATEGORY_MATCHER.longest_match(normalize_ingredient(item))
+        materials.append(_Material(
+            key=normalize_ingredient(name),
+            name=name,
+            amount=amount,
+            unit=unit,
+            category=match[1] if match else OTHER_CATEGORY,
+        ))
+    return tuple(materials)
+
+
+def _format_quantity(amount: float | None, unit: str) -> str:
+    if amount is None:
+        return unit
+    number = f"{round(amount, 2):g}"
+    return f"{unit}{number}" if unit in SPOON_UNITS else f"{number}{unit}"
+
+
+def generate_shopping_list(
+    recipes: Iterable[Mapping[str, Any]], version: Hashable = None
+) -> dict[str, list[str]]:
+    """
+    選んだレシピの材料を区分ごとにまとめる（同じ食材は単位ごとに分量を合算）
+    - 「鶏むね200g」と「鶏むね肉150g」→「鶏むね350g」。単位が違えば「醤油大さじ3＋小さじ1」
+    - 同じレシピを複数回渡せばその回数分を数える（1週間の献立をそのまま渡せる）
+    - version: レシピを取り出したカタログの RecipeCatalog.version。渡すと解析結果を id で使い回す
+    """
+    # 正規化した食材名 → (表示名, 区分, {単位: 合計 or None})
+    totals: dict[str, tuple[str, str, dict[str, float | None]]] = {}
     for recipe in recipes:
-        text = recipe.get("text", "")
-        material_section = ""
-        for line in text.split("\n"):
-            if "【材料】" in line:
-                material_section = line.replace("【材料】", "")
-                break
-        items = [i.strip() for i in material_section.replace("、", ",").split(",") if i.strip()]
-        all_ingredients.extend(items)
-
-    unique_ingredients = list(dict.fromkeys(all_ingredients))
-
-    categorized: dict[str, list[str]] = {cat: [] for cat in categories}
-    for ing in unique_ingredients:
-        matched = False
-        for cat, keywords in categories.items():
-            if any(kw in ing for kw in keywords):
-                categorized[cat].append(ing)
-                matched = True
-                break
-        if not matched:
-            categorized["その他"].append(ing)
+        for m in _recipe_materials(recipe, version):
+            entry = totals.get(m.key)
+            if entry is None:
+                entry = totals[m.key] = (m.name, m.category, {})
+            quantities = entry[2]
+            if m.amount is None:
+                quantities.setdefault(m.unit, None)
+            else:
+                quantities[m.unit] = (quantities.get(m.unit) or 0.0) + m.amount
 
+    categorized: dict[str, list[str]] = {cat: [] for cat in (*SHOPPING_CATEGORIES, OTHER_CATEGORY)}
+    for name, category, quantities in totals.values():
+        parts = [_format_quantity(amount, unit) for unit, amount in quantities.items()]
+        categorized[category].append(name + "＋".join(p for p in parts if p))
     return {cat: items for cat, items in categorized.items() if items}
+
+
+def generate_shopping_lists(
+    plans: Mapping[Hashable, Iterable[Mapping[str, Any]]],
+    version: Hashable = None,
+) -> dict[Hashable, dict[str, list[str]]]:
+    """
+    ユーザー（や週）ごとのレシピ列をまとめて処理する。同じレシピの解析は全体で1回だけ
+    """
+    return {key: generate_shopping_list(recipes, version) for key, recipes in plans.items()}
@@ -0,0 +1,419 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 1日の献立を「合計 kcal・PFC が目標に近い組み合わせ」として一括で解く
+# - レシピの栄養値は (N, 4) の float32 配列、食事区分ごとに添字配列を持つ（PlannerIndex）
+# - 各食事枠は単独コストの良い順に SHORTLIST_SIZE 件まで絞り込む
+# - 枠を前半・後半に分けて組み合わせを列挙し、後半を kcal でソートして突き合わせる（半分全列挙）
+# - kcal のずれだけで暫定最良を超える組は searchsorted で窓の外に切り捨てる（分枝限定）
+# - 時間予算を超えたらそこまでの最良解を返す（初期解は枠ごとの貪欲法）
+# - 固定した枠・除外レシピを含めた条件ごとに解をキャッシュし、週の献立の組み直しで使い回す
+
+MEAL_BUDGETS = {
+    "朝食": 0.25,
+    "昼食": 0.35,
+    "夕食": 0.30,
+    "間食": 0.10,
+}
+DEFAULT_MEAL_TYPES = ("朝食", "昼食", "夕食", "間食")
+NUTRIENTS = ("calories_kcal", "protein_g", "fat_g", "carbs_g")
+
+SHORTLIST_SIZE = 16
+TIME_BUDGET_MS = 20.0
+BLOCK_ROWS = 256
+SEED_NEIGHBORS = 8
+
+KCAL_WEIGHT = 1.0
+MACRO_WEIGHT = 0.5
+OVER_WEIGHT = 2.0  # 目標 kcal 超過はさらに重く
+SHARE_WEIGHT = 0.2  # MEAL_BUDGETS の配分からのずれ
+
+DAY_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class MacroTargets:
+    protein_g: float
+    fat_g: float
+    carbs_g: float
+
+
+@dataclass(frozen=True)
+class DayPlan:
+    meals: Dict[str, Optional[Mapping[str, Any]]]
+    indices: Dict[str, int]  # 食事 → PlannerIndex.recipes の添字（None の枠は含まない）
+    totals: Dict[str, float]
+    cost: float
+    complete: bool  # 時間予算内に探索しきったか
+
+
+def remaining_targets(tdee_result: Any, totals: Mapping[str, float]) -> MacroTargets:
+    """
+    TDEEResult の PFC 目標から今日の摂取済みを引いた残り
+    """
+    return MacroTargets(
+        protein_g=max(0.0, tdee_result.protein_target_g - totals.get("protein_g", 0.0)),
+        fat_g=max(0.0, tdee_result.fat_target_g - totals.get("fat_g", 0.0)),
+        carbs_g=max(0.0, tdee_result.carbs_target_g - totals.get("carbs_g", 0.0)),
+    )
+
+
+class PlannerIndex:
+    """
+    レシピ列の栄養値と食事区分ごとの添字（作成後は変更しない）
+    - day_cache: solve_day_cached の解（条件 → DayPlan）。古いものから捨てる
+    """
+
+    def __init__(self, recipes: Sequence[Mapping[str, Any]]) -> None:
+        self.recipes = tuple(recipes)
+        self.position: Dict[str, int] = {}
+        for i, r in enumerate(self.recipes):
+            self.position.setdefault(str(r.get("id", i)), i)
+        self.nutrition = np.array(
+            [[float(r.get(f) or 0) for f in NUTRIENTS] for r in self.recipes], dtype=np.float32
+        ).reshape(-1, len(NUTRIENTS))
+        by_meal_type: Dict[str, List[int]] = {}
+        for i, r in enumerate(self.recipes):
+            by_meal_type.setdefault(r.get("meal_type", ""), []).append(i)
+        self.by_meal_type = {k: np.array(v, dtype=np.int64) for k, v in by_meal_type.items()}
+        self.all = np.arange(len(self.recipes), dtype=np.int64)
+        self.day_cache: "OrderedDict[Tuple, DayPlan]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def pool(self, meal_type: str, max_kcal: float, exclude: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        その食事区分で max_kcal 以下・exclude 以外のレシピ。なければ区分を問わず探す
+        """
+        for idx in (self.by_meal_type.get(meal_type), self.all):
+            if idx is None or len(idx) == 0:
+                continue
+            idx = idx[self.nutrition[idx, 0] <= max_kcal]
+            if exclude is not None and len(exclude):
+                idx = idx[~np.isin(idx, exclude)]
+            if len(idx):
+                return idx
+        return self.all[:0]
+
+
+_INDEX_CACHE_SIZE = 4
+_index_cache: Dict[int, Tuple[Sequence, PlannerIndex]] = {}
+_index_lock = threading.Lock()
+
+
+def get_planner_index(recipes: Sequence[Mapping[str, Any]]) -> PlannerIndex:
+    """
+    タプル（カタログの recipes など変更されない列）は同じオブジェクトごとに1回だけ作る
+    """
+    if not isinstance(recipes, tuple):
+        return PlannerIndex(recipes)
+    with _index_lock:
+        cached = _index_cache.get(id(recipes))
+        if cached is not None and cached[0] is recipes:
+            return cached[1]
+    index = PlannerIndex(recipes)
+    with _index_lock:
+        if len(_index_cache) >= _INDEX_CACHE_SIZE:
+            _index_cache.pop(next(iter(_index_cache)))
+        _index_cache[id(recipes)] = (recipes, index)
+    return index
+
+
+# ===== 探索 =====
+
+class _Problem:
+    """
+    fixed（固定した枠の合計）を目標から引いて残りの枠だけで比べる。スケールは元の目標のまま
+    """
+
+    def __init__(
+        self, total_kcal: float, targets: Optional[MacroTargets], fixed: Optional[np.ndarray] = None
+    ) -> None:
+        if targets is None:
+            self.target = np.array([total_kcal, 0, 0, 0], dtype=np.float32)
+            self.weights = np.array([KCAL_WEIGHT, 0, 0, 0], dtype=np.float32)
+        else:
+            self.target = np.array(
+                [total_kcal, targets.protein_g, targets.fat_g, targets.carbs_g], dtype=np.float32
+            )
+            self.weights = np.array(
+                [KCAL_WEIGHT, MACRO_WEIGHT, MACRO_WEIGHT, MACRO_WEIGHT], dtype=np.float32
+            )
+        self.scale = np.maximum(self.target, 1.0)
+        self.full_target = self.target
+        if fixed is not None:
+            self.target = (self.target - fixed).astype(np.float32)
+        # 重み 0 の栄養素は落とし、重み/スケールを掛けた空間で比べる（列 0 は kcal）
+        self.active = np.flatnonzero(self.weights > 0)
+        self.factor = (self.weights / self.scale)[self.active]
+
+    def scaled(self, totals: np.ndarray, offset: bool = True) -> np.ndarray:
+        """
+        offset=True なら目標を引く。前半（目標を引いたもの）+ 後半（引かないもの）でずれになる
+        """
+        values = totals - self.target if offset else totals
+        return np.ascontiguousarray(values[..., self.active] * self.factor)
+
+    @staticmethod
+    def scaled_cost(dev: np.ndarray) -> np.ndarray:
+        return np.abs(dev).sum(axis=-1) + (OVER_WEIGHT / KCAL_WEIGHT) * np.maximum(dev[..., 0], 0.0)
+
+    def cost(self, totals: np.ndarray) -> np.ndarray:
+        """
+        totals: (..., 4) の合計栄養値 → (...) のコスト
+        """
+        return self.scaled_cost(self.scaled(totals))
+
+
+def _combos(slots: List[np.ndarray], nutrition: np.ndarray, share_costs: List[np.ndarray]):
+    """
+    枠ごとの候補の直積 → (組み合わせ, 合計栄養値, 配分コスト)。同じレシピの重複は除く
+    """
+    if not slots:
+        return (
+            np.zeros((1, 0), dtype=np.int64),
+            np.zeros((1, nutrition.shape[1]), dtype=np.float32),
+            np.zeros(1, dtype=np.float32),
+        )
+    grids = np.meshgrid(*[np.arange(len(s)) for s in slots], indexing="ij")
+    pos = [g.ravel() for g in grids]
+    combos = np.stack([s[p] for s, p in zip(slots, pos)], axis=1)
+    share = np.sum([c[p] for c, p in zip(share_costs, pos)], axis=0).astype(np.float32)
+    if combos.shape[1] > 1:
+        ordered = np.sort(combos, axis=1)
+        keep = np.all(ordered[:, 1:] != ordered[:, :-1], axis=1)
+        combos, share = combos[keep], share[keep]
+    return combos, nutrition[combos].sum(axis=1), share
+
+
+def solve_day(
+    index: PlannerIndex,
+    total_kcal: float,
+    meal_types: Sequence[str] = DEFAULT_MEAL_TYPES,
+    targets: Optional[MacroTargets] = None,
+    time_budget_ms: float = TIME_BUDGET_MS,
+    shortlist_size: int = SHORTLIST_SIZE,
+    locked: Optional[Mapping[str, int]] = None,
+    exclude: Iterable[int] = (),
+) -> DayPlan:
+    """
+    meal_types の各枠に1品ずつ、合計が total_kcal（と targets）に最も近い組み合わせを選ぶ
+    - 配分は MEAL_BUDGETS を選ばれた枠で正規化したもの（ずれは弱いペナルティ）
+    - locked: {食事: レシピ添字} の枠はそのまま使い、残りの枠だけを選ぶ
+    - exclude: 使わないレシピ添字（固定した枠には効かない）
+    - 候補のない枠は None
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000.0
+    nutrition = index.nutrition
+    locked = {m: int(i) for m, i in (locked or {}).items() if m in meal_types}
+    fixed = nutrition[list(locked.values())].sum(axis=0) if locked else None
+    problem = _Problem(total_kcal, targets, fixed)
+    excluded = np.unique(np.fromiter([*exclude, *locked.values()], dtype=np.int64))
+
+    shares = np.array([MEAL_BUDGETS.get(m, 0.25) for m in meal_types], dtype=np.float32)
+    shares = shares / shares.sum() if shares.sum() > 0 else shares
+
+    slot_names: List[str] = []
+    slot_pools: List[np.ndarray] = []
+    slot_share_costs: List[np.ndarray] = []
+    for meal_type, share in zip(meal_types, shares):
+        if meal_type in locked:
+            continue
+        pool = index.pool(meal_type, total_kcal, excluded)
+        if len(pool) == 0:
+            continue
+        values = nutrition[pool]
+        share_cost = SHARE_WEIGHT * np.abs(values[:, 0] - share * total_kcal) / problem.scale[0]
+        slot_cost = (np.abs(values - share * problem.full_target) / problem.scale) @ problem.weights
+        slot_cost = slot_cost + share_cost
+        if len(pool) > shortlist_size:
+            keep = np.argpartition(slot_cost, shortlist_size - 1)[:shortlist_size]
+            keep = keep[np.argsort(slot_cost[keep], kind="stable")]
+        else:
+            keep = np.argsort(slot_cost, kind="stable")
+        slot_names.append(meal_type)
+        slot_pools.append(pool[keep])
+        slot_share_costs.append(share_cost[keep].astype(np.float32))
+
+    filled = _greedy(slot_pools)
+    slot_names = [slot_names[i] for i in filled]
+    slot_pools = [slot_pools[i] for i in filled]
+    slot_share_costs = [slot_share_costs[i] for i in filled]
+    best_combo = list(filled.values())
+    best_cost = _combo_cost(best_combo, slot_pools, slot_share_costs, nutrition, problem)
+    complete = True
+    if len(slot_pools) > 1:
+        half = (len(slot_pools) + 1) // 2
+        combo, cost, complete = _meet_in_the_middle(
+            slot_pools[:half], slot_share_costs[:half],
+            slot_pools[half:], slot_share_costs[half:],
+            nutrition, problem, best_cost, deadline,
+        )
+        if combo is not None and cost < best_cost:
+            best_combo, best_cost = combo, cost
+
+    chosen = {**dict(zip(slot_names, best_combo)), **locked}
+    indices = {m: chosen[m] for m in meal_types if m in chosen}
+    meals = {m: (index.recipes[indices[m]] if m in indices else None) for m in meal_types}
+    totals = nutrition[list(indices.values())].sum(axis=0) if indices else np.zeros(len(NUTRIENTS))
+    return DayPlan(
+        meals=meals,
+        indices=indices,
+        totals={f: float(v) for f, v in zip(NUTRIENTS, totals)},
+        cost=float(best_cost),
+        complete=complete,
+    )
+
+
+def solve_day_cached(
+    index: PlannerIndex,
+    total_kcal: float,
+    meal_types: Sequence[str] = DEFAULT_MEAL_TYPES,
+    targets: Optional[MacroTargets] = None,
+    time_budget_ms: float = TIME_BUDGET_MS,
+    locked: Optional[Mapping[str, int]] = None,
+    exclude: Iterable[int] = (),
+) -> Tuple[DayPlan, bool]:
+    """
+    solve_day を条件（目標・枠・固定・除外）ごとにキャッシュする → (解, キャッシュヒットか)
+    """
+    key = (
+        round(float(total_kcal), 3),
+        tuple(meal_types),
+        targets,
+        tuple(sorted((m, int(i)) for m, i in (locked or {}).items() if m in meal_types)),
+        frozenset(int(i) for i in exclude),
+    )
+    with index._cache_lock:
+        plan = index.day_cache.get(key)
+        if plan is not None:
+            index.day_cache.move_to_end(key)
+            return plan, True
+    plan = solve_day(
+        index, total_kcal, meal_types, targets, time_budget_ms,
+        locked=dict(key[3]), exclude=key[4],
+    )
+    with index._cache_lock:
+        index.day_cache[key] = plan
+        while len(index.day_cache) > DAY_CACHE_SIZE:
+            index.day_cache.popitem(last=False)
+    return plan, False
+
+
+def _greedy(slot_pools: List[np.ndarray]) -> Dict[int, int]:
+    """
+    枠ごとに先頭（単独コスト最小）から重複しないものを取る → {枠番号: レシピ添字}
+    - 区分を問わない代替候補どうしで取り合って埋まらない枠は落とす
+    """
+    chosen: Dict[int, int] = {}
+    for slot, pool in enumerate(slot_pools):
+        for idx in pool:
+            if int(idx) not in chosen.values():
+                chosen[slot] = int(idx)
+                break
+    return chosen
+
+
+def _combo_cost(
+    combo: List[int],
+    slot_pools: List[np.ndarray],
+    share_costs: List[np.ndarray],
+    nutrition: np.ndarray,
+    problem: _Problem,
+) -> float:
+    if not combo:
+        return float(problem.cost(np.zeros(len(NUTRIENTS), dtype=np.float32)))
+    share = sum(
+        float(costs[int(np.flatnonzero(pool == idx)[0])])
+        for idx, pool, costs in zip(combo, slot_pools, share_costs)
+    )
+    return float(problem.cost(nutrition[combo].sum(axis=0))) + share
+
+
+def _meet_in_the_middle(
+    pools_a: List[np.ndarray],
+    share_a: List[np.ndarray],
+    pools_b: List[np.ndarray],
+    share_b: List[np.ndarray],
+    nutrition: np.ndarray,
+    problem: _Problem,
+    best_cost: float,
+    deadline: float,
+) -> Tuple[Optional[List[int]], float, bool]:
+    """
+    best_cost より良い組だけを探す。kcal のずれの項だけで best_cost を超える範囲は
+    コストの下限から窓を計算して評価しない
+    """
+    combos_a, totals_a, costs_a = _combos(pools_a, nutrition, share_a)
+    combos_b, totals_b, costs_b = _combos(pools_b, nutrition, share_b)
+    order_a = np.argsort(totals_a[:, 0], kind="stable")
+    order_b = np.argsort(totals_b[:, 0], kind="stable")
+    combos_a, totals_a, costs_a = combos_a[order_a], totals_a[order_a], costs_a[order_a]
+    combos_b, totals_b, costs_b = combos_b[order_b], totals_b[order_b], costs_b[order_b]
+    kcal_b = totals_b[:, 0]
+
+    # 前半と後半で候補が重なるのは区分を問わない代替候補を使ったときだけ
+    overlap = bool(np.intersect1d(
+        np.concatenate(pools_a), np.concatenate(pools_b), assume_unique=False
+    ).size)
+
+    target_kcal, kcal_scale = float(problem.target[0]), float(problem.scale[0])
+    best: Optional[Tuple[int, int]] = None
+
+    dev_a = problem.scaled(totals_a)
+    dev_b = problem.scaled(totals_b, offset=False)
+
+    # 各前半に kcal の近い後半を SEED_NEIGHBORS 件ずつ当てて暫定最良を下げておくと、以降の窓が狭くなる
+    nearest = np.searchsorted(kcal_b, target_kcal - totals_a[:, 0])
+    for shift in range(-(SEED_NEIGHBORS // 2), SEED_NEIGHBORS // 2):
+        j = np.clip(nearest + shift, 0, len(kcal_b) - 1)
+        cost = problem.scaled_cost(dev_a + dev_b[j]) + costs_a + costs_b[j]
+        if overlap:
+            cost = np.where((combos_a[:, :, None] == combos_b[j][:, None, :]).any(axis=(1, 2)), np.inf, cost)
+        i = int(np.argmin(cost))
+        if cost[i] < best_cost:
+            best_cost = float(cost[i])
+            best = (i, int(j[i]))
+
+    for start in range(0, len(combos_a), BLOCK_ROWS):
+        if time.perf_counter() > deadline:
+            return _pair(best, combos_a, combos_b), best_cost, False
+        # 前半の各行について、合計 kcal が窓に入る後半の範囲 [lo, hi) だけを並べて一度に評価する
+        kcal_a = totals_a[start:start + BLOCK_ROWS, 0]
+        lo_kcal = target_kcal - best_cost * kcal_scale / KCAL_WEIGHT
+        hi_kcal = target_kcal + best_cost * kcal_scale / (KCAL_WEIGHT + OVER_WEIGHT)
+        lo = np.searchsorted(kcal_b, lo_kcal - kcal_a, side="left")
+        hi = np.searchsorted(kcal_b, hi_kcal - kcal_a, side="right")
+        counts = np.maximum(hi - lo, 0)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        rows = np.repeat(np.arange(start, start + len(kcal_a)), counts)
+        offsets = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        cols = np.arange(total) + offsets
+        cost = problem.scaled_cost(dev_a[rows] + dev_b[cols]) + costs_a[rows] + costs_b[cols]
+        if overlap:
+            same = combos_a[rows][:, :, None] == combos_b[cols][:, None, :]
+            cost = np.where(same.any(axis=(1, 2)), np.inf, cost)
+        k = int(np.argmin(cost))
+        if cost[k] < best_cost:
+            best_cost = float(cost[k])
+            best = (int(rows[k]), int(cols[k]))
+    return _pair(best, combos_a, combos_b), best_cost, True
+
+
+def _pair(
+    best: Optional[Tuple[int, int]], combos_a: np.ndarray, combos_b: np.ndarray
+) -> Optional[List[int]]:
+    if best is None:
+        return None
+    i, j = best
+    return [int(x) for x in combos_a[i]] + [int(x) for x in combos_b[j]]
@@ -1,5 +1,8 @@
 from dataclasses import dataclass
-from typing import Literal
+from functools import lru_cache
+from typing import Any, Iterable, Literal, Mapping, Sequence
+
+import numpy as np
 
 SexType = Literal["male", "female"]
 
@@ -21,8 +24,12 @@ ACTIVITY_LABELS_JA: dict[str, str] = {
 
 SAFETY_FLOOR = {"male": 1500, "female": 1200}
 
+DEFAULT_ACTIVITY_FACTOR = 1.375
+PROFILE_CACHE_SIZE = 1024
+PROFILE_BUCKET_KCAL = 200  # profile_bucket の目標 kcal の刻み
+
 
-@dataclass
+@dataclass(frozen=True)
 class TDEEResult:
     bmr_kcal: float
     tdee_kcal: float
@@ -47,7 +54,7 @@ def calc_tdee(
     deficit_kcal: int = 350,
 ) -> TDEEResult:
     bmr = calc_bmr(weight_kg, height_cm, age, sex)
-    factor = ACTIVITY_FACTORS.get(activity_level, 1.375)
+    factor = ACTIVITY_FACTORS.get(activity_level, DEFAULT_ACTIVITY_FACTOR)
     tdee = bmr * factor
     floor = SAFETY_FLOOR.get(sex, 1200)
     target = max(float(floor), tdee - deficit_kcal)
@@ -77,3 +84,154 @@ def format_profile_context(profile: dict, result: TDEEResult) -> str:
         f"PFC目標: たんぱく質{result.protein_target_g}g / "
         f"脂質{result.fat_target_g}g / 炭水化物{result.carbs_target_g}g。"
     )
+
+
+_PROFILE_FIELDS = ("weight_kg", "height_cm", "age", "sex", "activity_level", "calorie_deficit")
+
+
+@lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def _cached_tdee(key: tuple) -> TDEEResult:
+    weight_kg, height_cm, age, sex, activity_level, deficit_kcal = key[2:]
+    return calc_tdee(weight_kg, height_cm, age, sex, activity_level, deficit_kcal)
+
+
+def calc_tdee_for_profile(profile: Mapping[str, Any]) -> TDEEResult:
+    """
+    user_profile の行から計算する。(user_id, updated_at, 入力値) ごとに1回だけ計算して使い回す
+    - 入力値もキーに含めるので、同じ秒に更新されても古い結果は返らない
+    """
+    key = (
+        profile.get("user_id"),
+        profile.get("updated_at"),
+        *(profile[f] for f in _PROFILE_FIELDS),
+    )
+    return _cached_tdee(key)
+
+
+# ===== 一括計算（集計・レポート用） =====
+
+@dataclass(frozen=True)
+class TDEEBatch:
+    """
+    TDEEResult の各項目を配列にしたもの（i 番目が i 人目）
+    """
+    bmr_kcal: np.ndarray
+    tdee_kcal: np.ndarray
+    target_kcal: np.ndarray
+    deficit_kcal: np.ndarray
+    protein_target_g: np.ndarray
+    fat_target_g: np.ndarray
+    carbs_target_g: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.target_kcal)
+
+    def result(self, i: int) -> TDEEResult:
+        return TDEEResult(
+            bmr_kcal=float(self.bmr_kcal[i]),
+            tdee_kcal=float(self.tdee_kcal[i]),
+            target_kcal=float(self.target_kcal[i]),
+            deficit_kcal=int(self.deficit_kcal[i]),
+            protein_target_g=float(self.protein_target_g[i]),
+            fat_target_g=float(self.fat_target_g[i]),
+            carbs_target_g=float(self.carbs_target_g[i]),
+        )
+
+
+def _lookup(labels: np.ndarray, table: Mapping[str, float], default: float) -> np.ndarray:
+    """
+    文字列配列を表引きする（表の項目ごとに1回ずつ配列比較）
+    """
+    values = np.full(labels.shape, default, dtype=np.float64)
+    for label, value in table.items():
+        values[labels == label] = value
+    return values
+
+
+def _round1(values: np.ndarray) -> np.ndarray:
+    """
+    round(x, 1) と同じ結果にする。np.round は x*10 の誤差でちょうど半分の境目がずれるので、
+    境目付近だけ Python の round で丸め直す
+    """
+    scaled = values * 10
+    out = np.round(scaled) / 10
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if ties.size:
+        out[ties] = [round(float(v), 1) for v in values[ties]]
+    return out
+
+
+def calc_tdee_batch(
+    weight_kg: Sequence[float],
+    height_cm: Sequence[float],
+    age: Sequence[int],
+    sex: Sequence[str],
+    activity_level: Sequence[str],
+    deficit_kcal: Sequence[int] | int = 350,
+) -> TDEEBatch:
+    """
+    calc_tdee を配列で一度に計算する（結果は calc_tdee と一致）
+    """
+    weight = np.asarray(weight_kg, dtype=np.float64)
+    height = np.asarray(height_cm, dtype=np.float64)
+    ages = np.asarray(age, dtype=np.float64)
+    sexes = np.asarray(sex)
+    deficit = np.broadcast_to(np.asarray(deficit_kcal, dtype=np.int64), weight.shape)
+
+    base = 10 * weight + 6.25 * height - 5 * ages
+    bmr = np.where(sexes == "male", base + 5, base - 161)
+    tdee = bmr * _lookup(np.asarray(activity_level), ACTIVITY_FACTORS, DEFAULT_ACTIVITY_FACTOR)
+    floor = np.where(sexes == "male", SAFETY_FLOOR["male"], SAFETY_FLOOR["female"])
+    target = np.maximum(floor, tdee - deficit)
+
+    protein = _round1(1.6 * weight)
+    fat = _round1((target * 0.25) / 9)
+    carbs = _round1(np.maximum(0.0, (target - protein * 4 - fat * 9) / 4))
+
+    return TDEEBatch(
+        bmr_kcal=_round1(bmr),
+        tdee_kcal=_round1(tdee),
+        target_kcal=_round1(target),
+        deficit_kcal=np.array(deficit),
+        protein_target_g=protein,
+        fat_target_g=fat,
+        carbs_target_g=carbs,
+    )
+
+
+def calc_tdee_for_profiles(profiles: Iterable[Mapping[str, Any]]) -> TDEEBatch:
+    """
+    user_profile の行の並びから calc_tdee_batch する
+    """
+    rows = list(profiles)
+    columns = {f: [r[f] for r in rows] for f in _PROFILE_FIELDS}
+    return calc_tdee_batch(
+        columns["weight_kg"], columns["height_cm"], columns["age"],
+        columns["sex"], columns["activity_level"], columns["calorie_deficit"],
+    )
+
+
+def build_profile_context(profile: dict | None) -> str:
+    """
+    RAG のプロンプトに渡すプロフィール文。未設定なら固定文言
+    """
+    if not profile:
+        return "プロフィール未設定"
+    return format_profile_context(profile, calc_tdee_for_profile(profile))
+
+
+def profile_bucket(profile: dict | None) -> str:
+    """
+    回答キャッシュで共有する単位。性別・目標 kcal の帯・赤字設定だけを見る
+    - 年齢・体重などの実数まで含めると、同じキャッシュを共有するユーザーがほぼいなくなる
+    - 区分を使うときはプロンプトにもこの文だけを渡す（qa_chain）ので、そのまま読める文にしている
+    """
+    if not profile:
+        return "プロフィール未設定"
+    result = calc_tdee_for_profile(profile)
+    band = int(result.target_kcal // PROFILE_BUCKET_KCAL) * PROFILE_BUCKET_KCAL
+    sex_ja = "男性" if profile["sex"] == "male" else "女性"
+    return (
+        f"{sex_ja}。1日の目標摂取カロリー: {band}〜{band + PROFILE_BUCKET_KCAL}kcal "
+        f"（{result.deficit_kcal}kcal赤字）。"
+    )
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.config import Settings
+
+CREATE_ANSWER_CACHE = """
+CREATE TABLE IF NOT EXISTS answer_cache (
+    cache_key   TEXT PRIMARY KEY,
+    context_key TEXT NOT NULL,
+    question    TEXT NOT NULL,
+    embedding   BLOB,
+    result      TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_answer_cache_context ON answer_cache(context_key);
+CREATE INDEX IF NOT EXISTS idx_answer_cache_access ON answer_cache(last_access);
+"""
+
+
+def normalize_question(question: str) -> str:
+    q = unicodedata.normalize("NFKC", question).lower()
+    return "".join(q.split()).rstrip("?？。.!！")
+
+
+def _sha(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    LLM 回答の SQLite キャッシュ
+    - context_key: 参照チャンク ID・プロフィールの区分（tdee.profile_bucket）・モデル・temperature。
+      これが同じ回答だけを共有する
+    - cache_key: context_key + 正規化した質問（完全一致ヒット）
+    - similarity_threshold > 0 なら、同じ context_key の中で質問 Embedding のコサイン類似度でもヒット
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_sec: float = 86400,
+        max_entries: int = 10_000,
+        similarity_threshold: float = 0.0,
+        embeddings: Optional[Embeddings] = None,
+    ) -> None:
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embeddings = embeddings
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._con.executescript(CREATE_ANSWER_CACHE)
+        self._con.commit()
+
+    @staticmethod
+    def context_key(
+        doc_ids: List[str], profile_bucket: str, model: str, temperature: float
+    ) -> str:
+        return _sha(",".join(doc_ids), profile_bucket, model, f"{temperature:.2f}")
+
+    def _embed(self, question: str) -> Optional[bytes]:
+        if self.similarity_threshold <= 0 or self.embeddings is None:
+            return None
+        vec = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm > 0 else vec).tobytes()
+
+    def get(
+        self,
+        question: str,
+        doc_ids: List[str],
+        profile_bucket: str,
+        model: str,
+        temperature: float,
+    ) -> Optional[Dict[str, Any]]:
+        ctx = self.context_key(doc_ids, profile_bucket, model, temperature)
+        key = _sha(ctx, normalize_question(question))
+        oldest = time.time() - self.ttl_sec
+
+        with self._lock:
+            row = self._con.execute(
+                "SELECT result FROM answer_cache WHERE cache_key=? AND created_at>=?",
+                (key, oldest),
+            ).fetchone()
+            hit_key = key if row else None
+
+        if row is None and self.similarity_threshold > 0 and self.embeddings is not None:
+            with self._lock:
+                candidates = self._con.execute(
+                    """SELECT cache_key, embedding, result FROM answer_cache
+                       WHERE context_key=? AND created_at>=? AND embedding IS NOT NULL""",
+                    (ctx, oldest),
+                ).fetchall()
+            query_blob = self._embed(question) if candidates else None
+            # Embedding モデルを切り替えた後の古い行（次元違い）は比較しない
+            candidates = [c for c in candidates if query_blob and len(c[1]) == len(query_blob)]
+            if candidates:
+                query = np.frombuffer(query_blob, dtype=np.float32)
+                matrix = np.stack([np.frombuffer(c[1], dtype=np.float32) for c in candidates])
+                sims = matrix @ query
+                best = int(np.argmax(sims))
+                if sims[best] >= self.similarity_threshold:
+                    hit_key, _, result = candidates[best]
+                    row = (result,)
+                    with self._lock:
+                        self.semantic_hits += 1
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._con.execute(
+                "UPDATE answer_cache SET last_access=? WHERE cache_key=?",
+                (time.time(), hit_key),
+            )
+            self._con.commit()
+        return json.loads(row[0])
+
+    def put(
+        self,
+        question: str,
+        doc_ids: List[str],
+        profile_bucket: str,
+        model: str,
+        temperature: float,
+        result: Dict[str, Any],
+    ) -> None:
+        ctx = self.context_key(doc_ids, profile_bucket, model, temperature)
+        normalized = normalize_question(question)
+        key = _sha(ctx, normalized)
+        embedding = self._embed(question)
+        now = time.time()
+        with self._lock:
+            self._con.execute(
+                """INSERT OR REPLACE INTO answer_cache
+                   (cache_key, context_key, question, embedding, result, created_at, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (key, ctx, normalized, embedding,
+                 json.dumps(result, ensure_ascii=False), now, now),
+            )
+            self._evict(now)
+            self._con.commit()
+
+    def _evict(self, now: float) -> None:
+        self._con.execute(
+            "DELETE FROM answer_cache WHERE created_at<?", (now - self.ttl_sec,)
+        )
+        count = self._con.execute("SELECT COUNT(*) FROM answer_cache").fetchone()[0]
+        if count > self.max_entries:
+            self._con.execute(
+                """DELETE FROM answer_cache WHERE cache_key IN (
+                       SELECT cache_key FROM answer_cache ORDER BY last_access LIMIT ?
+                   )""",
+                (count - self.max_entries,),
+            )
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._con.execute("DELETE FROM answer_cache")
+            self._con.commit()
+
+
+_CACHES: Dict[str, AnswerCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_answer_cache(
+    settings: Settings, embeddings: Optional[Embeddings] = None
+) -> Optional[AnswerCache]:
+    """
+    ANSWER_CACHE_PATH が空ならキャッシュなし（None）。同じファイルはプロセス内で使い回す
+    """
+    if not settings.answer_cache_path:
+        return None
+    with _CACHES_LOCK:
+        cache = _CACHES.get(settings.answer_cache_path)
+        if cache is None:
+            cache = AnswerCache(settings.answer_cache_path)
+            _CACHES[settings.answer_cache_path] = cache
+        cache.ttl_sec = settings.answer_cache_ttl_sec
+        cache.max_entries = settings.answer_cache_max_entries
+        cache.similarity_threshold = settings.answer_cache_similarity
+        if embeddings is not None:
+            cache.embeddings = embeddings
+        return cache
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from src.rag.numpy_store import NumpyVectorStore
+
+# (質問, 件数, where, 結果を返す Future)
+_Request = Tuple[str, int, Optional[dict], Future]
+
+# ワーカーを止める合図（これより前に積まれた質問は処理してから止まる）
+_STOP = None
+
+
+def _where_key(where: Optional[dict]) -> str:
+    return json.dumps(where or {}, sort_keys=True, ensure_ascii=False)
+
+
+class QueryBatcher:
+    """
+    同時に来たベクトル検索をまとめて処理するマイクロバッチ
+    - 最初の1件から max_wait_ms 待つ間（または max_batch_size 件に達するまで）に来た質問を束ね、
+      embed_documents 1回 + 行列の top-k 検索1回で処理して各呼び出し元に返す
+    - 同じ質問はまとめて1回だけ Embedding する。where が違う質問は条件ごとに検索する
+    - NumPy ストアは行列積、Chroma は query_embeddings に複数渡す。それ以外は1件ずつ検索
+    """
+
+    def __init__(
+        self,
+        vectorstore: VectorStore,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        self.vectorstore = vectorstore
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_sec = max(0.0, max_wait_ms) / 1000
+        self.batches = 0
+        self.queries = 0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    # ===== 呼び出し側 =====
+
+    def submit(self, query: str, k: int, where: Optional[dict] = None) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("QueryBatcher is shut down")
+            self._ensure_worker()
+            self._queue.put((query, k, where, future))
+        return future
+
+    def search(self, query: str, k: int, where: Optional[dict] = None) -> List[Document]:
+        return self.submit(query, k, where).result()
+
+    async def asearch(self, query: str, k: int, where: Optional[dict] = None) -> List[Document]:
+        return await asyncio.wrap_future(self.submit(query, k, where))
+
+    def shutdown(self, wait: bool = False, timeout: Optional[float] = None) -> None:
+        """
+        新しい質問を受け付けなくし、積まれた分を処理し終えたらワーカーを止める
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(_STOP)
+        if wait and thread is not None:
+            thread.join(timeout)
+
+    # ===== バッチ処理スレッド =====
+
+    def _ensure_worker(self) -> None:
+        """
+        self._lock を持って呼ぶ
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+            self._thread.start()
+
+    def _collect(self) -> Tuple[List[_Request], bool]:
+        """
+        (バッチ, 止める合図を受け取ったか)
+        - 取り出した時点で Future を実行中にし、既にキャンセルされた質問は捨てる。
+          実行中の Future はキャンセルできないので、結果を返すときに状態エラーにならない
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first] if first[3].set_running_or_notify_cancel() else []
+        deadline = time.monotonic() + self.max_wait_sec
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            if item[3].set_running_or_notify_cancel():
+                batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if not batch:
+                continue
+            try:
+                results = self._process(batch)
+            except Exception as exc:
+                logging.warning("Batched vector search failed (%d queries): %s", len(batch), exc)
+                for *_, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (*_, future), docs in zip(batch, results):
+                future.set_result(docs)
+
+    def _process(self, batch: List[_Request]) -> List[List[Document]]:
+        self.batches += 1
+        self.queries += len(batch)
+
+        texts = list(dict.fromkeys(q for q, *_ in batch))
+        vectors = self.vectorstore.embeddings.embed_documents(texts)
+        vector_of = dict(zip(texts, vectors))
+
+        groups: Dict[str, List[int]] = {}
+        for i, (_, _, where, _) in enumerate(batch):
+            groups.setdefault(_where_key(where), []).append(i)
+
+        results: List[List[Document]] = [[] for _ in batch]
+        for members in groups.values():
+            where = batch[members[0]][2]
+            k = max(batch[i][1] for i in members)
+            hits = self._search_vectors([vector_of[batch[i][0]] for i in members], k, where)
+            for i, docs in zip(members, hits):
+                results[i] = docs[: batch[i][1]]
+        return results
+
+    def _search_vectors(
+        self, vectors: List[List[float]], k: int, where: Optional[dict]
+    ) -> List[List[Document]]:
+        store = self.vectorstore
+        if isinstance(store, NumpyVectorStore):
+            hits = store.similarity_search_with_score_by_vectors(vectors, k, filter=where)
+            return [[d for d, _ in row] for row in hits]
+
+        collection = getattr(store, "_collection", None)
+        if collection is not None:
+            res = collection.query(
+                query_embeddings=vectors,
+                n_results=k,
+                where=where or None,
+                include=["documents", "metadatas"],
+            )
+            return [
+                [
+                    Document(id=doc_id, page_content=text or "", metadata=meta or {})
+                    for doc_id, text, meta in zip(ids, texts, metas)
+                ]
+                for ids, texts, metas in zip(res["ids"], res["documents"], res["metadatas"])
+            ]
+
+        search_kwargs = {"filter": where} if where else {}
+        return [store.similarity_search_by_vector(v, k=k, **search_kwargs) for v in vectors]
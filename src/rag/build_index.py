@@ -1,74 +1,323 @@
+import hashlib
+import json
 import logging
 import os
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 
 from src.config import Settings
+from src.rag.embedding_cache import CachedEmbeddings, get_embedding_cache
+from src.rag.local_embeddings import HashingNgramEmbeddings
+from src.rag.numpy_store import NumpyVectorStore
 from src.utils.text import split_documents
 
+MANIFEST_FILENAME = "index_manifest.json"
+MANIFEST_VERSION = 1
 
-def get_embeddings(settings: Settings) -> OpenAIEmbeddings:
-    return OpenAIEmbeddings(model=settings.embedding_model)
 
+def embedding_model_name(settings: Settings) -> str:
+    if settings.embedding_backend == "local":
+        return HashingNgramEmbeddings(dim=settings.local_embedding_dim).model_name
+    return settings.embedding_model
 
-def load_or_build_vectorstore(docs: List[Document], settings: Settings) -> Chroma:
+
+def get_embeddings(settings: Settings) -> Embeddings:
     """
-    - chroma_db/ が存在すればロード
-    - なければ作成して永続化
+    EMBEDDING_BACKEND で切り替え
+    - openai: OpenAIEmbeddings（EMBEDDING_CACHE_PATH が空ならキャッシュなし）
+    - local: ハッシュ化文字 n-gram（ネットワーク不要・十分速いのでキャッシュしない）
     """
-    os.makedirs(settings.db_dir, exist_ok=True)
+    if settings.embedding_backend == "local":
+        return HashingNgramEmbeddings(dim=settings.local_embedding_dim)
+    if settings.embedding_backend != "openai":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {settings.embedding_backend}")
 
-    embeddings = get_embeddings(settings)
+    embeddings = OpenAIEmbeddings(model=settings.embedding_model)
+    if not settings.embedding_cache_path:
+        return embeddings
+    cache = get_embedding_cache(
+        settings.embedding_cache_path, settings.embedding_cache_max_entries
+    )
+    return CachedEmbeddings(embeddings, cache, model=settings.embedding_model)
 
-    # まずロードを試す（失敗したら作る）
-    try:
-        vs = Chroma(
-            collection_name=settings.collection_name,
-            persist_directory=settings.db_dir,
-            embedding_function=embeddings,
+
+def chunk_id(doc: Document, settings: Settings) -> str:
+    """
+    チャンクの内容ハッシュ（本文・メタデータ・分割設定・Embeddingモデル）を ID にする。
+    どれか1つでも変われば別チャンクとして扱い、再 Embedding の対象になる。
+    """
+    payload = json.dumps(
+        {
+            "text": doc.page_content,
+            "metadata": doc.metadata,
+            "chunk_size": settings.chunk_size,
+            "chunk_overlap": settings.chunk_overlap,
+            "embedding_model": embedding_model_name(settings),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def iter_chunks(docs: Iterable[Document], settings: Settings) -> Iterator[Tuple[str, Document]]:
+    """
+    分割したチャンクを (chunk_id, Document) で1件ずつ流す（同一内容は最初の1件だけ）
+    - 覚えておくのは出現済みの chunk_id だけで、チャンク本文は溜めない
+    """
+    seen: Set[str] = set()
+    for d in split_documents(docs, settings):
+        cid = chunk_id(d, settings)
+        if cid in seen:
+            continue
+        seen.add(cid)
+        yield cid, Document(
+            page_content=d.page_content,
+            metadata={**d.metadata, "chunk_id": cid},
         )
-        # 何か入っているか軽くチェック（空なら作り直す）
+
+
+def _manifest_path(settings: Settings) -> str:
+    return os.path.join(settings.db_dir, MANIFEST_FILENAME)
+
+
+def load_manifest(settings: Settings) -> Optional[Set[str]]:
+    path = _manifest_path(settings)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as exc:
+        logging.warning("Index manifest unreadable; falling back to collection ids: %s", exc)
+        return None
+    if data.get("version") != MANIFEST_VERSION:
+        return None
+    return set(data.get("ids", []))
+
+
+def save_manifest(settings: Settings, ids: Iterable[str]) -> None:
+    os.makedirs(settings.db_dir, exist_ok=True)
+    path = _manifest_path(settings)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "ids": sorted(ids)}, f)
+    os.replace(tmp_path, path)
+
+
+def _embed_with_retry(
+    embeddings: Embeddings, texts: List[str], settings: Settings
+) -> List[List[float]]:
+    attempts = max(1, settings.embed_max_retries)
+    delay = 1.0
+    for attempt in range(1, attempts + 1):
         try:
-            existing = vs._collection.count()  # type: ignore[attr-defined]
-            if existing > 0:
-                return vs
+            return embeddings.embed_documents(texts)
         except Exception as exc:
-            logging.warning("Chroma count failed; rebuilding: %s", exc)
+            if attempt >= attempts:
+                raise
+            logging.warning(
+                "Embedding batch failed (attempt %d/%d); retrying in %.1fs: %s",
+                attempt, attempts, delay, exc,
+            )
+            time.sleep(delay)
+            delay *= 2
+    raise RuntimeError("unreachable")
+
+
+def _upsert_page(
+    vs: VectorStore, ids: List[str], docs: List[Document], vectors: List[List[float]]
+) -> None:
+    if isinstance(vs, NumpyVectorStore):
+        # ページごとに書き出すと全体コピーが繰り返されるので、最後に1回だけ persist
+        vs.add_embeddings(
+            ids, [d.page_content for d in docs], [d.metadata for d in docs], vectors,
+            persist=False,
+        )
+        return
+    vs._collection.upsert(  # type: ignore[attr-defined]
+        ids=ids,
+        embeddings=vectors,
+        metadatas=[d.metadata for d in docs],
+        documents=[d.page_content for d in docs],
+    )
+
+
+def add_chunks_batched(
+    vs: VectorStore, chunks: Dict[str, Document], settings: Settings, persist: bool = True
+) -> None:
+    """
+    チャンクをバッチに分けてスレッドプールで並列に Embedding し、
+    出来上がった順にページ単位でまとめてベクトルストアに書き込む
+    - persist=False なら NumPy ストアの書き出しは呼び出し側に任せる（続けて追加するとき用）
+    """
+    ids = list(chunks)
+    if not ids:
+        return
+    embeddings = vs.embeddings
+    batch_size = max(1, settings.embed_batch_size)
+    batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+    started = time.perf_counter()
+    page_ids: List[str] = []
+    page_docs: List[Document] = []
+    page_vectors: List[List[float]] = []
+
+    with ThreadPoolExecutor(max_workers=max(1, settings.embed_max_workers)) as pool:
+        futures = {
+            pool.submit(
+                _embed_with_retry,
+                embeddings,
+                [chunks[cid].page_content for cid in batch],
+                settings,
+            ): batch
+            for batch in batches
+        }
+        for fut in as_completed(futures):
+            batch = futures[fut]
+            page_ids.extend(batch)
+            page_docs.extend(chunks[cid] for cid in batch)
+            page_vectors.extend(fut.result())
+            if len(page_ids) >= settings.index_page_size:
+                _upsert_page(vs, page_ids, page_docs, page_vectors)
+                page_ids, page_docs, page_vectors = [], [], []
+
+    if page_ids:
+        _upsert_page(vs, page_ids, page_docs, page_vectors)
+    if persist and isinstance(vs, NumpyVectorStore):
+        vs.persist()
+
+    elapsed = time.perf_counter() - started
+    logging.info(
+        "Embedded %d chunks in %.2fs (%.1f chunks/sec, batch=%d, workers=%d)",
+        len(ids), elapsed, len(ids) / elapsed if elapsed > 0 else float("inf"),
+        batch_size, settings.embed_max_workers,
+    )
+
+
+def _store_ids(vs: VectorStore) -> List[str]:
+    if isinstance(vs, NumpyVectorStore):
+        return vs.get_ids()
+    return vs.get(include=[])["ids"]  # type: ignore[attr-defined]
+
+
+def _store_count(vs: VectorStore) -> int:
+    if isinstance(vs, NumpyVectorStore):
+        return len(vs.get_ids())
+    return vs._collection.count()  # type: ignore[attr-defined]
+
+
+def _indexed_ids(vs: VectorStore, settings: Settings) -> Set[str]:
+    """
+    マニフェストを優先し、欠損・不整合時はストアの実 ID を使う
+    """
+    manifest = load_manifest(settings)
+    try:
+        count = _store_count(vs)
     except Exception as exc:
-        logging.warning("Chroma load failed; rebuilding: %s", exc)
+        logging.warning("Vectorstore count failed; trusting manifest: %s", exc)
+        return manifest or set()
+    if manifest is not None and len(manifest) == count:
+        return manifest
+    return set(_store_ids(vs))
 
-    # ビルド（分割→追加→永続化）
-    split_docs = split_documents(docs, settings)
-    vs = Chroma(
-        collection_name=settings.collection_name,
-        persist_directory=settings.db_dir,
-        embedding_function=embeddings,
+
+def sync_vectorstore(
+    vs: VectorStore, docs: Iterable[Document], settings: Settings
+) -> VectorStore:
+    """
+    現在のドキュメントとマニフェストの差分だけを反映する
+    - 追加・変更されたチャンク → Embedding して追加（RAG_INDEX_PAGE_SIZE 件溜まるごとに書き込む）
+    - 消えたチャンク → 削除
+    - チャンクは流しながら処理し、全件の Document を同時に持たない（持つのは chunk_id の集合だけ）
+    """
+    indexed = _indexed_ids(vs, settings)
+    current: Set[str] = set()
+    pending: Dict[str, Document] = {}
+    added = 0
+    page_size = max(1, settings.index_page_size)
+
+    for cid, doc in iter_chunks(docs, settings):
+        current.add(cid)
+        if cid in indexed:
+            continue
+        pending[cid] = doc
+        if len(pending) >= page_size:
+            add_chunks_batched(vs, pending, settings, persist=False)
+            added += len(pending)
+            pending = {}
+    if pending:
+        add_chunks_batched(vs, pending, settings, persist=False)
+        added += len(pending)
+
+    if isinstance(vs, NumpyVectorStore):
+        vs.persist()
+    to_delete = [cid for cid in indexed if cid not in current]
+    if to_delete:
+        vs.delete(ids=to_delete)
+
+    save_manifest(settings, current)
+    logging.info(
+        "Vectorstore synced: %d added, %d deleted, %d unchanged",
+        added, len(to_delete), len(current) - added,
     )
-    vs.add_documents(split_docs)
     return vs
 
 
-def rebuild_vectorstore(docs: List[Document], settings: Settings) -> Chroma:
+def open_vectorstore(settings: Settings) -> VectorStore:
     """
-    DBを作り直したい時用（将来UIボタンで使用）
+    RAG_VECTOR_STORE で切り替え
+    - chroma: Chroma（既定）
+    - numpy: mmap した .npy を総当たりで内積検索する NumpyVectorStore
     """
     embeddings = get_embeddings(settings)
-    # Chromaは同名collectionが残ることがあるので別名運用もあり。
-    # MVPはシンプルに同名で再作成を試みる。
-    vs = Chroma(
+    if settings.vector_store == "numpy":
+        return NumpyVectorStore(
+            settings.db_dir, embeddings, dtype=settings.vector_dtype
+        )
+    if settings.vector_store != "chroma":
+        raise ValueError(f"Unknown RAG_VECTOR_STORE: {settings.vector_store}")
+    return Chroma(
         collection_name=settings.collection_name,
         persist_directory=settings.db_dir,
         embedding_function=embeddings,
     )
+
+
+def load_or_build_vectorstore(docs: Iterable[Document], settings: Settings) -> VectorStore:
+    """
+    - chroma_db/ をロードし、マニフェストとの差分だけを Embedding
+    - 初回は全チャンクを追加して永続化
+    """
+    os.makedirs(settings.db_dir, exist_ok=True)
+    vs = open_vectorstore(settings)
+    return sync_vectorstore(vs, docs, settings)
+
+
+def rebuild_vectorstore(docs: Iterable[Document], settings: Settings) -> VectorStore:
+    """
+    DBを作り直したい時用（将来UIボタンで使用）
+    """
+    os.makedirs(settings.db_dir, exist_ok=True)
+    vs = open_vectorstore(settings)
     # 既存を消して入れ直し（失敗しても継続）
     try:
-        vs._collection.delete(where={})  # type: ignore[attr-defined]
+        existing = _store_ids(vs)
+        if existing:
+            vs.delete(ids=existing)
     except Exception as exc:
-        logging.warning("Chroma delete failed; continuing: %s", exc)
+        logging.warning("Vectorstore delete failed; continuing: %s", exc)
 
-    split_docs = split_documents(docs, settings)
-    vs.add_documents(split_docs)
-    return vs
+    try:
+        os.remove(_manifest_path(settings))
+    except FileNotFoundError:
+        pass
+
+    return sync_vectorstore(vs, docs, settings)
@@ -0,0 +1,166 @@
+import array
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+CREATE_EMBEDDING_CACHE = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model       TEXT NOT NULL,
+    text_hash   TEXT NOT NULL,
+    vector      BLOB NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_access
+    ON embedding_cache(last_access);
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array.array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vec = array.array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+class EmbeddingCache:
+    """
+    (モデル名, sha256(text)) → ベクトル の SQLite キャッシュ
+    - 参照時刻を更新し、上限件数を超えたら古いものから削除（LRU）
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._con.executescript(CREATE_EMBEDDING_CACHE)
+        self._con.commit()
+        self._count = self._con.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        keys = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        if not keys:
+            return found
+        with self._lock:
+            # SQLite の変数上限に収まるよう分割して引く
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._con.execute(
+                    f"SELECT text_hash, vector FROM embedding_cache "
+                    f"WHERE model=? AND text_hash IN ({placeholders})",
+                    (model, *part),
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = _unpack(blob)
+            if found:
+                now = time.time()
+                self._con.executemany(
+                    "UPDATE embedding_cache SET last_access=? WHERE model=? AND text_hash=?",
+                    [(now, model, h) for h in found],
+                )
+                self._con.commit()
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]) -> None:
+        now = time.time()
+        rows = [(model, h, _pack(vec), now) for h, vec in items]
+        if not rows:
+            return
+        with self._lock:
+            self._con.executemany(
+                """INSERT OR REPLACE INTO embedding_cache
+                   (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)""",
+                rows,
+            )
+            self._count += len(rows)
+            if self._count > self.max_entries:
+                self._evict()
+            self._con.commit()
+
+    def _evict(self) -> None:
+        # 上限の 90% まで一気に削って、毎回の削除を避ける
+        self._count = self._con.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        self._con.execute(
+            """DELETE FROM embedding_cache WHERE rowid IN (
+                   SELECT rowid FROM embedding_cache ORDER BY last_access LIMIT ?
+               )""",
+            (excess,),
+        )
+        self._count -= excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._con.execute("DELETE FROM embedding_cache")
+            self._con.commit()
+            self._count = 0
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    embed_documents / embed_query の両方をキャッシュ経由にするラッパー
+    - ヒットした分は Embedding API を呼ばない
+    """
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache, model: str) -> None:
+        self.inner = inner
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(t) for t in texts]
+        found = self.cache.get_many(self.model, hashes)
+
+        missing: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = t
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model, new_items)
+            found.update(new_items)
+
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        h = text_hash(text)
+        found = self.cache.get_many(self.model, [h])
+        if h in found:
+            return found[h]
+        vector = self.inner.embed_query(text)
+        self.cache.put_many(self.model, [(h, vector)])
+        return vector
+
+
+_CACHES: Dict[str, EmbeddingCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_embedding_cache(path: str, max_entries: int) -> EmbeddingCache:
+    """
+    同じファイルへの接続はプロセス内で使い回す
+    """
+    with _CACHES_LOCK:
+        cache = _CACHES.get(path)
+        if cache is None:
+            cache = EmbeddingCache(path, max_entries=max_entries)
+            _CACHES[path] = cache
+        cache.max_entries = max_entries
+        return cache
@@ -0,0 +1,174 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+MEAL_TYPE_ALIASES: dict[str, list[str]] = {
+    "朝食": ["朝食", "朝ごはん", "朝ご飯", "breakfast"],
+    "昼食": ["昼食", "昼ごはん", "昼ご飯", "ランチ", "lunch"],
+    "夕食": ["夕食", "夕飯", "晩ごはん", "晩ご飯", "ディナー", "dinner"],
+    "間食": ["間食", "おやつ", "スナック", "snack"],
+}
+
+NUTRIENT_ALIASES: dict[str, list[str]] = {
+    "protein_g": ["たんぱく質", "タンパク質", "蛋白質", "protein"],
+    "fat_g": ["脂質", "脂肪", "fat"],
+    "carbs_g": ["炭水化物", "糖質", "carbs", "carbohydrates?"],
+}
+
+# (前置ラベル, 単位)
+FIELD_LABELS_JA: dict[str, tuple[str, str]] = {
+    "calories_kcal": ("", "kcal"),
+    "protein_g": ("たんぱく質", "g"),
+    "fat_g": ("脂質", "g"),
+    "carbs_g": ("炭水化物", "g"),
+}
+
+# 後置の比較語（日本語）
+_JA_OPS: dict[str, str] = {
+    "以下": "$lte", "以内": "$lte", "まで": "$lte", "未満": "$lt",
+    "より少な": "$lt", "以上": "$gte", "超": "$gt", "より多": "$gt",
+}
+# 前置の比較語（英語・記号）
+_EN_OPS: dict[str, str] = {
+    "under": "$lt", "below": "$lt", "less than": "$lt", "<": "$lt",
+    "at most": "$lte", "max": "$lte", "<=": "$lte",
+    "over": "$gt", "above": "$gt", "more than": "$gt", ">": "$gt",
+    "at least": "$gte", "min": "$gte", ">=": "$gte",
+}
+_OP_LABELS_JA = {"$lte": "以下", "$lt": "未満", "$gte": "以上", "$gt": "超"}
+
+_COMPARATORS = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+_NUM = r"(\d+(?:\.\d+)?)"
+_JA_OP = "(" + "|".join(_JA_OPS) + ")"
+_EN_OP = "(" + "|".join(sorted(map(re.escape, _EN_OPS), key=len, reverse=True)) + ")"
+_KCAL_UNIT = r"(?:kcal|キロカロリー|calories|cal|カロリー)"
+_GRAM_UNIT = r"(?:g|グラム)"
+
+
+@dataclass(frozen=True)
+class RecipeFilter:
+    """
+    質問から取り出した構造化条件
+    - conditions: (メタデータ名, 演算子, 値) のタプル。演算子は Chroma の where と同じ表記
+    """
+    meal_type: Optional[str] = None
+    conditions: Tuple[Tuple[str, str, float], ...] = ()
+
+    def is_empty(self) -> bool:
+        return self.meal_type is None and not self.conditions
+
+    def to_where(self) -> Optional[Dict[str, Any]]:
+        clauses: list[Dict[str, Any]] = []
+        if self.meal_type:
+            clauses.append({"meal_type": {"$eq": self.meal_type}})
+        for field, op, value in self.conditions:
+            clauses.append({field: {op: value}})
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
+
+    def describe(self) -> str:
+        parts = []
+        if self.meal_type:
+            parts.append(self.meal_type)
+        for field, op, value in self.conditions:
+            label, unit = FIELD_LABELS_JA.get(field, (field, ""))
+            parts.append(f"{label}{value:g}{unit}{_OP_LABELS_JA[op]}")
+        return " / ".join(parts)
+
+
+def _normalize(question: str) -> str:
+    return unicodedata.normalize("NFKC", question).lower()
+
+
+def _parse_meal_type(q: str) -> Optional[str]:
+    for meal_type, aliases in MEAL_TYPE_ALIASES.items():
+        if any(re.search(a, q) for a in aliases):
+            return meal_type
+    return None
+
+
+def _parse_amount(q: str, field: str, subject: str, unit: str) -> list[Tuple[str, str, float]]:
+    conds: list[Tuple[str, str, float]] = []
+    # 例: 「300kcal以下」「たんぱく質20g以上」
+    for m in re.finditer(subject + r"\s*(?:が|は|を|の)?\s*" + _NUM + r"\s*" + unit + r"\s*" + _JA_OP, q):
+        conds.append((field, _JA_OPS[m.group(2)], float(m.group(1))))
+    # 例: 「under 300kcal」「protein at least 20g」
+    for m in re.finditer(subject + r"\s*" + _EN_OP + r"\s*" + _NUM + r"\s*" + unit, q):
+        conds.append((field, _EN_OPS[m.group(1)], float(m.group(2))))
+    return conds
+
+
+def parse_query_filters(question: str) -> RecipeFilter:
+    """
+    質問文から食事の種類・カロリー・PFC の条件を取り出す。
+    比較語（以下・以上・under など）が付いた数値だけを条件とみなす。
+    """
+    q = _normalize(question)
+    conditions: list[Tuple[str, str, float]] = []
+
+    for field, aliases in NUTRIENT_ALIASES.items():
+        subject = "(?:" + "|".join(aliases) + ")"
+        conditions.extend(_parse_amount(q, field, subject, _GRAM_UNIT))
+
+    # カロリーは主語なしで書かれることが多い（「300kcal以下の夕食」）
+    conditions.extend(_parse_amount(q, "calories_kcal", "", _KCAL_UNIT))
+
+    return RecipeFilter(
+        meal_type=_parse_meal_type(q),
+        conditions=tuple(dict.fromkeys(conditions)),
+    )
+
+
+def metadata_column(metadatas: list[dict], field: str) -> np.ndarray:
+    """
+    メタデータ1項目ぶんの列配列（数値なら float64、欠損は NaN）
+    """
+    values = [m.get(field) for m in metadatas]
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.asarray(values, dtype=object)
+
+
+def where_mask(
+    where: Dict[str, Any], column: Callable[[str], np.ndarray], n: int
+) -> np.ndarray:
+    """
+    Chroma の where 書式（$and / $or / $eq / $lte など）を列配列に対するマスクとして評価する
+    """
+    mask = np.ones(n, dtype=bool)
+    for key, cond in where.items():
+        if key == "$and":
+            for sub in cond:
+                mask &= where_mask(sub, column, n)
+        elif key == "$or":
+            any_mask = np.zeros(n, dtype=bool)
+            for sub in cond:
+                any_mask |= where_mask(sub, column, n)
+            mask &= any_mask
+        else:
+            col = column(key)
+            if not isinstance(cond, dict):
+                cond = {"$eq": cond}
+            for op, value in cond.items():
+                if op == "$in":
+                    mask &= np.isin(col, list(value))
+                elif op == "$nin":
+                    mask &= ~np.isin(col, list(value))
+                else:
+                    mask &= _COMPARATORS[op](col, value)
+    return mask
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import Settings
+from src.nutrition.ingredients import extract_material_items, ingredient_names, normalize_ingredient
+from src.rag.build_index import iter_chunks
+from src.rag.filters import RecipeFilter, metadata_column, where_mask
+from src.recipes import RecipeCatalog
+from src.recipes.store import NUTRITION_FIELDS
+from src.utils.text import recipe_metadata, recipes_to_documents
+
+KEYWORD_INDEX_FILENAME = "keyword_index.json"
+
+# qa_chain._extract_keywords と同じ文字種。長音「ー」はカタカナ語（チーズ等）のために足している
+_CJK_RUN = re.compile(r"[ぁ-んァ-ンー一-龥]+")
+_ASCII_RUN = re.compile(r"[a-zA-Z0-9]{2,}")
+_QUERY_SEPARATORS = re.compile(r"[、,，・/\s]+")
+# 「鶏むねと豆腐」の「と」「や」。もやし・さといものように食材名の中にも現れるので、
+# 両側が食材名として読めるときだけ区切りとみなす
+_QUERY_CONJUNCTIONS = ("と", "や")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    日本語は文字 1-gram + 2-gram、英数字は単語（数字のみは除外）
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens: List[str] = []
+    for run in _CJK_RUN.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(w for w in _ASCII_RUN.findall(text) if not w.isdigit())
+    return tokens
+
+
+def _doc_text(doc: Document) -> str:
+    # タイトル・タグ・本文をまとめて索引する（qa_chain のガードレールと同じ範囲）
+    return "\n".join([
+        str(doc.metadata.get("title", "")),
+        str(doc.metadata.get("tags", "")),
+        doc.page_content,
+    ])
+
+
+def _fingerprint(ids: Iterable[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(ids)).encode("utf-8")).hexdigest()
+
+
+class KeywordIndex:
+    """
+    チャンク単位の転置インデックス（BM25）
+    - postings: トークン → (チャンク番号の配列, 出現回数の配列)
+    - ingredients: 【材料】行から取り出した食材名（食材名だけの質問の判定用）
+    - チャンクの本文・メタデータは持たない。チャンクごとに chunk_id と元レシピの位置（catalog.recipes の添字）だけを持ち、
+      ヒットしたチャンクはカタログのレシピ（レシピストアなら SQLite）から分割し直して組み立てる
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        recipe_ids: List[str],
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        doc_len: np.ndarray,
+        ingredients: Iterable[str],
+        fingerprint: str,
+        catalog: RecipeCatalog,
+        settings: Settings,
+    ) -> None:
+        self.ids = ids
+        self.catalog = catalog
+        self.settings = settings
+        position = {r["id"]: i for i, r in enumerate(catalog.recipes)}
+        # カタログにないレシピ（索引を作った後に消えた）は KeyError → 作り直し
+        self.recipe_pos = np.fromiter(
+            (position[rid] for rid in recipe_ids), dtype=np.int32, count=len(recipe_ids)
+        )
+        self.postings = postings
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+        # 保存済みの索引は正規化前の名前を持っていることがあるので、読み込み時にも揃える
+        self.ingredients = {normalize_ingredient(n) for n in ingredients}
+        self.fingerprint = fingerprint
+        n = len(ids)
+        self.idf = {
+            tok: math.log(1 + (n - len(idx) + 0.5) / (len(idx) + 0.5))
+            for tok, (idx, _) in postings.items()
+        }
+        self._columns: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def build(
+        cls, chunks: Iterable[Tuple[str, Document]], catalog: RecipeCatalog, settings: Settings
+    ) -> "KeywordIndex":
+        """
+        チャンクは流しながら索引し、本文は残さない
+        """
+        ids: List[str] = []
+        recipe_ids: List[str] = []
+        raw: Dict[str, Tuple[List[int], List[int]]] = {}
+        doc_len: List[int] = []
+        ingredients: set[str] = set()
+
+        for i, (cid, doc) in enumerate(chunks):
+            ids.append(cid)
+            recipe_ids.append(doc.metadata["id"])
+            counts = Counter(tokenize(_doc_text(doc)))
+            doc_len.append(sum(counts.values()))
+            for tok, tf in counts.items():
+                idx, tfs = raw.setdefault(tok, ([], []))
+                idx.append(i)
+                tfs.append(tf)
+            for item in extract_material_items(doc.page_content):
+                ingredients.update(normalize_ingredient(n) for n in ingredient_names(item))
+
+        postings = {
+            tok: (np.asarray(idx, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for tok, (idx, tfs) in raw.items()
+        }
+        return cls(
+            ids, recipe_ids, postings,
+            np.asarray(doc_len, dtype=np.float32),
+            sorted(ingredients), _fingerprint(ids), catalog, settings,
+        )
+
+    # ===== 永続化 =====
+
+    def save(self, path: str) -> None:
+        recipes = self.catalog.recipes
+        data = {
+            "fingerprint": self.fingerprint,
+            "ids": self.ids,
+            "recipe_ids": [recipes[i]["id"] for i in self.recipe_pos.tolist()],
+            "doc_len": self.doc_len.tolist(),
+            "ingredients": sorted(self.ingredients),
+            "postings": {
+                tok: [idx.tolist(), tfs.tolist()] for tok, (idx, tfs) in self.postings.items()
+            },
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, catalog: RecipeCatalog, settings: Settings) -> "KeywordIndex":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        postings = {
+            tok: (np.asarray(idx, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for tok, (idx, tfs) in data["postings"].items()
+        }
+        return cls(
+            data["ids"], data["recipe_ids"], postings,
+            np.asarray(data["doc_len"], dtype=np.float32),
+            data["ingredients"], data["fingerprint"], catalog, settings,
+        )
+
+    # ===== 検索 =====
+
+    def _column(self, field: str) -> np.ndarray:
+        """
+        レシピ単位の列をチャンクの並びに展開する（栄養素はカタログの配列をそのまま使う）
+        """
+        col = self._columns.get(field)
+        if col is None:
+            if field in NUTRITION_FIELDS:
+                per_recipe = self.catalog.nutrition[field].astype(np.float64)
+            else:
+                per_recipe = metadata_column([recipe_metadata(r) for r in self.catalog.recipes], field)
+            col = per_recipe[self.recipe_pos]
+            self._columns[field] = col
+        return col
+
+    def _documents(self, positions: List[int]) -> List[Document]:
+        """
+        チャンク番号 → Document。元レシピを分割し直し、chunk_id が一致するものを使う
+        """
+        wanted: Dict[int, List[int]] = {}
+        for i in positions:
+            wanted.setdefault(int(self.recipe_pos[i]), []).append(i)
+        found: Dict[int, Document] = {}
+        for pos, members in wanted.items():
+            recipe_docs = recipes_to_documents([self.catalog.recipes[pos]])
+            by_id = dict(iter_chunks(recipe_docs, self.settings))
+            for i in members:
+                doc = by_id.get(self.ids[i])
+                if doc is None:
+                    logging.warning("Keyword index chunk %s not found in recipe; skipped", self.ids[i])
+                    continue
+                found[i] = Document(id=self.ids[i], page_content=doc.page_content, metadata=doc.metadata)
+        return [found[i] for i in positions if i in found]
+
+    def is_ingredient_query(self, question: str) -> bool:
+        """
+        「鶏むね」「豆腐、卵」「鶏むねと豆腐」のように食材名だけを並べた質問か
+        - 各語は normalize_ingredient で揃えてから引く（「たまご」→「卵」）
+        """
+        q = unicodedata.normalize("NFKC", question).lower().strip(" ?？。!！")
+        parts = [p for p in _QUERY_SEPARATORS.split(q) if p]
+        if not parts:
+            return False
+        return all(self._is_ingredient_list(part) for part in parts)
+
+    def _is_ingredient_name(self, part: str) -> bool:
+        name = normalize_ingredient(part)
+        if name in self.ingredients:
+            return True
+        return len(name) >= 2 and any(name in known for known in self.ingredients)
+
+    def _is_ingredient_list(self, part: str) -> bool:
+        """
+        part 全体が食材名か、「と」「や」で食材名に分けられるか
+        """
+        if self._is_ingredient_name(part):
+            return True
+        for i, ch in enumerate(part):
+            if (
+                ch in _QUERY_CONJUNCTIONS and 0 < i < len(part) - 1
+                and self._is_ingredient_name(part[:i])
+                and self._is_ingredient_list(part[i + 1:])
+            ):
+                return True
+        return False
+
+    def search(
+        self, query: str, k: int, filters: Optional[RecipeFilter] = None
+    ) -> List[Tuple[Document, float]]:
+        n = len(self.ids)
+        if n == 0:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        for tok, qtf in Counter(tokenize(query)).items():
+            posting = self.postings.get(tok)
+            if posting is None:
+                continue
+            idx, tf = posting
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[idx] / self.avgdl)
+            scores[idx] += qtf * self.idf[tok] * tf * (BM25_K1 + 1) / (tf + norm)
+
+        if filters is not None and not filters.is_empty():
+            scores[~where_mask(filters.to_where() or {}, self._column, n)] = 0.0
+
+        hits = np.flatnonzero(scores > 0)
+        if hits.size == 0:
+            return []
+        order = hits[np.argsort(-scores[hits], kind="stable")[:k]].tolist()
+        docs = {d.id: d for d in self._documents(order)}
+        return [(docs[self.ids[i]], float(scores[i])) for i in order if self.ids[i] in docs]
+
+
+def _index_path(settings: Settings) -> str:
+    return os.path.join(settings.db_dir, KEYWORD_INDEX_FILENAME)
+
+
+def load_or_build_keyword_index(catalog: RecipeCatalog, settings: Settings) -> KeywordIndex:
+    """
+    保存済みインデックスのチャンク構成が現在と同じならロード、違えば作り直して保存
+    - 構成の確認は chunk_id だけを流して行い、作り直すときにもう一度チャンクを流す
+    """
+    path = _index_path(settings)
+    if os.path.exists(path):
+        try:
+            index = KeywordIndex.load(path, catalog, settings)
+            current = _fingerprint(cid for cid, _ in iter_chunks(recipes_to_documents(catalog.recipes), settings))
+            if index.fingerprint == current:
+                return index
+        except (OSError, ValueError, KeyError) as exc:
+            logging.warning("Keyword index unreadable; rebuilding: %s", exc)
+
+    os.makedirs(settings.db_dir, exist_ok=True)
+    index = KeywordIndex.build(iter_chunks(recipes_to_documents(catalog.recipes), settings), catalog, settings)
+    index.save(path)
+    logging.info("Keyword index built: %d chunks, %d tokens", len(index.ids), len(index.postings))
+    return index
@@ -0,0 +1,61 @@
+import unicodedata
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashingNgramEmbeddings(Embeddings):
+    """
+    外部サービス不要の決定的な Embedding
+    - 文字 n-gram（日本語向けに 1〜3 文字）を crc32 で dim 次元にハッシュ
+    - 符号付きで加算し、L2 正規化（内積 = コサイン類似度）
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (1, 3)) -> None:
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    @property
+    def model_name(self) -> str:
+        lo, hi = self.ngram_range
+        return f"local-hash-ngram-{lo}{hi}-{self.dim}"
+
+    def _features(self, text: str) -> List[int]:
+        text = unicodedata.normalize("NFKC", text).lower()
+        text = "".join(text.split())
+        lo, hi = self.ngram_range
+        hashes = []
+        for n in range(lo, hi + 1):
+            for i in range(len(text) - n + 1):
+                hashes.append(zlib.crc32(text[i:i + n].encode("utf-8")))
+        return hashes
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        """
+        全テキストの特徴をまとめて1回の np.add.at で行列化する
+        """
+        rows: List[int] = []
+        hashes: List[int] = []
+        for row, text in enumerate(texts):
+            feats = self._features(text)
+            rows.extend([row] * len(feats))
+            hashes.extend(feats)
+
+        mat = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if hashes:
+            h = np.asarray(hashes, dtype=np.uint32)
+            cols = (h % self.dim).astype(np.intp)
+            signs = np.where(h & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(mat, (np.asarray(rows, dtype=np.intp), cols), signs)
+
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        np.divide(mat, norms, out=mat, where=norms > 0)
+        return mat
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_matrix(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_matrix([text])[0].tolist()
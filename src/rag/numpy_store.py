@@ -0,0 +1,290 @@
+import json
+import os
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.rag.filters import metadata_column, where_mask
+
+VECTORS_FILENAME = "vectors.npy"
+META_FILENAME = "vectors_meta.json"
+
+
+def normalize_rows(mat: np.ndarray) -> np.ndarray:
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return np.divide(mat, norms, out=np.zeros_like(mat), where=norms > 0)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    argpartition で上位 k 件だけ取り出してから並べ替える（全件ソートしない）
+    - 2次元 (クエリ数, 件数) なら行ごとに上位 k 件
+    """
+    n = scores.shape[-1]
+    if k >= n:
+        return np.argsort(-scores, axis=-1)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1)
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    正規化済みベクトルを連続した .npy に置き、mmap で読む総当たり検索ストア
+    - vectors.npy: (件数, 次元) の float32 / float16
+    - vectors_meta.json: ids / 本文 / メタデータ
+    - 書き込みは一時ファイル → os.replace。他プロセスは更新時刻を見て再マップする
+    - filter（Chroma の where と同じ書式）はメタデータの列配列で先に絞ってから内積を取る
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embedding: Embeddings,
+        dtype: str = "float32",
+    ) -> None:
+        self.directory = directory
+        self._embedding = embedding
+        self.dtype = np.dtype(dtype)
+        self._vectors = np.zeros((0, 0), dtype=self.dtype)
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._pending: Dict[str, Tuple[str, dict, np.ndarray]] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._loaded_mtime = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, VECTORS_FILENAME)
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, META_FILENAME)
+
+    # ===== 永続化 =====
+
+    def _load(self) -> None:
+        if not (os.path.exists(self._meta_path) and os.path.exists(self._vectors_path)):
+            return
+        mtime = os.stat(self._meta_path).st_mtime_ns
+        with open(self._meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(self._vectors_path, mmap_mode="r")
+        if vectors.shape[0] != len(meta["ids"]):
+            # 他プロセスの書き込み途中。次の検索で読み直す
+            return
+        self._vectors = vectors
+        self._ids = meta["ids"]
+        self._texts = meta["texts"]
+        self._metadatas = meta["metadatas"]
+        self._columns = {}
+        self._loaded_mtime = mtime
+
+    def _maybe_reload(self) -> None:
+        try:
+            mtime = os.stat(self._meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._loaded_mtime:
+            self._load()
+
+    def _write(
+        self, ids: List[str], texts: List[str], metadatas: List[dict], vectors: np.ndarray
+    ) -> None:
+        tmp_vectors = self._vectors_path + ".tmp.npy"
+        tmp_meta = self._meta_path + ".tmp"
+        np.save(tmp_vectors, np.ascontiguousarray(vectors, dtype=self.dtype))
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "texts": texts, "metadatas": metadatas}, f, ensure_ascii=False)
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_meta, self._meta_path)
+        self._load()
+
+    def persist(self) -> None:
+        """
+        add_embeddings(persist=False) で溜めた分を既存と合わせて1回で書き出す
+        """
+        if not self._pending:
+            return
+        keep = [i for i, id_ in enumerate(self._ids) if id_ not in self._pending]
+        ids = [self._ids[i] for i in keep] + list(self._pending)
+        texts = [self._texts[i] for i in keep] + [t for t, _, _ in self._pending.values()]
+        metadatas = [self._metadatas[i] for i in keep] + [m for _, m, _ in self._pending.values()]
+        new_vectors = normalize_rows(np.stack([v for _, _, v in self._pending.values()]))
+        if keep:
+            vectors = np.concatenate([np.asarray(self._vectors[keep], dtype=np.float32), new_vectors])
+        else:
+            vectors = new_vectors
+        self._pending = {}
+        self._write(ids, texts, metadatas, vectors)
+
+    # ===== 書き込み =====
+
+    def get_ids(self) -> List[str]:
+        self._maybe_reload()
+        return list(self._ids)
+
+    def add_embeddings(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[dict],
+        vectors: Iterable[List[float]],
+        persist: bool = True,
+    ) -> List[str]:
+        for id_, text, meta, vec in zip(ids, texts, metadatas, vectors):
+            self._pending[id_] = (text, meta, np.asarray(vec, dtype=np.float32))
+        if persist:
+            self.persist()
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        return self.add_embeddings(ids, texts, metadatas, vectors)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        self._maybe_reload()
+        drop = set(ids or [])
+        if not drop:
+            return True
+        keep = [i for i, id_ in enumerate(self._ids) if id_ not in drop]
+        self._write(
+            [self._ids[i] for i in keep],
+            [self._texts[i] for i in keep],
+            [self._metadatas[i] for i in keep],
+            np.asarray(self._vectors[keep], dtype=np.float32).reshape(
+                len(keep), self._vectors.shape[1]
+            ),
+        )
+        return True
+
+    # ===== メタデータ絞り込み =====
+
+    def _column(self, field: str) -> np.ndarray:
+        # 列配列はロードごとに作り直し、同じ項目の絞り込みでは使い回す
+        col = self._columns.get(field)
+        if col is None:
+            col = metadata_column(self._metadatas, field)
+            self._columns[field] = col
+        return col
+
+    # ===== 検索 =====
+
+    def _to_document(self, i: int) -> Document:
+        return Document(
+            id=self._ids[i], page_content=self._texts[i], metadata=dict(self._metadatas[i])
+        )
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        self._maybe_reload()
+        if not self._ids:
+            return []
+        query = normalize_rows(np.asarray([embedding], dtype=np.float32))[0]
+        query = query.astype(self._vectors.dtype)
+
+        where = kwargs.get("filter")
+        if where:
+            rows = np.flatnonzero(where_mask(where, self._column, len(self._ids)))
+            if rows.size == 0:
+                return []
+            scores = np.asarray(self._vectors[rows] @ query, dtype=np.float32)
+        else:
+            rows = None
+            scores = np.asarray(self._vectors @ query, dtype=np.float32)
+
+        idx = top_k_indices(scores, k)
+        return [
+            (self._to_document(int(i if rows is None else rows[i])), float(scores[i]))
+            for i in idx
+        ]
+
+    def similarity_search_with_score_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[dict] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        複数クエリをまとめて検索する。(クエリ数, 次元) @ (次元, 件数) の行列積1回と行ごとの top-k
+        - filter は全クエリ共通（条件の違うクエリは呼び出し側で分ける）
+        """
+        self._maybe_reload()
+        if not self._ids or not embeddings:
+            return [[] for _ in embeddings]
+        queries = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        queries = queries.astype(self._vectors.dtype)
+
+        if filter:
+            rows = np.flatnonzero(where_mask(filter, self._column, len(self._ids)))
+            if rows.size == 0:
+                return [[] for _ in embeddings]
+            matrix = self._vectors[rows]
+        else:
+            rows = None
+            matrix = self._vectors
+        scores = np.asarray(queries @ matrix.T, dtype=np.float32)
+
+        idx = top_k_indices(scores, k)
+        return [
+            [
+                (self._to_document(int(i if rows is None else rows[i])), float(scores[q, i]))
+                for i in idx[q]
+            ]
+            for q in range(len(embeddings))
+        ]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # 正規化済みベクトルの内積（コサイン類似度）を 0〜1 に寄せる
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        directory: str = "numpy_db",
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
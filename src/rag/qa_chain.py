@@ -1,11 +1,12 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import re
 
-from langchain_openai import ChatOpenAI
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.config import Settings
+from src.rag.answer_cache import AnswerCache
+from src.resources import get_chat_model, get_resource
 
 STOPWORDS = {
     "おすすめ", "料理", "レシピ", "あります", "ください",
@@ -45,6 +46,10 @@ def build_prompt() -> ChatPromptTemplate:
     return ChatPromptTemplate.from_messages([("system", system), ("user", user)])
 
 
+def get_prompt() -> ChatPromptTemplate:
+    return get_resource(("prompt",), build_prompt)
+
+
 def format_context(docs: List[Document]) -> str:
     parts = []
     for i, d in enumerate(docs, start=1):
@@ -82,13 +87,26 @@ def _build_joined_text(docs: list[Document]) -> str:
     return _normalize("\n".join([_doc_text_for_match(d) for d in docs]))
 
 
-def answer_question(
-    question: str,
-    retrieved_docs: List[Document],
-    settings: Settings,
-    temperature: float = 0.2,
-    profile_context: str = "プロフィール未設定",
-) -> Dict[str, Any]:
+def _doc_ids(docs: List[Document]) -> List[str]:
+    return [str(d.metadata.get("chunk_id") or d.metadata.get("id", "")) for d in docs]
+
+
+def _source(d: Document, snippet_len: int) -> Dict[str, Any]:
+    return {
+        "title": d.metadata.get("title", "unknown"),
+        "snippet": d.page_content[:snippet_len] + ("..." if len(d.page_content) > snippet_len else ""),
+        "calories_kcal": d.metadata.get("calories_kcal", 0),
+        "protein_g": d.metadata.get("protein_g", 0),
+        "fat_g": d.metadata.get("fat_g", 0),
+        "carbs_g": d.metadata.get("carbs_g", 0),
+        "recipe_id": d.metadata.get("id", ""),
+    }
+
+
+def _guardrail_result(question: str, retrieved_docs: List[Document]) -> Optional[Dict[str, Any]]:
+    """
+    LLM を呼ぶ前の「該当なし」判定。呼んでよければ None
+    """
     if len(retrieved_docs) == 0:
         return {
             "answer": "判定: 該当なし\n回答: 該当するレシピは参照データに存在しません。\n根拠: 参照レシピが取得できませんでした。",
@@ -106,41 +124,108 @@ def answer_question(
                 "回答: 該当するレシピは参照データに存在しません。\n"
                 "根拠: 参照レシピ内に質問条件に一致する記述がありません。"
             ),
-            "sources": [
-                {
-                    "title": d.metadata.get("title", "unknown"),
-                    "snippet": d.page_content[:200] + ("..." if len(d.page_content) > 200 else ""),
-                    "calories_kcal": d.metadata.get("calories_kcal", 0),
-                    "protein_g": d.metadata.get("protein_g", 0),
-                    "fat_g": d.metadata.get("fat_g", 0),
-                    "carbs_g": d.metadata.get("carbs_g", 0),
-                    "recipe_id": d.metadata.get("id", ""),
-                }
-                for d in retrieved_docs
-            ],
+            "sources": [_source(d, 200) for d in retrieved_docs],
         }
+    return None
 
-    llm = ChatOpenAI(model=settings.chat_model, temperature=temperature)
-    prompt = build_prompt()
-    context = format_context(retrieved_docs)
 
-    messages = prompt.format_messages(
+def _format_messages(question: str, retrieved_docs: List[Document], profile_context: str):
+    prompt = get_prompt()
+    return prompt.format_messages(
         question=question,
-        context=context,
+        context=format_context(retrieved_docs),
         profile_context=profile_context,
     )
-    resp = llm.invoke(messages)
-
-    sources = []
-    for d in retrieved_docs:
-        sources.append({
-            "title": d.metadata.get("title", "unknown"),
-            "snippet": d.page_content[:400] + ("..." if len(d.page_content) > 400 else ""),
-            "calories_kcal": d.metadata.get("calories_kcal", 0),
-            "protein_g": d.metadata.get("protein_g", 0),
-            "fat_g": d.metadata.get("fat_g", 0),
-            "carbs_g": d.metadata.get("carbs_g", 0),
-            "recipe_id": d.metadata.get("id", ""),
-        })
-
-    return {"answer": resp.content, "sources": sources}
+
+
+def _profile_text(profile_context: str, profile_bucket: Optional[str]) -> str:
+    """
+    プロンプトとキャッシュキーの両方に使うプロフィール文
+    - 区分（tdee.profile_bucket）があれば区分の文だけを使う。回答は同じ区分のユーザーで共有されるので、
+      年齢・体重など個人の値をプロンプトに入れると他のユーザーに漏れる
+    - 区分がなければプロフィール文そのもの（キャッシュもその文の完全一致でだけ共有する）
+    """
+    return profile_bucket or profile_context
+
+
+def _cache_key(
+    question: str, retrieved_docs: List[Document], profile_text: str, settings: Settings, temperature: float
+) -> Tuple[str, List[str], str, str, float]:
+    return question, _doc_ids(retrieved_docs), profile_text, settings.chat_model, temperature
+
+
+def answer_question(
+    question: str,
+    retrieved_docs: List[Document],
+    settings: Settings,
+    temperature: float = 0.2,
+    profile_context: str = "プロフィール未設定",
+    cache: Optional[AnswerCache] = None,
+    profile_bucket: Optional[str] = None,
+) -> Dict[str, Any]:
+    guarded = _guardrail_result(question, retrieved_docs)
+    if guarded is not None:
+        return guarded
+
+    profile_text = _profile_text(profile_context, profile_bucket)
+    cache_args = _cache_key(question, retrieved_docs, profile_text, settings, temperature)
+    if cache is not None:
+        cached = cache.get(*cache_args)
+        if cached is not None:
+            return cached
+
+    llm = get_chat_model(settings.chat_model, temperature)
+    resp = llm.invoke(_format_messages(question, retrieved_docs, profile_text))
+
+    result = {"answer": resp.content, "sources": [_source(d, 400) for d in retrieved_docs]}
+    if cache is not None:
+        cache.put(*cache_args, result)
+    return result
+
+
+def stream_answer(
+    question: str,
+    retrieved_docs: List[Document],
+    settings: Settings,
+    temperature: float = 0.2,
+    profile_context: str = "プロフィール未設定",
+    cache: Optional[AnswerCache] = None,
+    profile_bucket: Optional[str] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    answer_question のストリーミング版。(種類, 値) を順に yield する
+    - ("sources", list): 検索直後に1回
+    - ("token", str): 回答の断片（ガードレール・キャッシュヒット時は全文を1回）
+    - ("result", dict): 最後に1回。answer_question と同じ形
+    """
+    guarded = _guardrail_result(question, retrieved_docs)
+    if guarded is not None:
+        yield "sources", guarded["sources"]
+        yield "token", guarded["answer"]
+        yield "result", guarded
+        return
+
+    sources = [_source(d, 400) for d in retrieved_docs]
+    yield "sources", sources
+
+    profile_text = _profile_text(profile_context, profile_bucket)
+    cache_args = _cache_key(question, retrieved_docs, profile_text, settings, temperature)
+    if cache is not None:
+        cached = cache.get(*cache_args)
+        if cached is not None:
+            yield "token", cached["answer"]
+            yield "result", cached
+            return
+
+    llm = get_chat_model(settings.chat_model, temperature)
+    parts: List[str] = []
+    for chunk in llm.stream(_format_messages(question, retrieved_docs, profile_text)):
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        if text:
+            parts.append(text)
+            yield "token", text
+
+    result = {"answer": "".join(parts), "sources": sources}
+    if cache is not None:
+        cache.put(*cache_args, result)
+    yield "result", result
@@ -1,5 +1,117 @@
-from langchain_community.vectorstores import Chroma
+from typing import List, Optional
 
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
 
-def build_retriever(vectorstore: Chroma, top_k: int):
-    return vectorstore.as_retriever(search_kwargs={"k": top_k})
+from src.rag.batching import QueryBatcher
+from src.rag.filters import RecipeFilter
+from src.rag.keyword_index import KeywordIndex
+
+RRF_K = 60
+
+
+def _doc_key(doc: Document) -> str:
+    return str(doc.metadata.get("chunk_id") or doc.page_content)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25（転置インデックス）とベクトル検索を Reciprocal Rank Fusion で統合する
+    - 食材名だけの質問は BM25 のみで返し、Embedding を呼ばない
+    """
+
+    vectorstore: VectorStore
+    keyword_index: KeywordIndex
+    k: int = 3
+    filters: Optional[RecipeFilter] = None
+    fetch_k: int = 20
+    batcher: Optional[QueryBatcher] = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        keyword_hits = self.keyword_index.search(query, self.fetch_k, self.filters)
+        if keyword_hits and self.keyword_index.is_ingredient_query(query):
+            return [d for d, _ in keyword_hits[: self.k]]
+
+        vector_hits = _vector_search(
+            self.vectorstore, self.batcher, query, self.fetch_k, self.filters
+        )
+
+        scores: dict[str, float] = {}
+        docs: dict[str, Document] = {}
+        for ranked in ([d for d, _ in keyword_hits], vector_hits):
+            for rank, doc in enumerate(ranked, start=1):
+                key = _doc_key(doc)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+                docs.setdefault(key, doc)
+
+        ordered = sorted(scores, key=lambda key: scores[key], reverse=True)
+        return [docs[key] for key in ordered[: self.k]]
+
+
+class BatchedVectorRetriever(BaseRetriever):
+    """
+    ベクトル検索のみ。同時に来た質問は QueryBatcher でまとめて検索する
+    """
+
+    vectorstore: VectorStore
+    batcher: QueryBatcher
+    k: int = 3
+    filters: Optional[RecipeFilter] = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return _vector_search(self.vectorstore, self.batcher, query, self.k, self.filters)
+
+
+def _vector_search(
+    vectorstore: VectorStore,
+    batcher: Optional[QueryBatcher],
+    query: str,
+    k: int,
+    filters: Optional[RecipeFilter],
+) -> List[Document]:
+    where = filters.to_where() if filters is not None and not filters.is_empty() else None
+    if batcher is not None:
+        return batcher.search(query, k, where)
+    search_kwargs = {"filter": where} if where else {}
+    return vectorstore.similarity_search(query, k=k, **search_kwargs)
+
+
+def build_retriever(
+    vectorstore: VectorStore,
+    top_k: int,
+    filters: RecipeFilter | None = None,
+    keyword_index: KeywordIndex | None = None,
+    batcher: QueryBatcher | None = None,
+):
+    """
+    - keyword_index があればハイブリッド検索（BM25 + ベクトル）
+    - filters があればベクトル検索の前にメタデータで絞り込む（Chroma の where / NumPy の列マスク）
+    - batcher があれば同時に来た質問のベクトル検索をまとめて行う
+    """
+    if keyword_index is not None:
+        return HybridRetriever(
+            vectorstore=vectorstore,
+            keyword_index=keyword_index,
+            k=top_k,
+            filters=filters,
+            fetch_k=max(top_k * 4, 20),
+            batcher=batcher,
+        )
+    if batcher is not None:
+        return BatchedVectorRetriever(
+            vectorstore=vectorstore, batcher=batcher, k=top_k, filters=filters
+        )
+    search_kwargs: dict = {"k": top_k}
+    if filters is not None and not filters.is_empty():
+        search_kwargs["filter"] = filters.to_where()
+    return vectorstore.as_retriever(search_kwargs=search_kwargs)
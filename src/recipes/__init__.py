@@ -0,0 +1,12 @@
+from src.recipes.catalog import Recipe, RecipeCatalog, StoredRecipe, get_catalog, load_catalog
+from src.recipes.store import RecipeStore, write_recipe_store
+
+__all__ = [
+    "Recipe",
+    "RecipeCatalog",
+    "RecipeStore",
+    "StoredRecipe",
+    "get_catalog",
+    "load_catalog",
+    "write_recipe_store",
+]
@@ -0,0 +1,211 @@
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from src.nutrition.ingredients import (
+    IngredientIndex,
+    extract_material_items,
+    get_ingredient_index,
+    ingredient_names,
+)
+from src.recipes.store import NUTRITION_FIELDS, RecipeStore, is_store_path, iter_recipe_file
+
+Recipe = Mapping[str, Any]
+
+BUILTIN_SOURCE = ""
+
+
+def freeze_recipe(recipe: Mapping[str, Any]) -> Recipe:
+    """
+    読み取り専用にする（tags はタプル）。dict(recipe) で通常の dict に戻せる
+    """
+    if isinstance(recipe, (MappingProxyType, StoredRecipe)):
+        return recipe
+    data = dict(recipe)
+    data["tags"] = tuple(data.get("tags") or ())
+    return MappingProxyType(data)
+
+
+def _text_ingredients(text: str) -> frozenset:
+    names: set[str] = set()
+    for item in extract_material_items(text):
+        names.update(ingredient_names(item))
+    return frozenset(names)
+
+
+class StoredRecipe(Mapping):
+    """
+    レシピストア上の1件。本文以外はメモリに持ち、"text" は読まれたときにストアから引く
+    """
+
+    __slots__ = ("_data", "_store")
+
+    def __init__(self, data: Dict[str, Any], store: RecipeStore) -> None:
+        self._data = data
+        self._store = store
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "text":
+            return self._store.get_text(self._data["id"])
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._data
+        yield "text"
+
+    def __len__(self) -> int:
+        return len(self._data) + 1
+
+    def __repr__(self) -> str:
+        return f"StoredRecipe({self._data!r})"
+
+
+class RecipeCatalog:
+    """
+    プロセス内で共有するレシピ一覧（変更不可）
+    - recipes: 読み取り専用マッピングのタプル（元データの並び順）
+    - id / タイトル / 食事区分の索引と、【材料】から取り出した食材名の集合をロード時に作る
+    - 食材の逆引き索引（ingredient_index）は初めて使うときに作る
+    - nutrition: 栄養素ごとの float32 配列（recipes と同じ並び）
+    - version: 読み込み元の識別子（ファイルなら更新時刻）。変わったら派生インデックスを作り直す
+    - ingredients を渡した場合は本文を読まない（レシピストアから読むとき用）
+    - nutrition を渡した場合は栄養素の配列をレシピから組み立てない（同じ並びであること）
+    """
+
+    def __init__(
+        self,
+        recipes: Iterable[Mapping[str, Any]],
+        version: str = "builtin",
+        ingredients: Optional[Dict[str, frozenset]] = None,
+        nutrition: Optional[Mapping[str, np.ndarray]] = None,
+    ) -> None:
+        self.recipes: Tuple[Recipe, ...] = tuple(freeze_recipe(r) for r in recipes)
+        self.version = version
+
+        by_id: Dict[str, Recipe] = {}
+        by_title: Dict[str, Recipe] = {}
+        by_meal_type: Dict[str, List[Recipe]] = {}
+        if ingredients is None:
+            ingredients = {r["id"]: _text_ingredients(r.get("text", "")) for r in self.recipes}
+        for r in self.recipes:
+            by_id[r["id"]] = r
+            by_title.setdefault(r["title"], r)
+            by_meal_type.setdefault(r.get("meal_type", ""), []).append(r)
+
+        self._by_id = MappingProxyType(by_id)
+        self._by_title = MappingProxyType(by_title)
+        self._by_meal_type = MappingProxyType({k: tuple(v) for k, v in by_meal_type.items()})
+        self._ingredients = MappingProxyType(ingredients)
+        self.titles: Tuple[str, ...] = tuple(r["title"] for r in self.recipes)
+        if nutrition is None:
+            nutrition = {
+                f: np.fromiter(
+                    (float(r.get(f) or 0) for r in self.recipes), dtype=np.float32, count=len(self.recipes)
+                )
+                for f in NUTRITION_FIELDS
+            }
+        self.nutrition: Mapping[str, np.ndarray] = MappingProxyType({
+            f: _readonly(np.asarray(nutrition[f], dtype=np.float32)) for f in NUTRITION_FIELDS
+        })
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def __iter__(self) -> Iterator[Recipe]:
+        return iter(self.recipes)
+
+    def get(self, recipe_id: str) -> Optional[Recipe]:
+        return self._by_id.get(recipe_id)
+
+    def by_title(self, title: str) -> Optional[Recipe]:
+        return self._by_title.get(title)
+
+    def by_titles(self, titles: Iterable[str]) -> List[Recipe]:
+        return [r for r in (self._by_title.get(t) for t in titles) if r is not None]
+
+    def for_meal_type(self, meal_type: str) -> Tuple[Recipe, ...]:
+        return self._by_meal_type.get(meal_type, ())
+
+    @property
+    def meal_types(self) -> Tuple[str, ...]:
+        return tuple(self._by_meal_type)
+
+    def ingredients(self, recipe_id: str) -> frozenset:
+        return self._ingredients.get(recipe_id, frozenset())
+
+    def ingredient_index(self) -> IngredientIndex:
+        """
+        食材の逆引き索引。ロード時に取り出した食材名から初回だけ作る（本文は読み直さない）
+        """
+        return get_ingredient_index(self.recipes, lambda r: self._ingredients.get(r["id"], ()))
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    arr.flags.writeable = False
+    return arr
+
+
+# ===== 読み込み =====
+
+def _source_version(source: str) -> str:
+    if source == BUILTIN_SOURCE:
+        return "builtin"
+    st = os.stat(source)
+    return f"{os.path.abspath(source)}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _load_store_catalog(path: str, version: str) -> RecipeCatalog:
+    """
+    本文は食材名の抽出に1件ずつ流すだけで保持しない。栄養素の配列はストアから列ごとにまとめて読む
+    """
+    store = RecipeStore(path)
+    recipes: List[StoredRecipe] = []
+    ingredients: Dict[str, frozenset] = {}
+    for data in store.iter_recipes(with_text=True):
+        text = data.pop("text")
+        ingredients[data["id"]] = _text_ingredients(text)
+        recipes.append(StoredRecipe(data, store))
+    ids, nutrition = store.nutrition_arrays()
+    if ids != tuple(r["id"] for r in recipes):
+        # 読んでいる途中でストアが差し替えられた
+        raise RuntimeError(f"recipe store changed while loading: {path}")
+    return RecipeCatalog(recipes, version, ingredients=ingredients, nutrition=nutrition)
+
+
+def load_catalog(source: str = BUILTIN_SOURCE) -> RecipeCatalog:
+    """
+    source が空なら src/sample_data.py の組み込みレシピ
+    - .db / .sqlite: python -m src.recipes.store build で作ったレシピストア（本文は遅延読み込み）
+    - .json / .jsonl: まとめてメモリに読む
+    """
+    version = _source_version(source)
+    if source == BUILTIN_SOURCE:
+        # 組み込みレシピは大きな Python リテラルなので、使うときだけ import する
+        from src.sample_data import get_sample_recipes
+        return RecipeCatalog(get_sample_recipes(), version)
+    if is_store_path(source):
+        return _load_store_catalog(source, version)
+    return RecipeCatalog(iter_recipe_file(source), version)
+
+
+_catalogs: Dict[str, RecipeCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(source: str = BUILTIN_SOURCE) -> RecipeCatalog:
+    """
+    source ごとに1回だけ読み、以降は同じインスタンスを返す。ファイルが更新されていれば読み直す
+    """
+    version = _source_version(source)
+    catalog = _catalogs.get(source)
+    if catalog is not None and catalog.version == version:
+        return catalog
+    with _catalogs_lock:
+        catalog = _catalogs.get(source)
+        if catalog is None or catalog.version != _source_version(source):
+            catalog = load_catalog(source)
+            _catalogs[source] = catalog
+        return catalog
@@ -0,0 +1,303 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# レシピカタログのディスク表現（SQLite + FTS5）
+# - recipes: 1行1レシピ。seq が元データの並び順、栄養値は REAL 列
+# - recipes_fts: タイトル・タグ・本文の trigram 全文検索（external content なので本文は二重に持たない）
+# - 10万件規模でも、読み込み側は fetchmany で少しずつ流し、本文は必要になったときだけ引く
+
+STORE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+NUTRITION_FIELDS = ("calories_kcal", "protein_g", "fat_g", "carbs_g")
+WRITE_BATCH_SIZE = 1000
+READ_BATCH_SIZE = 500
+TEXT_CACHE_SIZE = 1024
+
+CREATE_RECIPES = """
+CREATE TABLE IF NOT EXISTS recipes (
+    seq           INTEGER PRIMARY KEY,
+    id            TEXT NOT NULL UNIQUE,
+    title         TEXT NOT NULL,
+    meal_type     TEXT NOT NULL DEFAULT '',
+    tags          TEXT NOT NULL DEFAULT '[]',
+    calories_kcal REAL NOT NULL DEFAULT 0,
+    protein_g     REAL NOT NULL DEFAULT 0,
+    fat_g         REAL NOT NULL DEFAULT 0,
+    carbs_g       REAL NOT NULL DEFAULT 0,
+    text          TEXT NOT NULL DEFAULT ''
+)
+"""
+
+CREATE_RECIPES_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+    title, tags, text, content='recipes', content_rowid='seq', tokenize='trigram'
+)
+"""
+
+INSERT_RECIPE_SQL = """
+INSERT INTO recipes (id, title, meal_type, tags, calories_kcal, protein_g, fat_g, carbs_g, text)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SUMMARY_COLUMNS = ("id", "title", "meal_type", "tags") + NUTRITION_FIELDS
+
+# trigram は3文字未満の語を引けないので、短い語は LIKE で探す
+_FTS_MIN_CHARS = 3
+
+
+def is_store_path(path: str) -> bool:
+    return path.lower().endswith(STORE_EXTENSIONS)
+
+
+def _recipe_params(recipe: Mapping[str, Any]) -> Tuple[Any, ...]:
+    if not recipe.get("id") or not recipe.get("title"):
+        raise ValueError(f"recipe needs id and title: {recipe.get('id')!r}")
+    return (
+        str(recipe["id"]),
+        str(recipe["title"]),
+        str(recipe.get("meal_type") or ""),
+        json.dumps(list(recipe.get("tags") or ()), ensure_ascii=False),
+        *(float(recipe.get(f) or 0) for f in NUTRITION_FIELDS),
+        str(recipe.get("text") or ""),
+    )
+
+
+def write_recipe_store(
+    path: str, recipes: Iterable[Mapping[str, Any]], batch_size: int = WRITE_BATCH_SIZE
+) -> int:
+    """
+    レシピを流しながら新しいストアを書き出す（batch_size 件ずつ executemany）
+    - 一時ファイルに書いてから置き換えるので、読み手が途中の状態を見ることはない
+    - id の重複など1件でも不正なら何も置き換えない
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    count = 0
+    try:
+        con.execute("PRAGMA journal_mode=OFF")
+        con.execute("PRAGMA synchronous=OFF")
+        con.execute(CREATE_RECIPES)
+        fts = _create_fts(con)
+        batch: List[Tuple[Any, ...]] = []
+        for recipe in recipes:
+            batch.append(_recipe_params(recipe))
+            if len(batch) >= batch_size:
+                con.executemany(INSERT_RECIPE_SQL, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            con.executemany(INSERT_RECIPE_SQL, batch)
+            count += len(batch)
+        if fts:
+            con.execute("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')")
+        con.commit()
+    except BaseException:
+        con.close()
+        os.remove(tmp_path)
+        raise
+    con.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+def _create_fts(con: sqlite3.Connection) -> bool:
+    try:
+        con.execute(CREATE_RECIPES_FTS)
+    except sqlite3.OperationalError as exc:
+        logging.warning("FTS5 trigram unavailable; recipe search falls back to LIKE: %s", exc)
+        return False
+    return True
+
+
+def _summary(row: sqlite3.Row) -> Dict[str, Any]:
+    data = {k: row[k] for k in SUMMARY_COLUMNS}
+    data["tags"] = tuple(json.loads(row["tags"]))
+    return data
+
+
+class RecipeStore:
+    """
+    write_recipe_store で作ったファイルを読み取り専用で開く
+    - iter_recipes: 元の並び順で fetchmany しながら dict を流す
+    - get_text: 本文を1件ずつ引く（直近 TEXT_CACHE_SIZE 件はメモリに残す）
+    - nutrition_arrays: 栄養値を float32 の列としてまとめて返す
+    """
+
+    def __init__(self, path: str) -> None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(
+            f"file:{os.path.abspath(path)}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._con.row_factory = sqlite3.Row
+        self.has_fts = self._con.execute(
+            "SELECT 1 FROM sqlite_master WHERE name='recipes_fts'"
+        ).fetchone() is not None
+        self.get_text = lru_cache(maxsize=TEXT_CACHE_SIZE)(self._fetch_text)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._con.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
+
+    def iter_recipes(
+        self, with_text: bool = True, batch_size: int = READ_BATCH_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        with_text=False なら本文を読まない（カタログの索引づくり用）
+        - 読み取り中も他のメソッドを使えるよう、専用の接続でカーソルを回す
+        """
+        columns = ", ".join(SUMMARY_COLUMNS + (("text",) if with_text else ()))
+        con = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+        con.row_factory = sqlite3.Row
+        try:
+            cur = con.execute(f"SELECT {columns} FROM recipes ORDER BY seq")
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    data = _summary(row)
+                    if with_text:
+                        data["text"] = row["text"]
+                    yield data
+        finally:
+            con.close()
+
+    def _fetch_text(self, recipe_id: str) -> str:
+        with self._lock:
+            row = self._con.execute(
+                "SELECT text FROM recipes WHERE id=?", (recipe_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(recipe_id)
+        return row["text"]
+
+    def nutrition_arrays(self) -> Tuple[Tuple[str, ...], Dict[str, np.ndarray]]:
+        """
+        (ids, {栄養素: float32 配列})。並びは iter_recipes と同じ
+        """
+        with self._lock:
+            rows = self._con.execute(
+                f"SELECT id, {', '.join(NUTRITION_FIELDS)} FROM recipes ORDER BY seq"
+            ).fetchall()
+        ids = tuple(r[0] for r in rows)
+        values = np.asarray([tuple(r)[1:] for r in rows], dtype=np.float32).reshape(-1, len(NUTRITION_FIELDS))
+        return ids, {f: np.ascontiguousarray(values[:, i]) for i, f in enumerate(NUTRITION_FIELDS)}
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """
+        タイトル・タグ・本文の部分一致で id を返す（FTS が使えれば bm25 順、なければ並び順）
+        """
+        query = query.strip()
+        if not query:
+            return []
+        with self._lock:
+            if self.has_fts and len(query) >= _FTS_MIN_CHARS:
+                phrase = '"' + query.replace('"', '""') + '"'
+                rows = self._con.execute(
+                    """SELECT r.id FROM recipes_fts f JOIN recipes r ON r.seq = f.rowid
+                       WHERE recipes_fts MATCH ? ORDER BY bm25(recipes_fts) LIMIT ?""",
+                    (phrase, limit),
+                ).fetchall()
+            else:
+                pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                rows = self._con.execute(
+                    """SELECT id FROM recipes
+                       WHERE title LIKE ?1 ESCAPE '\\' OR tags LIKE ?1 ESCAPE '\\' OR text LIKE ?1 ESCAPE '\\'
+                       ORDER BY seq LIMIT ?2""",
+                    (pattern, limit),
+                ).fetchall()
+        return [r[0] for r in rows]
+
+
+# ===== 変換元の読み込み =====
+
+def iter_recipe_file(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    .jsonl は1行ずつ流す。.json（配列）はまとめて読むしかない
+    """
+    with open(path, encoding="utf-8-sig") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"recipe file must contain a JSON array: {path}")
+    yield from data
+
+
+def _iter_source(source: str) -> Iterator[Mapping[str, Any]]:
+    if not source:
+        from src.sample_data import get_sample_recipes
+        return iter(get_sample_recipes())
+    if is_store_path(source):
+        return RecipeStore(source).iter_recipes()
+    return iter_recipe_file(source)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="レシピストア（SQLite + FTS5）の作成・書き出し")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="JSON/JSONL（省略時は組み込みレシピ）からストアを作る")
+    build.add_argument("path", help="出力先 .db")
+    build.add_argument("--source", default="", help="変換元 .json / .jsonl / .db")
+
+    export = sub.add_parser("export", help="ストアを JSONL に書き出す（- で標準出力）")
+    export.add_argument("db", help="読み込む .db")
+    export.add_argument("path", help="出力先 .jsonl")
+
+    search = sub.add_parser("search", help="全文検索して一致した id を表示")
+    search.add_argument("db")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = write_recipe_store(args.path, _iter_source(args.source))
+        print(f"wrote {count} recipes to {args.path}")
+        return 0
+
+    store = RecipeStore(args.db)
+    if args.command == "search":
+        for recipe_id in store.search(args.query, args.limit):
+            print(recipe_id)
+        return 0
+
+    out = sys.stdout if args.path == "-" else open(args.path + ".tmp", "w", encoding="utf-8")
+    count = 0
+    try:
+        for recipe in store.iter_recipes():
+            recipe["tags"] = list(recipe["tags"])
+            out.write(json.dumps(recipe, ensure_ascii=False) + "\n")
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if out is not sys.stdout:
+        os.replace(args.path + ".tmp", args.path)
+    print(f"exported {count} recipes", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_openai import ChatOpenAI
+
+from src.config import Settings
+from src.rag.batching import QueryBatcher
+from src.rag.build_index import get_embeddings as _build_embeddings
+from src.rag.build_index import load_or_build_vectorstore
+from src.rag.keyword_index import KeywordIndex, load_or_build_keyword_index
+from src.recipes import RecipeCatalog
+from src.recipes import get_catalog as _load_catalog
+from src.utils.text import recipes_to_documents
+
+# プロセス内で共有する重いリソース（LLM クライアント・プロンプト・Embeddings・
+# ベクトルストア・転置インデックス）。レシピ一覧は src.recipes のカタログを共有する。Streamlit の再実行をまたいでキーごとに1回だけ作る。
+# データやモデルを差し替えたときは invalidate() で明示的に破棄する。
+# - _lock は登録表の読み書きだけに使い、factory（インデックス構築など数秒〜数分）はキーごとのロックで走らせる。
+#   別のキーの取得や invalidate() は構築中も待たされない
+# - 構築中に invalidate() されたら、作ったものは登録せずに破棄して作り直す
+_lock = threading.RLock()
+_registry: Dict[Tuple[Hashable, ...], Any] = {}
+_building: Dict[Tuple[Hashable, ...], threading.Lock] = {}
+# 種類名ごとの invalidate() 回数（None は全部）
+_generations: Dict[Optional[str], int] = {}
+
+
+def _generation(kind: Hashable) -> Tuple[int, int]:
+    return _generations.get(None, 0), _generations.get(kind, 0)
+
+
+def get_resource(key: Tuple[Hashable, ...], factory: Callable[[], Any]) -> Any:
+    """
+    key[0] を種類名（"llm", "vectorstore" など）として登録する
+    """
+    while True:
+        with _lock:
+            if key in _registry:
+                return _registry[key]
+            key_lock = _building.setdefault(key, threading.Lock())
+        with key_lock:
+            with _lock:
+                if key in _registry:
+                    return _registry[key]
+                generation = _generation(key[0])
+            value = factory()
+            with _lock:
+                if _building.get(key) is key_lock:
+                    del _building[key]
+                if generation == _generation(key[0]):
+                    _registry[key] = value
+                    return value
+        _dispose(value)
+
+
+def invalidate(*kinds: str) -> None:
+    """
+    指定した種類のリソースを破棄する。何も指定しなければ全部
+    """
+    with _lock:
+        for kind in kinds or (None,):
+            _generations[kind] = _generations.get(kind, 0) + 1
+        evicted = [_registry.pop(key) for key in list(_registry) if not kinds or key[0] in kinds]
+    for value in evicted:
+        _dispose(value)
+
+
+def _dispose(value: Any) -> None:
+    """
+    スレッドを持つリソース（QueryBatcher）を止める。積まれた質問は処理してから止まる
+    """
+    if isinstance(value, QueryBatcher):
+        value.shutdown()
+
+
+def get_chat_model(model: str, temperature: float) -> ChatOpenAI:
+    return get_resource(
+        ("llm", model, round(temperature, 2)),
+        lambda: ChatOpenAI(model=model, temperature=temperature),
+    )
+
+
+def get_embeddings(settings: Settings) -> Embeddings:
+    return get_resource(("embeddings", settings), lambda: _build_embeddings(settings))
+
+
+def get_catalog(settings: Settings) -> RecipeCatalog:
+    """
+    RECIPE_SOURCE のレシピ一覧。ファイルが更新されていたら読み直し、依存するインデックスも破棄する
+    """
+    catalog = _load_catalog(settings.recipe_source)
+    key = ("catalog_version", settings.recipe_source)
+    with _lock:
+        previous = _registry.get(key)
+        if previous != catalog.version:
+            if previous is not None:
+                invalidate("vectorstore", "keyword_index", "query_batcher")
+            _registry[key] = catalog.version
+    return catalog
+
+
+def get_vectorstore(settings: Settings) -> VectorStore:
+    catalog = get_catalog(settings)
+    return get_resource(
+        ("vectorstore", settings),
+        lambda: load_or_build_vectorstore(recipes_to_documents(catalog.recipes), settings),
+    )
+
+
+def get_keyword_index(settings: Settings) -> Optional[KeywordIndex]:
+    if settings.retrieval_mode != "hybrid":
+        return None
+    catalog = get_catalog(settings)
+    return get_resource(
+        ("keyword_index", settings),
+        lambda: load_or_build_keyword_index(catalog, settings),
+    )
+
+
+def get_query_batcher(settings: Settings) -> Optional[QueryBatcher]:
+    """
+    RAG_QUERY_BATCH_SIZE が 1 以下ならまとめない（None）
+    """
+    if settings.query_batch_max_size <= 1:
+        return None
+    return get_resource(
+        ("query_batcher", settings),
+        lambda: QueryBatcher(
+            get_vectorstore(settings),
+            max_batch_size=settings.query_batch_max_size,
+            max_wait_ms=settings.query_batch_max_wait_ms,
+        ),
+    )
+
+
+def invalidate_recipes() -> None:
+    """
+    依存するインデックスを明示的に破棄する（RECIPE_SOURCE のファイル更新は get_catalog が自動で検知する）
+    """
+    invalidate("catalog_version", "vectorstore", "keyword_index", "query_batcher")
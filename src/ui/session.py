@@ -0,0 +1,28 @@
+import streamlit as st
+from src.config import Settings
+from src.db.sharding import user_db_path
+
+
+def current_user(settings: Settings) -> tuple[str, str]:
+    """
+    (DB ファイル, user_id) を返す。セッション中は固定
+    - DIET_USER_HEADER: 認証付きリバースプロキシが付けるヘッダー（X-Forwarded-User など）の値。ヘッダーがなければ止める
+    - DIET_ALLOW_UNAUTHENTICATED_USERS=1: URL の ?user=... をそのまま信じる（認証なし。信頼できるネットワーク内の検証用）
+    - どちらもなければ1人用: 常に DIET_USER_ID
+    """
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = _resolve_user(settings)
+    user_id = st.session_state.user_id
+    return user_db_path(settings, user_id), user_id
+
+
+def _resolve_user(settings: Settings) -> str:
+    if settings.user_header:
+        user_id = st.context.headers.get(settings.user_header)
+        if not user_id:
+            st.error("ログインしていません（認証プロキシ経由でアクセスしてください）")
+            st.stop()
+        return user_id
+    if settings.allow_unauthenticated_users:
+        return st.query_params.get("user") or settings.default_user_id
+    return settings.default_user_id
@@ -3,7 +3,8 @@ import streamlit as st
 from src.config import Settings
 from src.db.food_log import get_daily_totals
 from src.db.user_profile import get_profile
-from src.nutrition.tdee import calc_tdee
+from src.nutrition.tdee import calc_tdee_for_profile
+from src.ui.session import current_user
 
 
 def render_sidebar(settings: Settings) -> dict:
@@ -11,18 +12,14 @@ def render_sidebar(settings: Settings) -> dict:
 
     # --- 今日のカロリー進捗 ---
     today = datetime.date.today().strftime("%Y-%m-%d")
-    profile = get_profile(settings.sqlite_db_path)
-    totals = get_daily_totals(settings.sqlite_db_path, today)
+    db_path, user_id = current_user(settings)
+    profile = get_profile(db_path, user_id=user_id)
+    totals = get_daily_totals(db_path, today, user_id=user_id)
+    if user_id != settings.default_user_id:
+        st.sidebar.caption(f"ユーザー: {user_id}")
 
     if profile:
-        result = calc_tdee(
-            weight_kg=profile["weight_kg"],
-            height_cm=profile["height_cm"],
-            age=profile["age"],
-            sex=profile["sex"],
-            activity_level=profile["activity_level"],
-            deficit_kcal=profile["calorie_deficit"],
-        )
+        result = calc_tdee_for_profile(profile)
         target = result.target_kcal
         consumed = totals["calories_kcal"]
         remaining = max(0.0, target - consumed)
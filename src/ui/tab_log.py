@@ -3,21 +3,22 @@ import streamlit as st
 from src.config import Settings
 from src.db.food_log import add_food_log_entry, get_daily_log, get_daily_totals, delete_food_log_entry
 from src.db.user_profile import get_profile
-from src.nutrition.tdee import calc_tdee
-from src.sample_data import get_sample_recipes
+from src.nutrition.tdee import calc_tdee_for_profile
+from src.resources import get_catalog
+from src.ui.session import current_user
 
 MEAL_TYPES = ["朝食", "昼食", "夕食", "間食"]
 
 
 def render_tab_log(settings: Settings) -> None:
     st.header("📋 食事ログ")
+    db_path, user_id = current_user(settings)
 
     date = st.date_input("記録する日付", value=datetime.date.today())
     date_str = date.strftime("%Y-%m-%d")
 
-    recipes = get_sample_recipes()
-    recipe_map = {r["title"]: r for r in recipes}
-    recipe_titles = ["（自由入力）"] + [r["title"] for r in recipes]
+    catalog = get_catalog(settings)
+    recipe_titles = ["（自由入力）", *catalog.titles]
 
     st.subheader("食事を追加する")
     with st.form("food_log_form", clear_on_submit=True):
@@ -28,7 +29,7 @@ def render_tab_log(settings: Settings) -> None:
             selected_title = st.selectbox("レシピを選択（または自由入力）", recipe_titles)
 
         if selected_title != "（自由入力）":
-            r = recipe_map[selected_title]
+            r = catalog.by_title(selected_title)
             recipe_title = selected_title
             default_cal = float(r.get("calories_kcal", 0))
             default_prot = float(r.get("protein_g", 0))
@@ -61,7 +62,7 @@ def render_tab_log(settings: Settings) -> None:
         if not title:
             st.warning("料理名を入力してください。")
         else:
-            add_food_log_entry(settings.sqlite_db_path, {
+            add_food_log_entry(db_path, {
                 "log_date": date_str,
                 "meal_type": meal_type,
                 "recipe_id": None if selected_title == "（自由入力）" else default_id,
@@ -70,27 +71,20 @@ def render_tab_log(settings: Settings) -> None:
                 "protein_g": protein,
                 "fat_g": fat,
                 "carbs_g": carbs,
-            })
+            }, user_id=user_id)
             st.success(f"{meal_type}に「{title}」を記録しました。")
             st.rerun()
 
     st.divider()
     st.subheader(f"📅 {date_str} の食事記録")
 
-    logs = get_daily_log(settings.sqlite_db_path, date_str)
-    totals = get_daily_totals(settings.sqlite_db_path, date_str)
+    logs = get_daily_log(db_path, date_str, user_id=user_id)
+    totals = get_daily_totals(db_path, date_str, user_id=user_id)
 
-    profile = get_profile(settings.sqlite_db_path)
+    profile = get_profile(db_path, user_id=user_id)
     target_kcal = None
     if profile:
-        result = calc_tdee(
-            weight_kg=profile["weight_kg"],
-            height_cm=profile["height_cm"],
-            age=profile["age"],
-            sex=profile["sex"],
-            activity_level=profile["activity_level"],
-            deficit_kcal=profile["calorie_deficit"],
-        )
+        result = calc_tdee_for_profile(profile)
         target_kcal = result.target_kcal
 
     if logs:
@@ -101,7 +95,7 @@ def render_tab_log(settings: Settings) -> None:
                 col2.metric("脂質", f"{log['fat_g']:.1f}g")
                 col3.metric("炭水化物", f"{log['carbs_g']:.1f}g")
                 if st.button("削除", key=f"del_{log['id']}"):
-                    delete_food_log_entry(settings.sqlite_db_path, log["id"])
+                    delete_food_log_entry(db_path, log["id"], user_id=user_id)
                     st.rerun()
 
         st.divider()
@@ -2,39 +2,41 @@ import streamlit as st
 from src.config import Settings
 from src.db.user_profile import get_profile
 from src.db.food_log import get_daily_totals
-from src.nutrition.tdee import calc_tdee
+from src.nutrition.tdee import calc_tdee_for_profile
 from src.nutrition.meal_planner import (
     suggest_meal_plan,
+    plan_week,
     find_recipes_by_ingredients,
     generate_shopping_list,
+    NO_REPEAT_DAYS,
 )
-from src.sample_data import get_sample_recipes
+from src.nutrition.plan_solver import MacroTargets, remaining_targets
+from src.resources import get_catalog
+from src.ui.session import current_user
 import datetime
 
+INGREDIENT_RESULTS_LIMIT = 50  # 食材から逆引きで表示する最大件数
+
 
 def render_tab_planner(settings: Settings) -> None:
     st.header("📅 献立プランナー")
 
-    recipes = get_sample_recipes()
+    catalog = get_catalog(settings)
+    recipes = catalog.recipes
 
     # ===== Section 1: 献立提案 =====
     with st.expander("① 今日の献立を提案してもらう", expanded=True):
         st.caption("残りカロリーから朝・昼・夕・間食の献立を自動提案します。")
 
-        profile = get_profile(settings.sqlite_db_path)
+        db_path, user_id = current_user(settings)
+        profile = get_profile(db_path, user_id=user_id)
         today = datetime.date.today().strftime("%Y-%m-%d")
-        totals = get_daily_totals(settings.sqlite_db_path, today)
+        totals = get_daily_totals(db_path, today, user_id=user_id)
 
         if profile:
-            tdee_result = calc_tdee(
-                weight_kg=profile["weight_kg"],
-                height_cm=profile["height_cm"],
-                age=profile["age"],
-                sex=profile["sex"],
-                activity_level=profile["activity_level"],
-                deficit_kcal=profile["calorie_deficit"],
-            )
+            tdee_result = calc_tdee_for_profile(profile)
             default_remaining = max(0.0, tdee_result.target_kcal - totals["calories_kcal"])
+            targets = remaining_targets(tdee_result, totals)
             st.info(
                 f"今日の目標: **{tdee_result.target_kcal:.0f}kcal** / "
                 f"摂取済み: **{totals['calories_kcal']:.0f}kcal** / "
@@ -42,6 +44,7 @@ def render_tab_planner(settings: Settings) -> None:
             )
         else:
             default_remaining = 1600.0
+            targets = None
             st.warning("プロフィールが未設定です。目標カロリーを手動で入力してください。")
 
         remaining_kcal = st.number_input(
@@ -62,12 +65,19 @@ def render_tab_planner(settings: Settings) -> None:
             if not selected_meals:
                 st.warning("食事の種類を1つ以上選択してください。")
             else:
-                plan = suggest_meal_plan(recipes, remaining_kcal, selected_meals)
-                total_planned = sum(
-                    r.get("calories_kcal", 0) for r in plan.values() if r
-                )
-
-                st.success(f"合計カロリー: {total_planned:.0f} kcal / 残り {remaining_kcal:.0f} kcal")
+                plan = suggest_meal_plan(recipes, remaining_kcal, selected_meals, targets=targets)
+                planned = {
+                    k: sum(r.get(k, 0) for r in plan.values() if r)
+                    for k in ("calories_kcal", "protein_g", "fat_g", "carbs_g")
+                }
+
+                st.success(f"合計カロリー: {planned['calories_kcal']:.0f} kcal / 残り {remaining_kcal:.0f} kcal")
+                if targets is not None:
+                    st.caption(
+                        f"PFC 合計: P {planned['protein_g']:.0f}/{targets.protein_g:.0f}g　"
+                        f"F {planned['fat_g']:.0f}/{targets.fat_g:.0f}g　"
+                        f"C {planned['carbs_g']:.0f}/{targets.carbs_g:.0f}g（提案 / 残り目標）"
+                    )
                 for meal_type, recipe in plan.items():
                     if recipe:
                         col1, col2 = st.columns([3, 1])
@@ -88,8 +98,14 @@ def render_tab_planner(settings: Settings) -> None:
 
     st.divider()
 
-    # ===== Section 2: 食材から逆引き =====
-    with st.expander("② 冷蔵庫の食材からレシピを探す"):
+    # ===== Section 2: 1週間の献立 =====
+    with st.expander("② 1週間の献立を作る"):
+        _render_week_plan(catalog, tdee_result if profile else None)
+
+    st.divider()
+
+    # ===== Section 3: 食材から逆引き =====
+    with st.expander("③ 冷蔵庫の食材からレシピを探す"):
         st.caption("手持ちの食材を入力するとマッチするレシピを表示します。")
         ingredient_input = st.text_input(
             "食材を入力（カンマ区切り）",
@@ -102,7 +118,7 @@ def render_tab_planner(settings: Settings) -> None:
                 st.warning("食材を入力してください。")
             else:
                 ingredients = [i.strip() for i in ingredient_input.replace("、", ",").split(",")]
-                results = find_recipes_by_ingredients(recipes, ingredients)
+                results = find_recipes_by_ingredients(catalog, ingredients, limit=INGREDIENT_RESULTS_LIMIT)
                 if results:
                     st.success(f"{len(results)}件のレシピが見つかりました。")
                     for count, recipe in results:
@@ -121,13 +137,12 @@ def render_tab_planner(settings: Settings) -> None:
 
     st.divider()
 
-    # ===== Section 3: 買い物リスト =====
-    with st.expander("③ 買い物リストを作成する"):
+    # ===== Section 4: 買い物リスト =====
+    with st.expander("④ 買い物リストを作成する"):
         st.caption("作りたいレシピを選ぶと必要な食材リストを生成します。")
-        all_titles = [r["title"] for r in recipes]
         selected_titles = st.multiselect(
             "レシピを選択してください",
-            options=all_titles,
+            options=catalog.titles,
             key="shopping_recipes",
         )
 
@@ -135,17 +150,80 @@ def render_tab_planner(settings: Settings) -> None:
             if not selected_titles:
                 st.warning("レシピを1つ以上選択してください。")
             else:
-                selected_recipes = [r for r in recipes if r["title"] in selected_titles]
-                shopping = generate_shopping_list(selected_recipes)
-
-                lines = []
-                for category, items in shopping.items():
-                    lines.append(f"## {category}")
-                    for item in items:
-                        lines.append(f"- [ ] {item}")
-                    lines.append("")
-
-                shopping_text = "\n".join(lines)
-                st.markdown(shopping_text)
-                st.code(shopping_text, language="markdown")
-                st.caption("上のテキストをコピーしてメモアプリ等に貼り付けてお使いください。")
+                selected_recipes = catalog.by_titles(selected_titles)
+                _render_shopping_list(generate_shopping_list(selected_recipes, catalog.version))
+
+
+def _render_week_plan(catalog, tdee_result) -> None:
+    """
+    7日 × 4食。「固定」した枠は残し、「入れ替え」はその日だけ今のレシピを外して組み直す
+    - 固定・入れ替えの状態は session_state に持ち、日ごとの解はソルバー側でキャッシュされる
+    """
+    st.caption(
+        f"毎日の目標カロリー・PFC に合わせ、同じレシピは{NO_REPEAT_DAYS}日以内に重ならないよう組みます。"
+    )
+    daily_kcal = st.number_input(
+        "1日の目標カロリー (kcal)",
+        min_value=800.0, max_value=4000.0,
+        value=float(tdee_result.target_kcal) if tdee_result else 1600.0,
+        step=50.0,
+        key="week_kcal",
+    )
+    targets = (
+        MacroTargets(tdee_result.protein_target_g, tdee_result.fat_target_g, tdee_result.carbs_target_g)
+        if tdee_result else None
+    )
+
+    if st.button("1週間の献立を作る", key="week_btn"):
+        st.session_state.week_active = True
+        st.session_state.week_locked = {}
+        st.session_state.week_banned = {}
+    if not st.session_state.get("week_active"):
+        return
+
+    locked = st.session_state.setdefault("week_locked", {})
+    banned = st.session_state.setdefault("week_banned", {})
+    week = plan_week(catalog.recipes, daily_kcal, targets=targets, locked=locked, banned=banned)
+
+    for day, plan in enumerate(week.days):
+        st.markdown(
+            f"**{day + 1}日目** — {plan.totals['calories_kcal']:.0f}kcal "
+            f"P:{plan.totals['protein_g']:.0f}g F:{plan.totals['fat_g']:.0f}g C:{plan.totals['carbs_g']:.0f}g"
+        )
+        for meal_type, recipe in plan.meals.items():
+            col1, col2, col3 = st.columns([4, 1, 1])
+            if recipe is None:
+                col1.write(f"{meal_type}: 該当レシピなし")
+                continue
+            col1.write(f"{meal_type}: {recipe['title']}（{recipe.get('calories_kcal', 0):.0f}kcal）")
+            slot = (day, meal_type)
+            is_locked = col2.checkbox("固定", value=slot in locked, key=f"week_lock_{day}_{meal_type}")
+            if is_locked and locked.get(slot) != recipe["id"]:
+                locked[slot] = recipe["id"]
+                st.rerun()
+            if not is_locked and slot in locked:
+                del locked[slot]
+                st.rerun()
+            if col3.button("入れ替え", key=f"week_swap_{day}_{meal_type}", disabled=is_locked):
+                banned.setdefault(day, []).append(recipe["id"])
+                st.rerun()
+
+    if st.button("この1週間の買い物リストを作成", key="week_shopping_btn"):
+        _render_shopping_list(generate_shopping_list(
+            (recipe for plan in week.days for recipe in plan.meals.values() if recipe is not None),
+            catalog.version,
+        ))
+
+
+def _render_shopping_list(shopping: dict[str, list[str]]) -> None:
+    lines = []
+    for category, items in shopping.items():
+        lines.append(f"## {category}")
+        for item in items:
+            lines.append(f"- [ ] {item}")
+        lines.append("")
+
+    shopping_text = "\n".join(lines)
+    st.markdown(shopping_text)
+    st.code(shopping_text, language="markdown")
+    st.caption("上のテキストをコピーしてメモアプリ等に貼り付けてお使いください。")
@@ -1,14 +1,16 @@
 import streamlit as st
 from src.config import Settings
 from src.db.user_profile import upsert_profile, get_profile
-from src.nutrition.tdee import calc_tdee, ACTIVITY_LABELS_JA
+from src.nutrition.tdee import calc_tdee_for_profile, ACTIVITY_LABELS_JA
+from src.ui.session import current_user
 
 
 def render_tab_profile(settings: Settings) -> None:
     st.header("👤 プロフィール設定")
     st.caption("入力した情報から1日の目標摂取カロリーとPFC目標を自動計算します。")
 
-    profile = get_profile(settings.sqlite_db_path)
+    db_path, user_id = current_user(settings)
+    profile = get_profile(db_path, user_id=user_id)
 
     with st.form("profile_form"):
         col1, col2 = st.columns(2)
@@ -52,25 +54,18 @@ def render_tab_profile(settings: Settings) -> None:
         submitted = st.form_submit_button("保存して計算する", type="primary")
 
     if submitted:
-        upsert_profile(settings.sqlite_db_path, {
+        upsert_profile(db_path, {
             "age": age, "sex": sex,
             "height_cm": height_cm, "weight_kg": weight_kg,
             "goal_weight_kg": goal_weight_kg,
             "activity_level": activity_level,
             "calorie_deficit": calorie_deficit,
-        })
+        }, user_id=user_id)
         st.success("プロフィールを保存しました")
-        profile = get_profile(settings.sqlite_db_path)
+        profile = get_profile(db_path, user_id=user_id)
 
     if profile:
-        result = calc_tdee(
-            weight_kg=profile["weight_kg"],
-            height_cm=profile["height_cm"],
-            age=profile["age"],
-            sex=profile["sex"],
-            activity_level=profile["activity_level"],
-            deficit_kcal=profile["calorie_deficit"],
-        )
+        result = calc_tdee_for_profile(profile)
 
         st.divider()
         st.subheader("📊 あなたの栄養目標")
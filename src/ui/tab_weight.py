@@ -7,6 +7,7 @@ import matplotlib.font_manager as fm
 from src.config import Settings
 from src.db.weight_log import upsert_weight, get_weight_history
 from src.db.user_profile import get_profile
+from src.ui.session import current_user
 
 matplotlib.use("Agg")
 
@@ -27,6 +28,7 @@ def _get_japanese_font():
 
 def render_tab_weight(settings: Settings) -> None:
     st.header("⚖️ 体重ログ")
+    db_path, user_id = current_user(settings)
 
     with st.form("weight_form", clear_on_submit=True):
         col1, col2, col3 = st.columns(3)
@@ -43,16 +45,17 @@ def render_tab_weight(settings: Settings) -> None:
 
     if submitted:
         upsert_weight(
-            settings.sqlite_db_path,
+            db_path,
             date.strftime("%Y-%m-%d"),
             weight_kg,
             body_fat if body_fat > 0 else None,
+            user_id=user_id,
         )
         st.success(f"{date} の体重 {weight_kg}kg を記録しました。")
         st.rerun()
 
-    history = get_weight_history(settings.sqlite_db_path, days=60)
-    profile = get_profile(settings.sqlite_db_path)
+    history = get_weight_history(db_path, days=60, user_id=user_id)
+    profile = get_profile(db_path, user_id=user_id)
 
     if not history:
         st.info("体重データがまだありません。上のフォームから記録を始めましょう。")
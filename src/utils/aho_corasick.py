@@ -0,0 +1,74 @@
+from collections import deque
+from typing import Generic, Iterable, Iterator, Tuple, TypeVar
+
+V = TypeVar("V")
+
+# 複数キーワードの同時照合（Aho-Corasick）
+# - キーワード表から一度だけオートマトンを作り、テキストを1回なめるだけで全キーワードの出現を拾う
+# - 状態遷移は状態ごとの dict（日本語は文字種が多いので表引きにしない）
+
+
+class AhoCorasick(Generic[V]):
+    """
+    (キーワード, 値) の列から作る。同じキーワードが複数あれば最初の値を使う
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, V]]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # 状態ごとに、そこで終わるキーワード（失敗リンク先の分も含む）: (キーワード, 値)
+        self._out: list[tuple[tuple[str, V], ...]] = [()]
+
+        for keyword, value in patterns:
+            if not keyword:
+                continue
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            if not self._out[state]:
+                self._out[state] = ((keyword, value),)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str, V]]:
+        """
+        (開始位置, キーワード, 値) を終了位置の順に返す（重なる出現もすべて）
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword, value in out[state]:
+                yield end - len(keyword), keyword, value
+
+    def longest_match(self, text: str) -> Tuple[str, V] | None:
+        """
+        最も長く一致したキーワード（同じ長さなら先に現れたもの）
+        """
+        best: Tuple[str, V] | None = None
+        for _, keyword, value in self.iter_matches(text):
+            if best is None or len(keyword) > len(best[0]):
+                best = (keyword, value)
+        return best
@@ -1,4 +1,5 @@
 import re
+from typing import Any, Iterable, Iterator, Mapping
 
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -13,31 +14,37 @@ def normalize_text(text: str) -> str:
     return text.strip()
 
 
-def recipes_to_documents(recipes: list[dict]) -> list[Document]:
-    docs: list[Document] = []
+def recipe_metadata(r: Mapping[str, Any]) -> dict:
+    """
+    Document のメタデータ（本文は読まない）
+    """
+    return {
+        "id": r["id"],
+        "title": r["title"],
+        "meal_type": r.get("meal_type", ""),
+        "tags": ",".join(r.get("tags", [])),
+        "calories_kcal": r.get("calories_kcal", 0),
+        "protein_g": r.get("protein_g", 0),
+        "fat_g": r.get("fat_g", 0),
+        "carbs_g": r.get("carbs_g", 0),
+    }
+
+
+def recipes_to_documents(recipes: Iterable[Mapping[str, Any]]) -> Iterator[Document]:
+    """
+    1件ずつ変換して流す（カタログ全体の Document を同時に持たない）
+    """
     for r in recipes:
-        content = normalize_text(r["text"])
-        docs.append(
-            Document(
-                page_content=content,
-                metadata={
-                    "id": r["id"],
-                    "title": r["title"],
-                    "meal_type": r.get("meal_type", ""),
-                    "tags": ",".join(r.get("tags", [])),
-                    "calories_kcal": r.get("calories_kcal", 0),
-                    "protein_g": r.get("protein_g", 0),
-                    "fat_g": r.get("fat_g", 0),
-                    "carbs_g": r.get("carbs_g", 0),
-                },
-            )
-        )
-    return docs
-
-
-def split_documents(docs: list[Document], settings: Settings) -> list[Document]:
+        yield Document(page_content=normalize_text(r["text"]), metadata=recipe_metadata(r))
+
+
+def split_documents(docs: Iterable[Document], settings: Settings) -> Iterator[Document]:
+    """
+    1ドキュメントずつ分割して流す（splitter.split_documents はリスト全体を作るため）
+    """
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=settings.chunk_size,
         chunk_overlap=settings.chunk_overlap,
     )
-    return splitter.split_documents(docs)
+    for doc in docs:
+        yield from splitter.split_documents([doc])
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db.schema import close_all_connections, init_db  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """
+    マイグレーション済みの空の DB。接続プールはテストごとに閉じる
+    """
+    path = str(tmp_path / "diet.db")
+    init_db(path)
+    yield path
+    close_all_connections()
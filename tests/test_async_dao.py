@@ -0,0 +1,89 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from src.db.async_dao import AsyncDB
+from src.db.food_log import get_daily_log
+from src.db.rollup import check_daily_totals
+
+
+def _entry(title: str, meal_type: str = "朝食") -> dict:
+    return {"log_date": "2026-01-05", "meal_type": meal_type, "recipe_title": title, "calories_kcal": 100}
+
+
+def test_failed_write_does_not_roll_back_its_batch(db_path):
+    async def run():
+        # 書き込みが1回の commit にまとまるよう、後続を十分待たせる
+        db = AsyncDB(db_path, batch_wait_sec=0.2)
+        results = await asyncio.gather(
+            db.add_food_log_entry(_entry("a")),
+            db.add_food_log_entry(_entry("bad", meal_type="夜食")),  # CHECK 制約違反
+            db.add_food_log_entry(_entry("b")),
+            return_exceptions=True,
+        )
+        await db.close()
+        return db, results
+
+    db, results = asyncio.run(run())
+
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], sqlite3.IntegrityError)
+    assert db.commits == 1 and db.writes == 3
+    assert [r["recipe_title"] for r in get_daily_log(db_path, "2026-01-05")] == ["a", "b"]
+    assert check_daily_totals(db_path) == []
+
+
+def test_close_commits_queued_writes(db_path):
+    async def run():
+        db = AsyncDB(db_path, batch_max=2)
+        writes = [asyncio.ensure_future(db.add_food_log_entry(_entry(str(i)))) for i in range(5)]
+        await asyncio.sleep(0)
+        await db.close()
+        await asyncio.gather(*writes)
+
+    asyncio.run(run())
+
+    assert len(get_daily_log(db_path, "2026-01-05")) == 5
+
+
+def test_rejected_write_is_reported_to_its_caller(db_path):
+    async def run():
+        db = AsyncDB(db_path)
+        await db.upsert_profile({
+            "age": 30, "sex": "male", "height_cm": 170, "weight_kg": 70,
+            "goal_weight_kg": 65, "activity_level": "light", "calorie_deficit": 350,
+        })
+        with pytest.raises(sqlite3.IntegrityError):
+            await db.upsert_profile({
+                "age": 30, "sex": "other", "height_cm": 170, "weight_kg": 70,
+                "goal_weight_kg": 65, "activity_level": "light", "calorie_deficit": 350,
+            })
+        profile = await db.get_profile()
+        await db.close()
+        return profile
+
+    assert asyncio.run(run())["sex"] == "male"
+
+
+def test_writes_after_stop_get_their_own_writer(db_path):
+    async def run():
+        db = AsyncDB(db_path, batch_wait_sec=0.05)
+        first = [asyncio.ensure_future(db.add_food_log_entry(_entry(f"a{i}"))) for i in range(3)]
+        await asyncio.sleep(0)
+        old = db.stop()
+        # 止まりかけのスレッドがまだ動いている間に書き込む
+        assert old is not None and old.is_alive()
+        await db.add_food_log_entry(_entry("b"))
+        new = db._thread
+        await asyncio.gather(*first)
+        await db.close()
+        return old, new
+
+    old, new = asyncio.run(run())
+
+    assert new is not old
+    old.join(5)
+    assert not old.is_alive() and not new.is_alive()
+    assert sorted(r["recipe_title"] for r in get_daily_log(db_path, "2026-01-05")) == ["a0", "a1", "a2", "b"]
+    assert check_daily_totals(db_path) == []
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.rag.batching import QueryBatcher
+
+
+class GatedEmbeddings(Embeddings):
+    """
+    gate が開くまで embed_documents を止める（後続の質問を次のバッチに溜めるため）
+    """
+
+    def __init__(self) -> None:
+        self.started = threading.Event()
+        self.gate = threading.Event()
+
+    def embed_documents(self, texts):
+        self.started.set()
+        self.gate.wait(5)
+        return [[float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class EchoStore:
+    def __init__(self, embeddings: Embeddings) -> None:
+        self.embeddings = embeddings
+
+    def similarity_search_by_vector(self, vector, k, **kwargs):
+        return [Document(page_content=str(vector[0]))][:k]
+
+
+def test_cancelled_caller_does_not_break_its_batch():
+    embeddings = GatedEmbeddings()
+    batcher = QueryBatcher(EchoStore(embeddings), max_wait_ms=50)
+
+    async def run():
+        first = asyncio.ensure_future(batcher.asearch("a", 1))
+        await asyncio.to_thread(embeddings.started.wait, 5)
+        # ワーカーが1つ目を処理している間に次のバッチを積み、1件だけキャンセルする
+        rest = [asyncio.ensure_future(batcher.asearch(q, 1)) for q in ("bb", "ccc", "dddd")]
+        await asyncio.sleep(0)
+        rest[1].cancel()
+        await asyncio.sleep(0)  # キャンセルが concurrent.futures 側に伝わるのを待つ
+        embeddings.gate.set()
+        return await asyncio.wait_for(asyncio.gather(first, *rest, return_exceptions=True), 5)
+
+    results = asyncio.run(run())
+    batcher.shutdown(wait=True, timeout=5)
+
+    assert [r[0].page_content for r in (results[0], results[1], results[3])] == ["1.0", "2.0", "4.0"]
+    assert isinstance(results[2], asyncio.CancelledError)
+    assert batcher.queries == 3
+
+
+def test_cancelled_future_is_skipped():
+    embeddings = GatedEmbeddings()
+    embeddings.gate.set()
+    batcher = QueryBatcher(EchoStore(embeddings))
+
+    cancelled = batcher.submit("x", 1)
+    cancelled.cancel()
+    kept = batcher.submit("yy", 1)
+
+    assert kept.result(timeout=5)[0].page_content == "2.0"
+    assert cancelled.cancelled()
+    batcher.shutdown(wait=True, timeout=5)
@@ -0,0 +1,101 @@
+import logging
+import threading
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.config import Settings
+from src.rag import build_index
+from src.rag.build_index import add_chunks_batched
+
+
+class FlakyEmbeddings(Embeddings):
+    """
+    最初の failures 回だけ失敗する
+    """
+
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            if self.calls <= self.failures:
+                raise RuntimeError("rate limited")
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class RecordingCollection:
+    def __init__(self) -> None:
+        self.pages = []
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        assert len(ids) == len(embeddings) == len(metadatas) == len(documents)
+        self.pages.append(list(ids))
+
+
+class FakeStore:
+    """
+    Chroma と同じく _collection.upsert でページを書き込むストア
+    """
+
+    def __init__(self, embeddings: Embeddings) -> None:
+        self.embeddings = embeddings
+        self._collection = RecordingCollection()
+
+
+def _chunks(n: int) -> dict:
+    return {f"c{i}": Document(page_content=f"本文{i}", metadata={"chunk_id": f"c{i}"}) for i in range(n)}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(build_index.time, "sleep", calls.append)
+    return calls
+
+
+def test_retries_with_backoff_and_writes_every_page(sleeps, caplog):
+    settings = Settings(embed_batch_size=4, embed_max_workers=1, embed_max_retries=3, index_page_size=8)
+    store = FakeStore(FlakyEmbeddings(failures=2))
+    chunks = _chunks(30)
+
+    with caplog.at_level(logging.INFO):
+        add_chunks_batched(store, chunks, settings)
+
+    assert sleeps == [1.0, 2.0]
+    pages = store._collection.pages
+    assert len(pages) > 1
+    assert all(len(p) <= settings.index_page_size + settings.embed_batch_size for p in pages)
+    written = [cid for p in pages for cid in p]
+    assert sorted(written) == sorted(chunks)
+    assert "Embedded 30 chunks" in caplog.text and "chunks/sec" in caplog.text
+
+
+def test_concurrent_batches_all_reach_the_store(sleeps):
+    settings = Settings(embed_batch_size=3, embed_max_workers=4, embed_max_retries=3, index_page_size=5)
+    store = FakeStore(FlakyEmbeddings(failures=1))
+    chunks = _chunks(50)
+
+    add_chunks_batched(store, chunks, settings)
+
+    written = [cid for p in store._collection.pages for cid in p]
+    assert sorted(written) == sorted(chunks)
+    assert len(sleeps) == 1
+
+
+def test_persistent_failure_is_raised(sleeps):
+    settings = Settings(embed_batch_size=4, embed_max_workers=1, embed_max_retries=3, index_page_size=8)
+    store = FakeStore(FlakyEmbeddings(failures=10**6))
+
+    with pytest.raises(RuntimeError, match="rate limited"):
+        add_chunks_batched(store, _chunks(3), settings)
+
+    assert sleeps == [1.0, 2.0]
+    assert store._collection.pages == []
@@ -0,0 +1,91 @@
+import pytest
+
+from src.db.bulk import BulkImportError, _date, import_file, read_rows
+from src.db.schema import connection
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2026-01-05", "2026-01-05"),
+        ("  2026-01-05 ", "2026-01-05"),
+        ("20260105", "2026-01-05"),
+        ("2026-W02-1", "2026-01-05"),
+    ],
+)
+def test_date_is_stored_as_yyyy_mm_dd(value, expected):
+    assert _date({"log_date": value}, "log_date") == expected
+
+
+@pytest.mark.parametrize("value", [None, "", "  "])
+def test_date_is_required(value):
+    with pytest.raises(ValueError, match="log_date is required"):
+        _date({"log_date": value}, "log_date")
+
+
+@pytest.mark.parametrize("value", ["2026/01/05", "2026-02-30", "yesterday"])
+def test_date_rejects_malformed(value):
+    with pytest.raises(ValueError):
+        _date({"log_date": value}, "log_date")
+
+
+def test_read_rows_reports_bad_jsonl_lines(tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text(
+        '{"log_date": "2026-01-05"}\n'
+        "\n"
+        '{"log_date": \n'
+        "[1, 2]\n",
+        encoding="utf-8",
+    )
+    rows = list(read_rows(str(path)))
+    assert [n for n, _ in rows] == [1, 3, 4]
+    assert rows[0][1] == {"log_date": "2026-01-05"}
+    assert isinstance(rows[1][1], ValueError) and "invalid JSON" in str(rows[1][1])
+    assert isinstance(rows[2][1], ValueError) and "got list" in str(rows[2][1])
+
+
+def test_import_reports_every_bad_line_and_writes_nothing(db_path, tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text(
+        '{"log_date": "20260105", "meal_type": "朝食", "recipe_title": "a", "calories_kcal": 300}\n'
+        "not json\n"
+        '{"log_date": "2026/01/05", "meal_type": "朝食", "recipe_title": "b", "calories_kcal": 300}\n',
+        encoding="utf-8",
+    )
+    with pytest.raises(BulkImportError) as info:
+        import_file(db_path, "food_log", str(path))
+    assert [n for n, _ in info.value.errors] == [2, 3]
+    with connection(db_path) as con:
+        assert con.execute("SELECT COUNT(*) FROM food_log").fetchone()[0] == 0
+
+
+def test_import_normalizes_dates(db_path, tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text(
+        '{"log_date": "20260105", "meal_type": "朝食", "recipe_title": "a", "calories_kcal": 300}\n',
+        encoding="utf-8",
+    )
+    assert import_file(db_path, "food_log", str(path)) == 1
+    with connection(db_path) as con:
+        assert con.execute("SELECT log_date FROM food_log").fetchone()[0] == "2026-01-05"
+
+
+@pytest.mark.parametrize(
+    ("table", "good", "bad"),
+    [
+        (
+            "food_log",
+            '{"log_date": "2026-01-05", "meal_type": "朝食", "recipe_title": "a", "calories_kcal": 300}',
+            '{"log_date": "2026-01-05", "meal_type": "朝食", "recipe_title": "b", "calories_kcal": "nan"}',
+        ),
+        ("weight_log", '{"log_date": "2026-01-04", "weight_kg": 70}', '{"log_date": "2026-01-05", "weight_kg": "inf"}'),
+    ],
+)
+def test_import_rejects_non_finite_numbers(db_path, tmp_path, table, good, bad):
+    path = tmp_path / "log.jsonl"
+    path.write_text(f"{good}\n{bad}\n", encoding="utf-8")
+    with pytest.raises(BulkImportError) as info:
+        import_file(db_path, table, str(path))
+    assert [n for n, _ in info.value.errors] == [2]
+    assert "finite" in info.value.errors[0][1]
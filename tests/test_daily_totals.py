@@ -0,0 +1,59 @@
+from src.db.food_log import add_food_log_entry, delete_food_log_entry, get_daily_log, get_daily_totals
+from src.db.rollup import check_daily_totals
+from src.db.schema import connection
+
+
+def _entry(day: str, kcal: float, protein: float = 10.0) -> dict:
+    return {
+        "log_date": day, "meal_type": "昼食", "recipe_title": "x",
+        "calories_kcal": kcal, "protein_g": protein, "fat_g": 5.0, "carbs_g": 30.0,
+    }
+
+
+def _raw_totals(db_path: str, day: str, user_id: str) -> dict:
+    with connection(db_path) as con:
+        row = con.execute(
+            """SELECT SUM(calories_kcal), SUM(protein_g), SUM(fat_g), SUM(carbs_g)
+               FROM food_log WHERE user_id=? AND log_date=?""",
+            (user_id, day),
+        ).fetchone()
+    return dict(zip(("calories_kcal", "protein_g", "fat_g", "carbs_g"), row))
+
+
+def test_insert_updates_daily_totals(db_path):
+    add_food_log_entry(db_path, _entry("2026-01-05", 300, 20), user_id="alice")
+    add_food_log_entry(db_path, _entry("2026-01-05", 450, 25), user_id="alice")
+    add_food_log_entry(db_path, _entry("2026-01-05", 999), user_id="bob")
+    add_food_log_entry(db_path, _entry("2026-01-06", 200), user_id="alice")
+
+    assert get_daily_totals(db_path, "2026-01-05", "alice") == _raw_totals(db_path, "2026-01-05", "alice")
+    assert get_daily_totals(db_path, "2026-01-05", "alice")["calories_kcal"] == 750
+    assert get_daily_totals(db_path, "2026-01-05", "bob")["calories_kcal"] == 999
+    assert check_daily_totals(db_path) == []
+
+
+def test_delete_updates_daily_totals(db_path):
+    add_food_log_entry(db_path, _entry("2026-01-05", 300, 20), user_id="alice")
+    add_food_log_entry(db_path, _entry("2026-01-05", 450, 25), user_id="alice")
+    first, second = get_daily_log(db_path, "2026-01-05", "alice")
+
+    delete_food_log_entry(db_path, first["id"], user_id="alice")
+    assert get_daily_totals(db_path, "2026-01-05", "alice") == _raw_totals(db_path, "2026-01-05", "alice")
+    assert check_daily_totals(db_path) == []
+
+    # 最後の1件を消したら集計行も消え、合計は 0
+    delete_food_log_entry(db_path, second["id"], user_id="alice")
+    assert get_daily_totals(db_path, "2026-01-05", "alice")["calories_kcal"] == 0
+    assert check_daily_totals(db_path) == []
+    with connection(db_path) as con:
+        assert con.execute("SELECT COUNT(*) FROM daily_totals").fetchone()[0] == 0
+
+
+def test_delete_of_other_user_entry_is_ignored(db_path):
+    add_food_log_entry(db_path, _entry("2026-01-05", 300), user_id="alice")
+    (entry,) = get_daily_log(db_path, "2026-01-05", "alice")
+
+    delete_food_log_entry(db_path, entry["id"], user_id="bob")
+
+    assert get_daily_totals(db_path, "2026-01-05", "alice")["calories_kcal"] == 300
+    assert check_daily_totals(db_path) == []
@@ -0,0 +1,76 @@
+import pytest
+
+from src.config import Settings
+from src.rag.build_index import iter_chunks
+from src.rag.keyword_index import KeywordIndex
+from src.recipes import RecipeCatalog
+from src.utils.text import recipes_to_documents
+
+RECIPES = [
+    {
+        "id": "r1", "title": "鶏むねともやしの炒め物", "meal_type": "夕食", "tags": ["高たんぱく"],
+        "calories_kcal": 320, "protein_g": 35, "fat_g": 8, "carbs_g": 12,
+        "text": "【材料】鶏むね肉200g、もやし1袋、ごま油小さじ1\n【作り方】炒める",
+    },
+    {
+        "id": "r2", "title": "さといもの煮物", "meal_type": "昼食", "tags": [],
+        "calories_kcal": 180, "protein_g": 4, "fat_g": 1, "carbs_g": 35,
+        "text": "【材料】さといも3個、醤油大さじ1\n【作り方】煮る",
+    },
+    {
+        "id": "r3", "title": "豆腐と卵のスープ", "meal_type": "朝食", "tags": [],
+        "calories_kcal": 150, "protein_g": 14, "fat_g": 7, "carbs_g": 4,
+        "text": "【材料】木綿豆腐150g、卵1個\n【作り方】煮る",
+    },
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    settings = Settings(embedding_backend="local")
+    catalog = RecipeCatalog(RECIPES)
+    return KeywordIndex.build(iter_chunks(recipes_to_documents(catalog.recipes), settings), catalog, settings)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "鶏むね",
+        "もやし",  # 「や」を含む
+        "さといも",  # 「と」を含む
+        "豆腐、卵",
+        "豆腐 卵",
+        "鶏むねともやし",
+        "豆腐や卵",
+        "たまご",  # normalize_ingredient で「卵」
+        "タマゴ？",
+        "もやしとさといもと豆腐",
+    ],
+)
+def test_ingredient_queries(index, question):
+    assert index.is_ingredient_query(question)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "",
+        "300kcal以下の夕食は？",
+        "鶏むねのおすすめレシピ",
+        "鶏むねとパスタ",
+        "もやしと",
+        "と",
+    ],
+)
+def test_other_queries(index, question):
+    assert not index.is_ingredient_query(question)
+
+
+def test_hits_are_rebuilt_from_the_catalog(index):
+    settings = index.settings
+    chunks = dict(iter_chunks(recipes_to_documents(RECIPES), settings))
+    hits = index.search("もやし", 3)
+    assert hits[0][0].metadata["id"] == "r1"
+    doc = hits[0][0]
+    assert doc.page_content == chunks[doc.id].page_content
+    assert doc.metadata == chunks[doc.id].metadata
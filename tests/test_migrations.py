@@ -0,0 +1,81 @@
+import sqlite3
+
+from src.db.food_log import add_food_log_entry
+from src.db.migrations import (
+    CREATE_FOOD_LOG,
+    CREATE_USER_PROFILE,
+    CREATE_WEIGHT_LOG,
+    MIGRATIONS,
+    apply_migrations,
+    schema_version,
+)
+from src.db.query_plan import check_query_plans
+from src.db.rollup import check_daily_totals
+from src.db.schema import connection, init_db
+
+
+def _schema(path: str) -> list:
+    con = sqlite3.connect(path)
+    try:
+        return con.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY name"
+        ).fetchall()
+    finally:
+        con.close()
+
+
+def test_init_db_twice_is_a_no_op(db_path):
+    add_food_log_entry(db_path, {
+        "log_date": "2026-01-05", "meal_type": "朝食", "recipe_title": "a", "calories_kcal": 300,
+    })
+    before = _schema(db_path)
+
+    init_db(db_path)
+
+    assert _schema(db_path) == before
+    with connection(db_path) as con:
+        assert schema_version(con) == MIGRATIONS[-1].version
+        assert con.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(MIGRATIONS)
+        assert con.execute("SELECT COUNT(*) FROM food_log").fetchone()[0] == 1
+
+
+def test_apply_migrations_returns_current_version_when_up_to_date(db_path):
+    con = sqlite3.connect(db_path)
+    try:
+        assert apply_migrations(con) == MIGRATIONS[-1].version
+        assert apply_migrations(con) == MIGRATIONS[-1].version
+    finally:
+        con.close()
+
+
+def test_pre_migration_database_is_upgraded_once(tmp_path):
+    # マイグレーション導入前の DB（version 表なし・user_id なし）
+    path = str(tmp_path / "legacy.db")
+    con = sqlite3.connect(path)
+    for statement in (CREATE_USER_PROFILE, CREATE_FOOD_LOG, CREATE_WEIGHT_LOG):
+        con.execute(statement)
+    con.execute(
+        "INSERT INTO food_log (log_date, meal_type, recipe_title, calories_kcal, protein_g)"
+        " VALUES ('2026-01-05', '昼食', 'a', 500, 20)"
+    )
+    con.execute("INSERT INTO weight_log (log_date, weight_kg) VALUES ('2026-01-05', 70)")
+    con.commit()
+    con.close()
+
+    init_db(path)
+    upgraded = _schema(path)
+    init_db(path)
+
+    assert _schema(path) == upgraded
+    assert check_daily_totals(path) == []
+    with connection(path) as con:
+        assert con.execute("SELECT user_id FROM food_log").fetchone()[0] == "default"
+        assert con.execute("SELECT user_id, weight_kg FROM weight_log").fetchone()[:] == ("default", 70)
+        totals = con.execute("SELECT calories_kcal, entry_count FROM daily_totals").fetchone()
+        assert totals[:] == (500, 1)
+
+
+def test_main_queries_use_their_indexes(db_path):
+    with connection(db_path) as con:
+        plans = check_query_plans(con)
+    assert "COVERING INDEX idx_food_log_user_date_totals" in plans["food_log_totals"][0]
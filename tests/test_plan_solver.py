@@ -0,0 +1,95 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from src.nutrition.meal_planner import plan_week
+from src.nutrition.plan_solver import (
+    DEFAULT_MEAL_TYPES,
+    MEAL_BUDGETS,
+    SHARE_WEIGHT,
+    MacroTargets,
+    PlannerIndex,
+    _Problem,
+    solve_day,
+)
+
+
+def _catalogue(seed: int, per_meal: int = 5) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"{meal_type}{i}", "meal_type": meal_type,
+            "calories_kcal": rng.uniform(80, 800), "protein_g": rng.uniform(2, 45),
+            "fat_g": rng.uniform(1, 30), "carbs_g": rng.uniform(5, 110),
+        }
+        for meal_type in DEFAULT_MEAL_TYPES
+        for i in range(per_meal)
+    ]
+
+
+def _brute_force(index: PlannerIndex, total_kcal: float, targets) -> float:
+    """
+    全組み合わせのコスト（目標とのずれ + 配分のずれ）の最小値
+    """
+    problem = _Problem(total_kcal, targets)
+    shares = np.array([MEAL_BUDGETS[m] for m in DEFAULT_MEAL_TYPES], dtype=np.float32)
+    shares = shares / shares.sum()
+    pools = [index.pool(m, total_kcal) for m in DEFAULT_MEAL_TYPES]
+    best = float("inf")
+    for combo in itertools.product(*pools):
+        values = index.nutrition[list(combo)]
+        share_cost = sum(
+            float(SHARE_WEIGHT * np.float32(abs(v[0] - s * total_kcal)) / problem.scale[0])
+            for v, s in zip(values, shares)
+        )
+        best = min(best, float(problem.cost(values.sum(axis=0))) + share_cost)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("with_targets", [False, True])
+def test_solve_day_matches_brute_force(seed, with_targets):
+    index = PlannerIndex(_catalogue(seed))
+    total_kcal = 1200 + 150 * seed
+    targets = MacroTargets(protein_g=90, fat_g=45, carbs_g=180) if with_targets else None
+
+    plan = solve_day(index, total_kcal, targets=targets, time_budget_ms=10_000)
+
+    assert plan.complete
+    assert set(plan.indices) == set(DEFAULT_MEAL_TYPES)
+    assert plan.cost == pytest.approx(_brute_force(index, total_kcal, targets), rel=1e-5, abs=1e-6)
+
+
+def test_locked_slot_is_kept():
+    index = PlannerIndex(_catalogue(0))
+    locked = {"朝食": index.position["朝食3"]}
+
+    plan = solve_day(index, 1800, locked=locked, time_budget_ms=10_000)
+
+    assert plan.indices["朝食"] == locked["朝食"]
+    assert plan.meals["朝食"]["id"] == "朝食3"
+
+
+def test_excluded_recipes_are_not_used():
+    index = PlannerIndex(_catalogue(1))
+    first = solve_day(index, 1800, time_budget_ms=10_000)
+    excluded = list(first.indices.values())
+
+    plan = solve_day(index, 1800, exclude=excluded, time_budget_ms=10_000)
+
+    assert not set(plan.indices.values()) & set(excluded)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"locked": {(7, "朝食"): "朝食0"}},
+        {"locked": {(-1, "朝食"): "朝食0"}},
+        {"banned": {7: ["朝食0"]}},
+    ],
+)
+def test_plan_week_rejects_days_outside_the_plan(kwargs):
+    with pytest.raises(ValueError, match="day must be between 0 and 6"):
+        plan_week(_catalogue(2), 1800, days=7, time_budget_ms=10_000, **kwargs)
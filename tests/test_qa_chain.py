@@ -0,0 +1,64 @@
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.config import Settings
+from src.nutrition.tdee import build_profile_context, profile_bucket
+from src.rag import qa_chain
+from src.rag.answer_cache import AnswerCache
+
+DOCS = [
+    Document(
+        page_content="【材料】鶏むね肉200g\n【作り方】焼く",
+        metadata={"id": "r1", "chunk_id": "r1-0", "title": "鶏むねのソテー", "calories_kcal": 250},
+    )
+]
+
+
+class RecordingChat(FakeListChatModel):
+    prompts: list = []
+
+    def invoke(self, messages, *args, **kwargs):
+        self.prompts.append("\n".join(m.content for m in messages))
+        return super().invoke(messages, *args, **kwargs)
+
+
+def _profile(age: int, weight_kg: float) -> dict:
+    return {
+        "age": age, "sex": "female", "height_cm": 160, "weight_kg": weight_kg,
+        "goal_weight_kg": 50, "activity_level": "light", "calorie_deficit": 350,
+    }
+
+
+def test_shared_answer_is_built_from_bucket_only(tmp_path, monkeypatch):
+    llm = RecordingChat(responses=["判定: 該当あり 鶏むね"], prompts=[])
+    monkeypatch.setattr(qa_chain, "get_chat_model", lambda *a: llm)
+    cache = AnswerCache(str(tmp_path / "answers.db"))
+    settings = Settings()
+    alice, carol = _profile(31, 55.0), _profile(33, 55.5)
+    assert profile_bucket(alice) == profile_bucket(carol)
+    assert build_profile_context(alice) != build_profile_context(carol)
+
+    for profile in (alice, carol):
+        qa_chain.answer_question(
+            "鶏むねのレシピ", DOCS, settings, cache=cache,
+            profile_context=build_profile_context(profile), profile_bucket=profile_bucket(profile),
+        )
+
+    assert len(llm.prompts) == 1 and cache.hits == 1
+    assert profile_bucket(alice) in llm.prompts[0]
+    assert "31歳" not in llm.prompts[0] and "55.0kg" not in llm.prompts[0]
+
+
+def test_without_bucket_cache_is_keyed_on_the_exact_profile(tmp_path, monkeypatch):
+    llm = RecordingChat(responses=["判定: 該当あり 鶏むね"], prompts=[])
+    monkeypatch.setattr(qa_chain, "get_chat_model", lambda *a: llm)
+    cache = AnswerCache(str(tmp_path / "answers.db"))
+    settings = Settings()
+
+    for profile in (_profile(31, 55.0), _profile(33, 55.5), _profile(31, 55.0)):
+        qa_chain.answer_question(
+            "鶏むねのレシピ", DOCS, settings, cache=cache, profile_context=build_profile_context(profile)
+        )
+
+    assert len(llm.prompts) == 2 and cache.hits == 1
+    assert "31歳" in llm.prompts[0] and "33歳" in llm.prompts[1]